@@ -0,0 +1,146 @@
+"""Chrome persistente para sincronizaciones seguidas.
+
+Un solo hilo atiende las sincronizaciones con el mismo ``EvoltaScraper``: Chrome
+queda abierto y con sesión entre una y otra, así la siguiente no paga el arranque
+del navegador (ni ``ChromeDriverManager().install()``) ni el login. Antes de cada
+uso se revalidan las cookies, y el navegador se recicla tras
+``EVOLTA_BROWSER_MAX_SYNCS`` sincronizaciones o cuando su memoria supera
+``EVOLTA_BROWSER_MAX_RSS_MB``.
+"""
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from scraper import EvoltaScraper
+
+logger = logging.getLogger(__name__)
+
+EVOLTA_BROWSER_WORKER = os.getenv("EVOLTA_BROWSER_WORKER", "false").lower() in {"1", "true", "yes"}
+EVOLTA_BROWSER_MAX_SYNCS = int(os.getenv("EVOLTA_BROWSER_MAX_SYNCS", "20"))
+EVOLTA_BROWSER_MAX_RSS_MB = int(os.getenv("EVOLTA_BROWSER_MAX_RSS_MB", "350"))
+
+
+def _children():
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # El nombre va entre paréntesis y puede tener espacios
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return 0.0
+
+
+def browser_rss_mb(driver):
+    """RSS en MB de chromedriver y todos sus procesos de Chrome; None si no se puede medir."""
+    try:
+        root = driver.service.process.pid
+    except AttributeError:
+        return None
+    if not os.path.isdir("/proc"):
+        return None
+    children = _children()
+    total, stack = 0.0, [root]
+    while stack:
+        pid = stack.pop()
+        total += _rss_mb(pid)
+        stack.extend(children.get(pid, ()))
+    return total
+
+
+class BrowserWorker:
+    def __init__(self, max_syncs=EVOLTA_BROWSER_MAX_SYNCS, max_rss_mb=EVOLTA_BROWSER_MAX_RSS_MB,
+                 scraper_factory=EvoltaScraper):
+        self.max_syncs = max_syncs
+        self.max_rss_mb = max_rss_mb
+        self.scraper_factory = scraper_factory
+        self.scraper = None
+        self.syncs = 0
+        # Carpeta privada para el arranque en frío: descargas, capturas y screenshots
+        # nunca caen en DOWNLOAD_DIR (los datos publicados)
+        self.scratch_dir = None
+        # Un solo hilo: el driver de Selenium no se comparte entre hilos
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="browser-worker")
+
+    def run_sync(self, download_dir, start_date=None, end_date=None):
+        """Encola una sincronización en el navegador persistente y espera su resultado."""
+        return self._executor.submit(self._sync, download_dir, start_date, end_date).result()
+
+    def warm(self):
+        """Abre Chrome e inicia sesión en segundo plano, antes de la primera sincronización."""
+        self._executor.submit(self._warm)
+
+    def shutdown(self):
+        self._executor.submit(self._close)
+        self._executor.shutdown(wait=True)
+
+    def _scraper_for(self, download_dir):
+        self._recycle_if_needed()
+        if self.scraper is None:
+            self.scraper = self.scraper_factory(download_dir=download_dir)
+            self.scraper.keep_browser = True
+        else:
+            self.scraper.use_download_dir(download_dir)
+        return self.scraper
+
+    def _warm(self):
+        self.scratch_dir = tempfile.mkdtemp(prefix="evolta-browser-")
+        try:
+            self._scraper_for(self.scratch_dir).ensure_session()
+        except Exception as e:
+            logger.warning(f"Browser warm-up failed: {e}")
+            self._close()
+
+    def _remove_scratch(self):
+        if self.scratch_dir is not None:
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
+            self.scratch_dir = None
+
+    def _sync(self, download_dir, start_date, end_date):
+        scraper = self._scraper_for(download_dir)
+        # Chrome ya apunta a la carpeta de la sincronización
+        self._remove_scratch()
+        try:
+            return scraper.run_sync(start_date, end_date)
+        finally:
+            # Si la sincronización cerró el navegador, el próximo empieza de cero
+            self.syncs = self.syncs + 1 if scraper.driver is not None else 0
+
+    def _recycle_reason(self):
+        if self.scraper is None or self.scraper.driver is None:
+            return None
+        if self.syncs >= self.max_syncs:
+            return f"{self.syncs} syncs"
+        rss = browser_rss_mb(self.scraper.driver)
+        if rss is not None and rss >= self.max_rss_mb:
+            return f"RSS {rss:.0f} MB"
+        return None
+
+    def _recycle_if_needed(self):
+        reason = self._recycle_reason()
+        if reason:
+            logger.info(f"Recycling browser after {reason}")
+            self._close()
+
+    def _close(self):
+        if self.scraper is not None:
+            self.scraper.close()
+        self.syncs = 0
+        self._remove_scratch()
@@ -19,6 +19,26 @@ _XHR_HEADERS = {
 }
 
 
+def login_session(session: requests.Session, evolta_user: str, evolta_pass: str) -> None:
+    """Inicia sesión en Evolta con ``session`` y sigue la redirección que devuelve."""
+    resp = session.post(
+        _LOGIN_URL,
+        json={
+            "usuario": evolta_user,
+            "clave": evolta_pass,
+            "ipInfo": '{"usuario":"hola"}',
+        },
+        timeout=30,
+    )
+    resp.raise_for_status()
+    try:
+        redirect = resp.json()
+        if isinstance(redirect, str) and redirect.startswith("/"):
+            session.get(f"{BASE}{redirect}", timeout=30)
+    except Exception:
+        pass
+
+
 class EvoltaProspectosClient:
     def __init__(self, evolta_user: str, evolta_pass: str) -> None:
         self._user = evolta_user
@@ -32,22 +52,7 @@ class EvoltaProspectosClient:
         })
 
     def login(self) -> None:
-        resp = self.session.post(
-            _LOGIN_URL,
-            json={
-                "usuario": self._user,
-                "clave": self._pass,
-                "ipInfo": '{"usuario":"hola"}',
-            },
-            timeout=30,
-        )
-        resp.raise_for_status()
-        try:
-            redirect = resp.json()
-            if isinstance(redirect, str) and redirect.startswith("/"):
-                self.session.get(f"{BASE}{redirect}", timeout=30)
-        except Exception:
-            pass
+        login_session(self.session, self._user, self._pass)
 
     def _valida_sesion(self) -> None:
         self.session.post(
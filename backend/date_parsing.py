@@ -0,0 +1,137 @@
+"""Parseo vectorizado de las fechas de los reportes de Evolta.
+
+Evolta exporta las fechas como texto dd/mm/yyyy (a veces con hora) o como
+celdas fecha de Excel. ``pd.to_datetime(dayfirst=True)`` sin formato infiere
+elemento por elemento y, con texto mixto, descarta o invierte valores (una
+fecha ISO ``2026-06-05`` queda como 6 de mayo). Aquí el formato de cada
+columna se detecta una sola vez a partir de una muestra, se recuerda por
+reporte y columna, y toda la columna se parsea con ese formato explícito.
+Los valores que no calzan prueban los demás formatos conocidos y recién al
+final la inferencia dd/mm; lo no interpretable queda como NaT.
+"""
+import logging
+import threading
+from typing import Dict, Hashable, Iterable
+
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMATS = (
+    "%d/%m/%Y",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y %I:%M:%S %p",
+    "%d-%m-%Y",
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+)
+SAMPLE_SIZE = 500
+
+
+def _sample(text: pd.Series, size: int = SAMPLE_SIZE) -> pd.Series:
+    # Muestra repartida en toda la columna, no solo las primeras filas
+    step = max(1, len(text) // size)
+    return text.iloc[::step].iloc[:size]
+
+
+def detect_date_format(values: Iterable[str], formats: Iterable[str] = DATE_FORMATS) -> str | None:
+    """Formato de ``formats`` que interpreta más valores de la muestra (None si ninguno)."""
+    sample = pd.Series(list(values), dtype=object)
+    best, best_count = None, 0
+    for fmt in formats:
+        count = int(pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum())
+        if count > best_count:
+            best, best_count = fmt, count
+    return best
+
+
+class DateParser:
+    """Parsea columnas de fecha con el formato detectado y recordado por ``key``.
+
+    ``key`` identifica la columna de un reporte (ej. ``("ReporteVenta",
+    "FECHAVENTA")``). Si un export posterior cambia de formato y la mayoría de
+    los valores deja de calzar, el formato se vuelve a detectar.
+    """
+
+    def __init__(self, formats: Iterable[str] = DATE_FORMATS):
+        self.formats = tuple(formats)
+        self._formats: Dict[Hashable, str | None] = {}
+        self._lock = threading.Lock()
+
+    def format_for(self, key: Hashable | None, text: pd.Series) -> str | None:
+        if key is not None:
+            with self._lock:
+                if key in self._formats:
+                    return self._formats[key]
+        fmt = detect_date_format(_sample(text), self.formats)
+        self._remember(key, fmt)
+        return fmt
+
+    def _remember(self, key: Hashable | None, fmt: str | None) -> None:
+        if key is None or fmt is None:
+            return
+        with self._lock:
+            if self._formats.get(key) != fmt:
+                logger.info(f"Date format for {key}: {fmt}")
+            self._formats[key] = fmt
+
+    def _parse_text(self, text: pd.Series, key: Hashable | None) -> pd.Series:
+        fmt = self.format_for(key, text)
+        parsed = pd.to_datetime(text, format=fmt, errors="coerce") if fmt else None
+        if parsed is not None and key is not None and parsed.isna().sum() * 2 > len(text):
+            # El formato recordado ya no describe la columna
+            fmt = detect_date_format(_sample(text), self.formats)
+            self._remember(key, fmt)
+            parsed = pd.to_datetime(text, format=fmt, errors="coerce") if fmt else None
+        if parsed is None:
+            parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[us]")
+
+        for other in self.formats:
+            pending = parsed.isna()
+            if not pending.any():
+                return parsed
+            if other != fmt:
+                parsed = parsed.fillna(pd.to_datetime(text[pending], format=other, errors="coerce"))
+        pending = parsed.isna()
+        if pending.any():
+            inferred = pd.to_datetime(text[pending], format="mixed", dayfirst=True, errors="coerce")
+            parsed = parsed.fillna(inferred)
+        return parsed
+
+    def parse(self, values, key: Hashable | None = None) -> pd.Series:
+        """Serie datetime64 alineada con ``values``; vacíos e ilegibles quedan NaT."""
+        series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return series
+        index = series.index
+        series = series.reset_index(drop=True)
+        result = pd.Series(pd.NaT, index=series.index, dtype="datetime64[us]")
+
+        kind = pd.api.types.infer_dtype(series, skipna=True)
+        if kind in ("string", "empty"):
+            is_text = series.notna()
+        elif kind.startswith("mixed"):
+            is_text = series.map(lambda value: isinstance(value, str)).astype(bool)
+        else:
+            is_text = pd.Series(False, index=series.index)
+
+        # Celdas fecha de Excel, Timestamps, etc.
+        others = series[~is_text & series.notna()]
+        if not others.empty:
+            result[others.index] = pd.to_datetime(others, errors="coerce").astype("datetime64[us]")
+
+        text = series[is_text].astype(str).str.strip()
+        text = text[text != ""]
+        if not text.empty:
+            result[text.index] = self._parse_text(text, key).astype("datetime64[us]")
+        return result.set_axis(index)
+
+
+_default_parser = DateParser()
+
+
+def parse_dates(values, key: Hashable | None = None) -> pd.Series:
+    """Parsea una columna de fechas con el parser compartido del proceso."""
+    return _default_parser.parse(values, key)
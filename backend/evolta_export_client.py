@@ -0,0 +1,261 @@
+"""Exportación de los reportes de Evolta por HTTP, sin navegador.
+
+Replica lo que hace el botón Exportar de cada página de reporte: inicia sesión
+con un ``requests.Session`` (``creditos.prospectos_client.login_session``), lee
+de la propia página el formulario que contiene el botón (acción, método y
+campos, incluido un ``__doPostBack``), completa el rango de fechas y la opción de
+todos los proyectos, y escribe la respuesta por bloques en el directorio de
+staging, sin pasar por Chrome ni por la carpeta de descargas. Si la página no
+tiene ese formulario (exportación por JavaScript) o no se reconocen sus campos
+de fecha y proyecto, se lanza ``ExportError`` y nada se adivina.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import time
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urljoin
+
+import requests
+
+from creditos.prospectos_client import BASE, login_session
+
+logger = logging.getLogger(__name__)
+
+_VALIDA_SESION_URL = f"{BASE}/Comercial/OperacionComercial/ValidaSesion"
+
+# Campos de fecha del formulario (dd/mm/yyyy), reconocidos por nombre o id
+_START_FIELD_RE = re.compile(r"fecha.*(ini|desde)|(ini|desde).*fecha", re.IGNORECASE)
+_END_FIELD_RE = re.compile(r"fecha.*(fin|hasta)|(fin|hasta).*fecha", re.IGNORECASE)
+_POSTBACK_RE = re.compile(r"__doPostBack\(\s*'([^']*)'\s*,\s*'([^']*)'")
+CHUNK_SIZE = 1024 * 1024
+
+# Firmas de los formatos que exporta Evolta
+_SIGNATURES = (
+    (b"PK\x03\x04", ".xlsx"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", ".xls"),
+)
+_FILENAME_RE = re.compile(r"filename\*?=(?:UTF-8'')?\"?([^\";]+)", re.IGNORECASE)
+
+
+class ExportError(RuntimeError):
+    pass
+
+
+class _Form:
+    def __init__(self, action: str, method: str) -> None:
+        self.action = action
+        self.method = method
+        # (nombre, id, valor) en el orden del documento
+        self.fields: list[tuple[str, str, str]] = []
+        # nombre del select -> [(valor, texto)]
+        self.options: dict[str, list[tuple[str, str]]] = {}
+        self.export_button: dict | None = None
+
+
+class _FormParser(HTMLParser):
+    """Formularios de la página con sus campos, como los enviaría el navegador."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.forms: list[_Form] = []
+        self._form: _Form | None = None
+        self._select: tuple[str, str] | None = None
+        self._option: list | None = None
+        self._selected: dict[str, str] = {}
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or "" for name, value in attrs}
+        if tag == "form":
+            method = "get" if attrs.get("method", "get").lower() == "get" else "post"
+            self._form = _Form(attrs.get("action", ""), method)
+            self.forms.append(self._form)
+            return
+        if self._form is None:
+            return
+        name, element_id = attrs.get("name", ""), attrs.get("id", "")
+        label = f"{element_id} {name} {attrs.get('value', '')}".lower()
+        if tag in ("input", "button", "a") and "export" in label:
+            self._form.export_button = attrs
+        if tag == "input" and name:
+            kind = attrs.get("type", "text").lower()
+            if kind in ("submit", "button", "image", "reset", "file"):
+                return
+            if kind in ("checkbox", "radio") and "checked" not in attrs:
+                return
+            self._form.fields.append((name, element_id, attrs.get("value", "")))
+        elif tag == "select" and name:
+            self._select = (name, element_id)
+            self._form.options[name] = []
+        elif tag == "option" and self._select:
+            self._option = [attrs.get("value"), "", "selected" in attrs]
+        elif tag == "textarea" and name:
+            self._form.fields.append((name, element_id, ""))
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option[1] += data
+
+    def handle_endtag(self, tag):
+        if tag == "option" and self._option is not None and self._select:
+            value, text, selected = self._option
+            text = text.strip()
+            value = text if value is None else value
+            self._form.options[self._select[0]].append((value, text))
+            if selected or self._select[0] not in self._selected:
+                self._selected[self._select[0]] = value
+            self._option = None
+        elif tag == "select" and self._select:
+            name, element_id = self._select
+            self._form.fields.append((name, element_id, self._selected.get(name, "")))
+            self._select = None
+        elif tag == "form":
+            self._form = None
+
+
+def _export_form(page_url: str, html: str):
+    """Acción, método y campos del formulario que contiene el botón Exportar."""
+    parser = _FormParser()
+    parser.feed(html)
+    form = next((form for form in parser.forms if form.export_button is not None), None)
+    if form is None:
+        return None
+    fields = {name: value for name, _, value in form.fields}
+    button = form.export_button
+    postback = _POSTBACK_RE.search(f"{button.get('href', '')} {button.get('onclick', '')}")
+    if postback:
+        fields["__EVENTTARGET"], fields["__EVENTARGUMENT"] = postback.groups()
+    elif button.get("name"):
+        fields[button["name"]] = button.get("value", "")
+    return urljoin(page_url, form.action or page_url), form.method, fields, form
+
+
+def _fill_filters(report, form, fields: dict, start_date: str, end_date: str) -> None:
+    """Pone el rango de fechas y la opción de todos los proyectos en ``fields``."""
+    start = [name for name, element_id, _ in form.fields if _START_FIELD_RE.search(f"{name} {element_id}")]
+    end = [name for name, element_id, _ in form.fields if _END_FIELD_RE.search(f"{name} {element_id}")]
+    if len(start) != 1 or len(end) != 1:
+        raise ExportError(f"Campos de fecha no reconocidos en {report.url}: {start} / {end}")
+    fields[start[0]] = start_date
+    fields[end[0]] = end_date
+
+    selectors = {selector.lower() for selector in report.project_selectors}
+    project = next(
+        (name for name, element_id, _ in form.fields
+         if name in form.options and {name.lower(), element_id.lower()} & selectors),
+        None,
+    )
+    if project is None:
+        raise ExportError(f"Selector de proyecto no encontrado en {report.url}")
+    for candidate_type, candidate in report.all_project_candidates:
+        for value, text in form.options[project]:
+            if (text if candidate_type == "text" else value) == candidate:
+                fields[project] = value
+                return
+    raise ExportError(f"Opción de todos los proyectos no encontrada en {report.url}")
+
+
+def _extension(response: requests.Response, head: bytes) -> str | None:
+    for signature, extension in _SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    disposition = response.headers.get("Content-Disposition", "")
+    match = _FILENAME_RE.search(disposition)
+    if match and match.group(1).lower().endswith(".csv"):
+        return ".csv"
+    return None
+
+
+class EvoltaExportClient:
+    def __init__(self, evolta_user: str, evolta_pass: str) -> None:
+        self._user = evolta_user
+        self._pass = evolta_pass
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Accept": "*/*",
+            "Origin": BASE,
+        })
+
+    def login(self) -> None:
+        login_session(self.session, self._user, self._pass)
+
+    def _open_report_page(self, report) -> str:
+        # La página del reporte deja en la sesión el contexto que espera la exportación
+        resp = self.session.get(report.url, timeout=60, allow_redirects=False)
+        if resp.status_code in (301, 302, 303, 307, 308):
+            raise ExportError(
+                f"{report.url} redirigido a {resp.headers.get('Location', '')}: sesión no válida"
+            )
+        resp.raise_for_status()
+        html = resp.text
+        self.session.post(
+            _VALIDA_SESION_URL,
+            data="",
+            headers={
+                "X-Requested-With": "XMLHttpRequest",
+                "Content-Type": "application/json; charset=utf-8",
+                "Referer": report.url,
+            },
+            timeout=30,
+        )
+        return html
+
+    def export_report(self, name: str, report, start_date: str, end_date: str, directory: str | Path) -> Path:
+        """Descarga ``name`` en ``directory`` como ``<name>.<ext>`` y devuelve la ruta."""
+        directory = Path(directory)
+        export = _export_form(report.url, self._open_report_page(report))
+        if export is None:
+            raise ExportError(f"{name}: {report.url} no tiene un formulario con el botón Exportar")
+        action, method, form_data, form = export
+        _fill_filters(report, form, form_data, start_date, end_date)
+
+        last_exc: Exception | None = None
+        for attempt in range(3):
+            try:
+                resp = self.session.request(
+                    method.upper(),
+                    action,
+                    **({"params": form_data} if method == "get" else {"data": form_data}),
+                    headers={"Referer": report.url},
+                    timeout=(30, 300),
+                    stream=True,
+                    allow_redirects=False,
+                )
+                break
+            except requests.RequestException as exc:
+                last_exc = exc
+                if attempt < 2:
+                    time.sleep(5 * (attempt + 1))
+        else:
+            raise ExportError(f"{name}: no se pudo contactar {action}: {last_exc}") from last_exc
+
+        with resp:
+            if resp.status_code in (301, 302, 303, 307, 308):
+                raise ExportError(
+                    f"{name}: exportación redirigida a {resp.headers.get('Location', '')}"
+                )
+            resp.raise_for_status()
+            chunks = resp.iter_content(CHUNK_SIZE)
+            head = next(chunks, b"")
+            extension = _extension(resp, head)
+            if extension is None:
+                # Evolta responde HTML (login, error o "sin registros") en lugar del archivo
+                raise ExportError(f"{name}: la respuesta no es un reporte ({resp.headers.get('Content-Type')})")
+
+            target = directory / f"{name}{extension}"
+            pending = directory / f".{name}{extension}.part"
+            try:
+                with open(pending, "wb") as handle:
+                    handle.write(head)
+                    for chunk in chunks:
+                        handle.write(chunk)
+                os.replace(pending, target)
+            finally:
+                pending.unlink(missing_ok=True)
+
+        logger.info(f"Exported {name} over HTTP: {target} ({target.stat().st_size} bytes)")
+        return target
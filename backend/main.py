@@ -1,23 +1,37 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
-import zipfile
-import io
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from typing import Optional
 from pydantic import BaseModel
 from datetime import date, datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
 import logging
 import os
 import shutil
+import threading
 import uuid
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
 from scraper import EvoltaScraper, DOWNLOAD_DIR, get_default_period
 from scraper import get_credentials
+from browser_worker import EVOLTA_BROWSER_WORKER, BrowserWorker
 from processor import SemaforoProcessor
 from meta_store import build_sync_status_store
-from report_pipeline import iter_downloadable_files, publish_report_set, validate_report_set
+from report_pipeline import (
+    DOWNLOAD_ARCHIVE_NAME,
+    REPORT_DEFINITIONS,
+    VersionNotFoundError,
+    activate_version,
+    compact_backups,
+    iter_downloadable_files,
+    iter_zip_stream,
+    list_versions,
+    prebuilt_archive,
+    publish_report_set,
+    published_reports,
+    validate_report_set,
+)
 from creditos.extraccion import extraer as extraer_credito
 from creditos.jobs import CreditJobService, build_summary
 from creditos.store import build_credit_store
@@ -70,6 +84,8 @@ credit_job_service = CreditJobService(
     credentials=get_credentials,
 )
 credit_scheduler = None
+# Chrome persistente entre sincronizaciones (opcional, EVOLTA_BROWSER_WORKER)
+browser_worker = BrowserWorker() if EVOLTA_BROWSER_WORKER else None
 
 
 class MetaUpdate(BaseModel):
@@ -117,14 +133,53 @@ def debug_metas():
 @app.get("/api/semaforo")
 def get_semaforo():
     try:
-        processor.load_data()
-        metrics = processor.calculate_metrics()
+        metrics = processor.get_metrics()
         return {"data": metrics, "status": sync_status_store.get_status()}
     except Exception as e:
         logger.error(f"Error getting semaforo: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _parse_optional_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%d/%m/%Y").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato inválido. Use dd/mm/yyyy")
+
+
+@app.get("/api/semaforo/drilldown")
+def get_semaforo_drilldown(
+    group_by: str = "proyecto",
+    proyecto: Optional[str] = None,
+    canal: Optional[str] = None,
+    tipo_canal: Optional[str] = None,
+    responsable: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+):
+    """Métricas reales agrupadas por proyecto, canal, tipo_canal, responsable y/o fecha"""
+    inicio = _parse_optional_date(start_date)
+    fin = _parse_optional_date(end_date)
+    if inicio and fin and inicio > fin:
+        raise HTTPException(status_code=400, detail="La fecha de inicio no puede ser mayor a la fecha fin")
+    dimensions = [dimension.strip() for dimension in group_by.split(",") if dimension.strip()]
+    filters = {
+        "proyecto": proyecto,
+        "canal": canal,
+        "tipo_canal": tipo_canal,
+        "responsable": responsable,
+    }
+    try:
+        return processor.drilldown(dimensions, filters, inicio, fin)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting semaforo drilldown: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/metas")
 def get_metas():
     """Obtiene todas las metas para edición"""
@@ -145,6 +200,17 @@ class CreditAnalysisRequest(BaseModel):
     end_date: str
 
 
+def _compact_backups_in_background():
+    """Retención y compresión de respaldos sin demorar la sincronización."""
+    def run():
+        try:
+            compact_backups(DOWNLOAD_DIR)
+        except Exception as e:
+            logger.error(f"Backup compaction failed: {e}")
+
+    threading.Thread(target=run, name="backup-compaction", daemon=True).start()
+
+
 def run_sync_task(start_date: Optional[str] = None, end_date: Optional[str] = None):
     sync_status_store.set_syncing(True, "Descargando reportes de Evolta...")
     staging_dir = None
@@ -158,8 +224,11 @@ def run_sync_task(start_date: Optional[str] = None, end_date: Optional[str] = No
         staging_dir = Path(DOWNLOAD_DIR) / ".staging" / uuid.uuid4().hex
         staging_dir.mkdir(parents=True, exist_ok=False)
 
-        sync_scraper = EvoltaScraper(download_dir=str(staging_dir))
-        sync_scraper.run_sync(start_date, end_date)
+        if browser_worker is not None:
+            browser_worker.run_sync(str(staging_dir), start_date, end_date)
+        else:
+            sync_scraper = EvoltaScraper(download_dir=str(staging_dir))
+            sync_scraper.run_sync(start_date, end_date)
 
         sync_status_store.set_syncing(True, "Validando los cuatro reportes...")
         validation = validate_report_set(staging_dir, period_start, period_end)
@@ -167,13 +236,22 @@ def run_sync_task(start_date: Optional[str] = None, end_date: Optional[str] = No
         sync_status_store.set_syncing(True, "Respaldando y publicando datos...")
         get_all_metas = getattr(processor, "get_all_metas", None)
         goals = get_all_metas() if callable(get_all_metas) else getattr(processor, "meta", {})
-        publish_report_set(staging_dir, DOWNLOAD_DIR, validation, goals=goals)
-
-        processor.load_data()
+        published = publish_report_set(staging_dir, DOWNLOAD_DIR, validation, goals=goals)
+        if published.get("unchanged"):
+            # Mismos datos que el conjunto activo: se conservan archivos y caches
+            sync_status_store.set_completed(
+                f"Sincronización completada sin cambios: {start_date} - {end_date}"
+            )
+            logger.info("Sync completed with no data changes")
+            return
+
+        processor.invalidate_metrics()
+        processor.load_data(preparsed=published.get("frames"))
         sync_status_store.set_completed(
             f"Sincronización completada: {start_date} - {end_date}"
         )
         logger.info("Sync completed successfully")
+        _compact_backups_in_background()
     except Exception as e:
         logger.error(f"Sync failed: {e}")
         sync_status_store.set_error(f"Error: {str(e)}")
@@ -196,6 +274,30 @@ def trigger_sync(request: SyncRequest, background_tasks: BackgroundTasks):
     return {"message": "Sincronización iniciada"}
 
 
+@app.get("/api/versions")
+def get_versions():
+    """Conjuntos publicados disponibles para volver atrás."""
+    return {"versions": list_versions(DOWNLOAD_DIR)}
+
+
+@app.post("/api/versions/{version}/activate")
+def activate_published_version(version: str):
+    """Rollback: vuelve a publicar una versión anterior cambiando solo el puntero."""
+    if sync_status_store.get_status().get("state") == "Syncing":
+        raise HTTPException(
+            status_code=400,
+            detail="Ya hay una sincronización en progreso. Por favor espere."
+        )
+    try:
+        manifest = activate_version(DOWNLOAD_DIR, version)
+    except VersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    processor.invalidate_metrics()
+    processor.load_data()
+    logger.info(f"Rolled back to version {version}")
+    return {"message": f"Versión {version} activada", "period": manifest.get("period")}
+
+
 def _validate_credit_dates(request: CreditAnalysisRequest) -> None:
     try:
         inicio = datetime.strptime(request.start_date, "%d/%m/%Y")
@@ -305,12 +407,16 @@ async def startup_event():
         start_credit_scheduler()
     except Exception as e:
         logger.error(f"Error starting credit scheduler: {e}")
+    if browser_worker is not None:
+        browser_worker.warm()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     if credit_scheduler is not None:
         credit_scheduler.shutdown(wait=False)
+    if browser_worker is not None:
+        browser_worker.shutdown()
 
 
 @app.post("/api/reset-status")
@@ -333,22 +439,84 @@ def update_metas_bulk(update: BulkMetaUpdate):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    """If-None-Match tiene prioridad; If-Modified-Since solo se usa sin él."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(stat_result.st_mtime) <= since.timestamp()
+    return False
+
+
+def _file_download(request: Request, path: Path, filename: str, media_type: str, etag: Optional[str] = None):
+    """Descarga con sendfile, Range/If-Range (FileResponse) y GET condicional (304)."""
+    stat_result = path.stat()
+    etag = etag or f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if _not_modified(request, etag, stat_result):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        path, filename=filename, media_type=media_type, headers=headers, stat_result=stat_result
+    )
+
+
+REPORT_MEDIA_TYPES = {
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.xls': 'application/vnd.ms-excel',
+    '.csv': 'text/csv',
+}
+
+
 @app.get('/api/download-reports')
-def download_reports():
+def download_reports(request: Request):
     try:
         if not os.path.exists(DOWNLOAD_DIR):
             raise HTTPException(status_code=404, detail='No hay reportes descargados')
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            files = list(iter_downloadable_files(DOWNLOAD_DIR))
-            if not files:
-                raise HTTPException(status_code=404, detail='No hay reportes publicados')
-            for file_path in files:
-                zip_file.write(file_path, file_path.name)
-        zip_buffer.seek(0)
-        return StreamingResponse(zip_buffer, media_type='application/zip', headers={'Content-Disposition': 'attachment; filename=reportes_evolta.zip'})
+        archive = prebuilt_archive(DOWNLOAD_DIR)
+        if archive is not None:
+            return _file_download(request, archive, DOWNLOAD_ARCHIVE_NAME, 'application/zip')
+        # Sin ZIP armado al publicar (instalaciones previas): se genera por bloques
+        files = list(iter_downloadable_files(DOWNLOAD_DIR))
+        if not files:
+            raise HTTPException(status_code=404, detail='No hay reportes publicados')
+        return StreamingResponse(iter_zip_stream(files), media_type='application/zip', headers={'Content-Disposition': f'attachment; filename={DOWNLOAD_ARCHIVE_NAME}'})
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f'Error zipping reports: {e}')
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get('/api/download-reports/{report}')
+def download_report(report: str, request: Request):
+    """Descarga un solo reporte publicado (nombre del reporte o clave: ReporteVenta, ventas...)."""
+    name = next(
+        (
+            key
+            for key, definition in REPORT_DEFINITIONS.items()
+            if report.lower() in (key.lower(), definition.data_key)
+        ),
+        None,
+    )
+    if name is None:
+        raise HTTPException(status_code=404, detail='Reporte no encontrado')
+    published = published_reports(DOWNLOAD_DIR)
+    path = published.files().get(name)
+    if path is None or not path.exists():
+        raise HTTPException(status_code=404, detail='No hay reportes publicados')
+    entry = published.entry(name) or {}
+    # El sha256 del manifest identifica el contenido: sirve de ETag fuerte
+    etag = f'"{entry["sha256"]}"' if entry.get("sha256") else None
+    media_type = REPORT_MEDIA_TYPES.get(path.suffix.lower(), 'application/octet-stream')
+    return _file_download(request, path, path.name, media_type, etag)
@@ -156,12 +156,18 @@ class SupabaseSyncStatusStore(SyncStatusStore):
 
 
 class MetaStore:
+    # Contador local de cambios de metas; sirve como clave de cache de resultados.
+    version: int = 0
+
     def get_all(self) -> MetaDict:
         raise NotImplementedError
 
     def upsert_project(self, project: str, metas: Dict[str, int]) -> None:
         raise NotImplementedError
 
+    def bump_version(self) -> None:
+        self.version += 1
+
 
 @dataclass
 class FileMetaStore(MetaStore):
@@ -191,6 +197,7 @@ class FileMetaStore(MetaStore):
                 json.dump(all_metas, f, indent=2, ensure_ascii=False)
         except Exception as e:
             logger.error(f"Error writing meta file {self.path}: {e}")
+        self.bump_version()
 
 
 @dataclass
@@ -261,6 +268,7 @@ class SupabaseMetaStore(MetaStore):
                 logger.error(f"Supabase insert failed: {r.status_code} {r.text}")
                 raise RuntimeError(f"Supabase upsert failed: {r.status_code} {r.text}")
         
+        self.bump_version()
         logger.info(f"Upserted metas for {project}: {payload}")
 
 
@@ -0,0 +1,133 @@
+"""Cubo de agregados para el drill-down del semáforo.
+
+Al cargar cada reporte se agrupan sus medidas (las mismas máscaras que usa
+``metrics_engine``) por proyecto, canal, tipo de canal, responsable y día.
+Las consultas de drill-down filtran y re-agrupan ese cubo, que tiene una fila
+por combinación observada, sin volver a recorrer los reportes.
+"""
+from datetime import date
+from typing import Dict, Iterable, List, Mapping, Sequence
+
+import pandas as pd
+
+from metrics_engine import METRIC_KEYS, channel_types, report_measures
+
+
+CUBE_DIMENSIONS = ("proyecto", "canal", "tipo_canal", "responsable", "fecha")
+SIN_CANAL = "SIN CANAL"
+SIN_RESPONSABLE = "SIN RESPONSABLE"
+
+
+def empty_cube() -> pd.DataFrame:
+    columns = {dimension: pd.Series(dtype="category") for dimension in CUBE_DIMENSIONS}
+    columns["fecha"] = pd.Series(dtype="datetime64[ns]")
+    return pd.DataFrame(columns)
+
+
+def _dimension(df: pd.DataFrame, column: str, missing: str) -> pd.Categorical:
+    if column not in df:
+        return pd.Categorical([missing] * len(df))
+    text = df[column].astype("string")
+    blank = text.isna() | text.isin(["", "NAN", "NONE"])
+    return pd.Categorical(text.where(~blank, missing))
+
+
+def build_report_cube(key: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Agrega las medidas de un reporte canonizado por las dimensiones del cubo."""
+    measures = report_measures(key, df)
+    if not measures:
+        return empty_cube()
+
+    canal = _dimension(df, "ComoSeEntero", SIN_CANAL)
+    frame = pd.DataFrame(
+        {
+            "proyecto": df["Proyecto"],
+            "canal": canal,
+            "tipo_canal": channel_types(pd.Series(canal, index=df.index)),
+            "responsable": _dimension(df, "Responsable", SIN_RESPONSABLE),
+            "fecha": df["Fecha"] if "Fecha" in df else pd.NaT,
+            **{metric: mask.to_numpy(dtype=int) for metric, mask in measures.items()},
+        },
+        index=df.index,
+    )
+    frame = frame[frame["proyecto"].notna()]
+    cube = (
+        frame.groupby(list(CUBE_DIMENSIONS), observed=True, dropna=False, sort=False)[list(measures)]
+        .sum()
+        .reset_index()
+    )
+    # Combinaciones sin ninguna fila que cuente no aportan al drill-down
+    return cube[cube[list(measures)].to_numpy().any(axis=1)].reset_index(drop=True)
+
+
+def combine_cubes(cubes: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Une los cubos de cada reporte; las métricas ausentes en un reporte valen 0."""
+    parts = [cube for cube in cubes if not cube.empty]
+    if not parts:
+        return empty_cube()
+    combined = pd.concat(parts, ignore_index=True, sort=False)
+    for metric in METRIC_KEYS:
+        if metric in combined:
+            combined[metric] = combined[metric].fillna(0).astype(int)
+    for dimension in CUBE_DIMENSIONS:
+        if dimension != "fecha":
+            combined[dimension] = combined[dimension].astype("category")
+    return combined
+
+
+def _format_value(value):
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat()
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def query_cube(
+    cube: pd.DataFrame,
+    group_by: Sequence[str] = ("proyecto",),
+    filters: Mapping[str, str | None] | None = None,
+    start_date: date | None = None,
+    end_date: date | None = None,
+) -> Dict[str, object]:
+    """Filtra el cubo y lo re-agrupa por ``group_by``.
+
+    ``filters`` acepta valores exactos por dimensión (sin distinguir
+    mayúsculas); el rango de fechas es inclusivo. Devuelve las filas
+    agrupadas y los totales del corte.
+    """
+    unknown = [dimension for dimension in group_by if dimension not in CUBE_DIMENSIONS]
+    unknown += [dimension for dimension in (filters or {}) if dimension not in CUBE_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Dimensiones no soportadas: {', '.join(unknown)}")
+
+    measures = [metric for metric in METRIC_KEYS if metric in cube]
+    mask = pd.Series(True, index=cube.index)
+    for dimension, value in (filters or {}).items():
+        if value:
+            mask &= cube[dimension].astype(str) == value.upper().strip()
+    if start_date is not None:
+        mask &= cube["fecha"] >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= cube["fecha"] <= pd.Timestamp(end_date)
+    sliced = cube[mask]
+
+    rows: List[dict] = []
+    if group_by:
+        grouped = (
+            sliced.groupby(list(group_by), observed=True, dropna=False)[measures]
+            .sum()
+            .reset_index()
+        )
+        rows = [
+            {column: _format_value(value) for column, value in record.items()}
+            for record in grouped.to_dict(orient="records")
+        ]
+
+    return {
+        "group_by": list(group_by),
+        "rows": rows,
+        "totals": {metric: int(sliced[metric].sum()) for metric in measures},
+    }
@@ -0,0 +1,195 @@
+"""Motor de conteo del semáforo.
+
+Trabaja sobre los reportes ya canonizados por ``report_pipeline.canonicalize``
+(proyecto como categoría, filtros como booleanos) y calcula todas las métricas
+de todos los proyectos con una única agregación agrupada por proyecto.
+"""
+import logging
+import re
+from typing import Callable, Dict, Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+ProjectCounts = Dict[str, Dict[str, int]]
+Measures = Dict[str, pd.Series]
+
+# Fuentes digitales según Excel de Santa Beatriz (ContarLead_digital.bas)
+DIGITAL_KEYWORDS = (
+    'META',           # META ADS
+    'FACEBOOK',       # Facebook Ads
+    'NEXO',           # NEXO INMOBILIARIO, FERIA NEXO INMOBILIARIO
+    'WHATSAPP',       # WHATSAPP, WHATSAPP FERIA
+    'PAGINA WEB',     # PAGINA WEB
+    'WEB',            # Variaciones de web
+    'TIK TOK',        # TIK TOK ADS
+    'TIKTOK',         # Variación sin espacio
+    'FERIA',          # FERIA NEXO INMOBILIARIO, WHATSAPP FERIA
+    'ADS',            # META ADS, TIK TOK ADS
+    'DIGITAL',        # Cualquier fuente digital
+    'INSTAGRAM',      # Instagram
+    'GOOGLE',         # Google Ads
+)
+DIGITAL_PATTERN = '|'.join(DIGITAL_KEYWORDS)
+DIGITAL_REGEX = re.compile(DIGITAL_PATTERN)
+
+CANAL_DIGITAL = "DIGITAL"
+CANAL_NO_DIGITAL = "NO DIGITAL"
+
+METRIC_KEYS = (
+    "leads_totales",
+    "leads_dni",
+    "leads_digitales",
+    "contactados",
+    "visitas",
+    "separaciones",
+    "ventas",
+)
+
+
+def channel_table(categories: Iterable[str]) -> pd.DataFrame:
+    """
+    Clasifica cada valor distinto de ComoSeEntero una sola vez.
+    Devuelve una fila por categoría (en el mismo orden, así se indexa con los
+    códigos de la categórica) con ``digital`` y ``tipo_canal``.
+    """
+    canales = [str(category) for category in categories]
+    digital = np.fromiter(
+        (DIGITAL_REGEX.search(canal) is not None for canal in canales), dtype=bool, count=len(canales)
+    )
+    return pd.DataFrame({
+        "canal": canales,
+        "digital": digital,
+        "tipo_canal": np.where(digital, CANAL_DIGITAL, CANAL_NO_DIGITAL),
+    })
+
+
+def _channel_codes(channel: pd.Series) -> tuple[pd.DataFrame, np.ndarray]:
+    values = channel if isinstance(channel.dtype, pd.CategoricalDtype) else channel.astype("category")
+    return channel_table(values.cat.categories), values.cat.codes.to_numpy()
+
+
+def digital_mask(channel: pd.Series) -> pd.Series:
+    """Indica qué valores de ComoSeEntero corresponden a una fuente digital."""
+    table, codes = _channel_codes(channel)
+    # El código -1 (nulo) se indexa al centinela False agregado al final
+    lookup = np.append(table["digital"].to_numpy(), False)
+    return pd.Series(lookup[codes], index=channel.index)
+
+
+def channel_types(channel: pd.Series) -> pd.Categorical:
+    """DIGITAL / NO DIGITAL por fila, resuelto desde la tabla de canales."""
+    table, codes = _channel_codes(channel)
+    digital = np.append(table["digital"].to_numpy(), False)[codes]
+    return pd.Categorical.from_codes(
+        np.where(digital, 0, 1), categories=[CANAL_DIGITAL, CANAL_NO_DIGITAL]
+    )
+
+
+def _prospectos_measures(df: pd.DataFrame) -> Measures:
+    """
+    ContarLeadTotales.bas / ContarLead_digital.bas:
+    Proyecto + LeadUnicoxMesProyecto = "SI" + TipoInmueble = "DEPARTAMENTO",
+    más DNI, fuente digital o SubEstado = "CONTACTADO" según la métrica.
+    """
+    if "Proyecto" not in df or "LeadUnico" not in df:
+        logger.warning(
+            f"Columnas no encontradas para LEADS: Proyecto={'Proyecto' in df}, "
+            f"LeadUnicoxMesProyecto={'LeadUnico' in df}"
+        )
+        return {}
+
+    base = df["LeadUnico"]
+    if "Departamento" in df:
+        base = base & df["Departamento"]
+
+    measures = {"leads_totales": base}
+
+    # Si no hay columna de DNI, se cuentan solo leads únicos
+    if "ConDocumento" in df:
+        measures["leads_dni"] = base & df["ConDocumento"]
+    else:
+        measures["leads_dni"] = base
+
+    if "ComoSeEntero" in df:
+        measures["leads_digitales"] = base & digital_mask(df["ComoSeEntero"])
+    else:
+        logger.warning("Columnas no encontradas para LEADS DIGITALES")
+
+    if "Contactado" in df:
+        measures["contactados"] = base & df["Contactado"]
+    else:
+        logger.warning("Columnas no encontradas para PROSPECTOS CONTACTADOS")
+
+    return measures
+
+
+def _visitas_measures(df: pd.DataFrame) -> Measures:
+    """Proyecto + VisitaUnicaxMesProyecto = "SI" + TipoInmueble = "DEPARTAMENTO"."""
+    if "Proyecto" not in df:
+        logger.warning("Columna de proyecto no encontrada para VISITAS")
+        return {}
+
+    mask = pd.Series(True, index=df.index)
+    if "VisitaUnica" in df:
+        mask = mask & df["VisitaUnica"]
+    else:
+        logger.warning("Columna VisitaUnicaxMesProyecto no encontrada para VISITAS")
+
+    if "Departamento" in df:
+        mask = mask & df["Departamento"]
+    else:
+        logger.warning("Columna TipoInmueble no encontrada para VISITAS")
+
+    return {"visitas": mask}
+
+
+def _departamentos_measures(df: pd.DataFrame, metric: str) -> Measures:
+    """ContarSeparaciones.bas / ContarVentas.bas: proyecto + TipoInmueble_1 = "Departamento"."""
+    if "Proyecto" not in df or "Departamento" not in df:
+        logger.warning(f"Columnas no encontradas para {metric.upper()}")
+        return {}
+    return {metric: df["Departamento"]}
+
+
+REPORT_MEASURES: Dict[str, Callable[[pd.DataFrame], Measures]] = {
+    'prospectos': _prospectos_measures,
+    'ventas': lambda df: _departamentos_measures(df, 'ventas'),
+    'separaciones': lambda df: _departamentos_measures(df, 'separaciones'),
+    'visitas': _visitas_measures,
+}
+
+
+def report_measures(key: str, df: pd.DataFrame) -> Measures:
+    """Máscaras booleanas {métrica: filas que cuentan} de un reporte canonizado."""
+    if df is None or df.empty:
+        return {}
+    return REPORT_MEASURES[key](df)
+
+
+def count_report(key: str, df: pd.DataFrame) -> ProjectCounts:
+    """Conteos {PROYECTO: {métrica: n}} de un reporte canonizado."""
+    measures = report_measures(key, df)
+    if not measures:
+        return {}
+    frame = pd.DataFrame(dict(measures), index=df.index)
+    totals = frame.groupby(df["Proyecto"], observed=True, sort=False).sum()
+    return {
+        str(name): {metric: int(value) for metric, value in row.items()}
+        for name, row in totals.iterrows()
+    }
+
+
+def merge_counts(report_counts: Iterable[ProjectCounts]) -> ProjectCounts:
+    totals: ProjectCounts = {}
+    for counts in report_counts:
+        for project, metrics in counts.items():
+            totals.setdefault(project, {}).update(metrics)
+    return totals
+
+
+def count_all(data: Mapping[str, pd.DataFrame]) -> ProjectCounts:
+    return merge_counts(count_report(key, data.get(key)) for key in REPORT_MEASURES)
@@ -1,12 +1,26 @@
 import os
-import glob
 import pandas as pd
 import logging
 import math
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import cached_property
+from types import MappingProxyType
+from typing import Mapping
 
 from meta_store import DEFAULT_META, build_meta_store
-from report_pipeline import TARGET_PROJECTS, lima_today
+from metrics_cube import build_report_cube, combine_cubes, query_cube
+from metrics_engine import count_report, merge_counts
+from report_cache import ReportCache, file_fingerprint, fingerprint_matches
+from report_pipeline import (
+    REPORT_DEFINITIONS,
+    TARGET_PROJECTS,
+    lima_today,
+    parse_report,
+    published_reports,
+    run_per_report,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,11 +28,55 @@ logger = logging.getLogger(__name__)
 # Usar directorio de descargas para persistencia (volumen en Railway)
 DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", os.path.join(os.path.dirname(__file__), "downloads"))
 
+
+@dataclass(frozen=True)
+class LoadedReport:
+    """Reporte canónico en memoria con la identidad de su archivo, sus conteos y su cubo."""
+    path: str
+    fingerprint: dict
+    frame: pd.DataFrame
+    counts: dict
+    cube: pd.DataFrame
+
+    @classmethod
+    def build(cls, key, path, fingerprint, frame):
+        return cls(path, fingerprint, frame, count_report(key, frame), build_report_cube(key, frame))
+
+
+@dataclass(frozen=True)
+class DataSnapshot:
+    """
+    Vista inmutable de los reportes cargados.
+    Se construye aparte y reemplaza a la anterior en una sola asignación, así los
+    lectores nunca ven una carga a medias.
+    """
+    reports: Mapping[str, LoadedReport] = field(default_factory=lambda: MappingProxyType({}))
+    # key -> (ruta, fingerprint) de cada archivo considerado, incluso si falló su lectura
+    sources: Mapping[str, tuple] = field(default_factory=lambda: MappingProxyType({}))
+
+    @property
+    def data(self):
+        return {key: report.frame for key, report in self.reports.items()}
+
+    @property
+    def counts(self):
+        return merge_counts(report.counts for report in self.reports.values())
+
+    @cached_property
+    def cube(self):
+        """Cubo de drill-down de todos los reportes (se une una vez por snapshot)."""
+        return combine_cubes(report.cube for report in self.reports.values())
+
+
 class SemaforoProcessor:
     def __init__(self, download_dir):
         self.download_dir = download_dir
         self.meta_file = os.path.join(download_dir, "meta_data.json")
-        self.data = {}
+        self._snapshot = DataSnapshot()
+        self._rebuild_lock = threading.Lock()
+        self.report_cache = ReportCache(download_dir)
+        self.published = published_reports(download_dir)
+        self._metrics_cache = None
         self.meta_store = build_meta_store(download_dir)
         self.meta = self._load_meta()
         logger.info(f"SemaforoProcessor initialized. Meta file (fallback): {self.meta_file}")
@@ -37,6 +95,7 @@ class SemaforoProcessor:
     def save_meta(self, new_meta):
         """Guarda metas (preferir upserts por proyecto; este método queda por compatibilidad)."""
         self.meta = new_meta
+        self.invalidate_metrics()
         try:
             for project, metas in self.meta.items():
                 self.meta_store.upsert_project(project, metas)
@@ -44,385 +103,168 @@ class SemaforoProcessor:
         except Exception as e:
             logger.error(f"Error saving metas to store: {e}")
 
-    def _get_latest_file(self, prefix):
-        """Busca el archivo más reciente con el prefijo dado"""
-        for ext in ['.xlsx', '.xls', '.csv']:
-            pattern = os.path.join(self.download_dir, f"{prefix}*{ext}")
-            files = glob.glob(pattern)
-            if files:
-                return max(files, key=os.path.getctime)
-        
-        logger.warning(f"No file found for prefix: {prefix}")
-        return None
+    @property
+    def data(self):
+        return self._snapshot.data
 
-    def _load_file(self, filepath):
-        """Carga un archivo Excel o CSV"""
-        if not filepath:
-            return pd.DataFrame()
-        
-        try:
-            if filepath.endswith('.csv'):
-                return pd.read_csv(filepath)
-            else:
-                return pd.read_excel(filepath, engine='openpyxl')
-        except Exception as e:
-            logger.error(f"Error loading {filepath}: {e}")
-            return pd.DataFrame()
-
-    def load_data(self):
-        """Carga todos los archivos de datos"""
-        self.data = {}
-        files_config = {
-            'prospectos': 'reporteProspectos',
-            'ventas': 'ReporteVenta',
-            'separaciones': 'Separacion',
-            'visitas': 'ReporteVisitas'
-        }
-        
-        for key, prefix in files_config.items():
-            filepath = self._get_latest_file(prefix)
-            if filepath:
-                df = self._load_file(filepath)
-                if not df.empty:
-                    df.columns = df.columns.str.strip()
-                    self.data[key] = df
-                    logger.info(f"Loaded {len(df)} rows for {key}")
+    def _current_sources(self):
+        """key -> archivo publicado, según manifest.json (glob solo si no existe)."""
+        files = self.published.files()
+        sources = {}
+        for name, definition in REPORT_DEFINITIONS.items():
+            path = files.get(name)
+            if path is None or not path.exists():
+                logger.warning(f"No file found for prefix: {definition.prefix}")
+                continue
+            sources[definition.data_key] = str(path)
+        return sources
 
-    def _get_meta_al_dia(self):
-        """Calcula el porcentaje del mes transcurrido (C11 en Excel)"""
-        today = lima_today()
-        dias_mes = (datetime(today.year, today.month + 1, 1) - datetime(today.year, today.month, 1)).days if today.month < 12 else 31
-        dia_actual = today.day
-        return dia_actual / dias_mes
+    def _is_unchanged(self, snapshot, key, filepath):
+        source = snapshot.sources.get(key)
+        if source is None or source[0] != filepath:
+            return False
+        try:
+            return fingerprint_matches(source[1], filepath)
+        except OSError:
+            return False
 
-    def _count_leads_totales(self, df, project):
-        """
-        ContarLeadTotales.bas:
-        Cuenta donde Proyecto = project AND LeadUnicoxMesProyecto = "SI" AND TipoInmueble = "DEPARTAMENTO"
-        """
-        if df.empty:
-            return 0
-        
-        # Buscar columnas (pueden variar de posición)
-        project_col = None
-        lead_unico_col = None
-        tipo_inmueble_col = None
-        
-        for col in df.columns:
-            col_upper = col.upper().strip()
-            if col_upper == 'PROYECTO':
-                project_col = col
-            elif col_upper == 'LEADUNICOXMESPROYECTO':
-                lead_unico_col = col
-            elif col_upper == 'TIPOINMUEBLE' or col_upper == 'TIPOINMUEBLE_1':
-                tipo_inmueble_col = col
-        
-        if project_col is None or lead_unico_col is None:
-            logger.warning(f"Columnas no encontradas para LEADS TOTALES: Proyecto={project_col}, LeadUnicoxMesProyecto={lead_unico_col}")
-            return 0
-        
-        mask = (
-            (df[project_col].astype(str).str.upper().str.strip() == project.upper()) &
-            (df[lead_unico_col].astype(str).str.upper().str.strip() == 'SI')
+    def _is_current(self, snapshot, sources):
+        return set(snapshot.sources) == set(sources) and all(
+            self._is_unchanged(snapshot, key, filepath) for key, filepath in sources.items()
         )
-        
-        # Agregar filtro de tipo inmueble si existe la columna
-        if tipo_inmueble_col is not None:
-            mask = mask & (df[tipo_inmueble_col].astype(str).str.upper().str.strip() == 'DEPARTAMENTO')
-        
-        return int(mask.sum())
 
-    def _count_leads_digitales(self, df, project):
-        """
-        ContarLead_digital.bas:
-        Cuenta donde Proyecto = project AND LeadUnicoxMesProyecto = "SI" 
-        AND ComoSeEntero contiene fuentes digitales AND TipoInmueble = "DEPARTAMENTO"
-        """
-        if df.empty:
-            return 0
-        
-        project_col = None
-        lead_unico_col = None
-        como_se_entero_col = None
-        tipo_inmueble_col = None
-        
-        for col in df.columns:
-            col_upper = col.upper().strip()
-            if col_upper == 'PROYECTO':
-                project_col = col
-            elif col_upper == 'LEADUNICOXMESPROYECTO':
-                lead_unico_col = col
-            elif col_upper == 'COMOSEENTERO':
-                como_se_entero_col = col
-            elif col_upper == 'TIPOINMUEBLE' or col_upper == 'TIPOINMUEBLE_1':
-                tipo_inmueble_col = col
-        
-        if project_col is None or lead_unico_col is None or como_se_entero_col is None:
-            logger.warning(f"Columnas no encontradas para LEADS DIGITALES")
-            return 0
-        
-        # Fuentes digitales según Excel de Santa Beatriz
-        # Busca palabras clave que identifiquen canales digitales
-        digital_keywords = [
-            'META',           # META ADS
-            'FACEBOOK',       # Facebook Ads
-            'NEXO',           # NEXO INMOBILIARIO, FERIA NEXO INMOBILIARIO
-            'WHATSAPP',       # WHATSAPP, WHATSAPP FERIA
-            'PAGINA WEB',     # PAGINA WEB
-            'WEB',            # Variaciones de web
-            'TIK TOK',        # TIK TOK ADS
-            'TIKTOK',         # Variación sin espacio
-            'FERIA',          # FERIA NEXO INMOBILIARIO, WHATSAPP FERIA
-            'ADS',            # META ADS, TIK TOK ADS
-            'DIGITAL',        # Cualquier fuente digital
-            'INSTAGRAM',      # Instagram
-            'GOOGLE',         # Google Ads
-        ]
-        
-        # Crear patrón regex para buscar cualquiera de las palabras clave
-        pattern = '|'.join(digital_keywords)
-        
-        mask = (
-            (df[project_col].astype(str).str.upper().str.strip() == project.upper()) &
-            (df[lead_unico_col].astype(str).str.upper().str.strip() == 'SI') &
-            (df[como_se_entero_col].astype(str).str.upper().str.contains(pattern, na=False, regex=True))
-        )
-        
-        # Agregar filtro de tipo inmueble si existe la columna
-        if tipo_inmueble_col is not None:
-            mask = mask & (df[tipo_inmueble_col].astype(str).str.upper().str.strip() == 'DEPARTAMENTO')
-        
-        return int(mask.sum())
+    @staticmethod
+    def _adoptable(preparsed, key, filepath):
+        entry = preparsed.get(key)
+        if entry is None:
+            return None
+        path, fingerprint, df = entry
+        try:
+            if os.path.samefile(path, filepath) and fingerprint_matches(fingerprint, filepath):
+                return fingerprint, df
+        except OSError:
+            pass
+        return None
 
-    def _count_leads_con_dni(self, df, project):
-        """
-        Cuenta leads únicos con DNI:
-        Proyecto = project AND LeadUnicoxMesProyecto = "SI" AND NroDocumento tiene valor AND TipoInmueble = "DEPARTAMENTO"
-        """
-        if df.empty:
-            return 0
-        
-        project_col = None
-        lead_unico_col = None
-        nro_doc_col = None
-        tipo_inmueble_col = None
-        
-        for col in df.columns:
-            col_upper = col.upper().strip()
-            if col_upper == 'PROYECTO':
-                project_col = col
-            elif col_upper == 'LEADUNICOXMESPROYECTO':
-                lead_unico_col = col
-            elif col_upper == 'NRODOCUMENTO':
-                nro_doc_col = col
-            elif col_upper == 'TIPOINMUEBLE' or col_upper == 'TIPOINMUEBLE_1':
-                tipo_inmueble_col = col
-        
-        if project_col is None or lead_unico_col is None:
-            return 0
-        
-        # Si no hay columna de DNI, contar solo leads únicos
-        if nro_doc_col is None:
-            mask = (
-                (df[project_col].astype(str).str.upper().str.strip() == project.upper()) &
-                (df[lead_unico_col].astype(str).str.upper().str.strip() == 'SI')
-            )
-        else:
-            mask = (
-                (df[project_col].astype(str).str.upper().str.strip() == project.upper()) &
-                (df[lead_unico_col].astype(str).str.upper().str.strip() == 'SI') &
-                (df[nro_doc_col].notna()) &
-                (df[nro_doc_col].astype(str).str.strip() != '')
-            )
-        
-        # Agregar filtro de tipo inmueble si existe la columna
-        if tipo_inmueble_col is not None:
-            mask = mask & (df[tipo_inmueble_col].astype(str).str.upper().str.strip() == 'DEPARTAMENTO')
-        
-        return int(mask.sum())
+    def _build_snapshot(self, previous, sources, preparsed=None):
+        reports = {}
+        fingerprints = {}
+        pending = {}
+        for definition in REPORT_DEFINITIONS.values():
+            key = definition.data_key
+            filepath = sources.get(key)
+            if not filepath:
+                continue
+            if self._is_unchanged(previous, key, filepath):
+                fingerprints[key] = previous.sources[key]
+                if key in previous.reports:
+                    reports[key] = previous.reports[key]
+                continue
+            adopted = self._adoptable(preparsed or {}, key, filepath)
+            if adopted is not None:
+                fingerprint, df = adopted
+                fingerprints[key] = (filepath, fingerprint)
+                reports[key] = LoadedReport.build(key, filepath, fingerprint, df)
+                logger.info(f"Adopted {len(df)} validated rows for {key}")
+                continue
+            df = self.report_cache.load(key, filepath)
+            if df is not None:
+                fingerprint = self.report_cache.fingerprint(key) or file_fingerprint(filepath)
+                fingerprints[key] = (filepath, fingerprint)
+                reports[key] = LoadedReport.build(key, filepath, fingerprint, df)
+                logger.info(f"Loaded {len(df)} rows for {key} (cache)")
+                continue
+            pending[key] = (definition, filepath, file_fingerprint(filepath))
 
-    def _count_prospectos_contactados(self, df, project):
-        """
-        Cuenta prospectos contactados:
-        Proyecto = project AND LeadUnicoxMesProyecto = "SI" AND SubEstado = "CONTACTADO" AND TipoInmueble = "DEPARTAMENTO"
-        """
-        if df.empty:
-            return 0
-        
-        project_col = None
-        lead_unico_col = None
-        subestado_col = None
-        tipo_inmueble_col = None
-        
-        for col in df.columns:
-            col_upper = col.upper().strip()
-            if col_upper == 'PROYECTO':
-                project_col = col
-            elif col_upper == 'LEADUNICOXMESPROYECTO':
-                lead_unico_col = col
-            elif col_upper == 'SUBESTADO':
-                subestado_col = col
-            elif col_upper == 'TIPOINMUEBLE' or col_upper == 'TIPOINMUEBLE_1':
-                tipo_inmueble_col = col
-        
-        if project_col is None or lead_unico_col is None or subestado_col is None:
-            logger.warning(f"Columnas no encontradas para PROSPECTOS CONTACTADOS")
-            return 0
-        
-        mask = (
-            (df[project_col].astype(str).str.upper().str.strip() == project.upper()) &
-            (df[lead_unico_col].astype(str).str.upper().str.strip() == 'SI') &
-            (df[subestado_col].astype(str).str.upper().str.strip() == 'CONTACTADO')
+        parsed = run_per_report(
+            parse_report,
+            {key: (filepath, definition) for key, (definition, filepath, _) in pending.items()},
         )
-        
-        # Agregar filtro de tipo inmueble si existe la columna
-        if tipo_inmueble_col is not None:
-            mask = mask & (df[tipo_inmueble_col].astype(str).str.upper().str.strip() == 'DEPARTAMENTO')
-        
-        return int(mask.sum())
+        for key, (definition, filepath, fingerprint) in pending.items():
+            fingerprints[key] = (filepath, fingerprint)
+            df = parsed[key]
+            if isinstance(df, Exception):
+                logger.error(f"Error loading {filepath}: {df}")
+                continue
+            if df.empty:
+                continue
+            self.report_cache.store(key, filepath, df, fingerprint)
+            reports[key] = LoadedReport.build(key, filepath, fingerprint, df)
+            logger.info(f"Loaded {len(df)} rows for {key}")
 
-    def _count_separaciones(self, df, project):
-        """
-        ContarSeparaciones.bas:
-        Cuenta donde DescripcionProyecto = project AND TipoInmueble_1 = "Departamento"
-        """
-        if df.empty:
-            return 0
-        
-        project_col = None
-        tipo_inmueble_col = None
-        
-        for col in df.columns:
-            col_upper = col.upper().strip()
-            if col_upper == 'DESCRIPCIONPROYECTO':
-                project_col = col
-            elif col_upper == 'TIPOINMUEBLE_1':
-                tipo_inmueble_col = col
-        
-        if project_col is None or tipo_inmueble_col is None:
-            logger.warning(f"Columnas no encontradas para SEPARACIONES")
-            return 0
-        
-        mask = (
-            (df[project_col].astype(str).str.upper().str.strip() == project.upper()) &
-            (df[tipo_inmueble_col].astype(str).str.upper().str.strip() == 'DEPARTAMENTO')
-        )
-        return int(mask.sum())
+        return DataSnapshot(MappingProxyType(reports), MappingProxyType(fingerprints))
 
-    def _count_ventas(self, df, project):
+    def load_data(self, preparsed=None):
         """
-        ContarVentas.bas:
-        Cuenta donde Proyecto = project AND TipoInmueble_1 = "Departamento"
+        Devuelve el snapshot de datos vigente, reconstruyéndolo si cambió algún archivo.
+        Los lectores con datos al día no toman ningún lock; solo una reconstrucción
+        corre a la vez y quienes llegan mientras tanto reciben su resultado.
+        Solo se releen los archivos que cambiaron; los que no tienen cache se leen en paralelo.
+        ``preparsed`` (key -> (ruta, fingerprint, frame), ver publish_report_set) permite
+        adoptar los frames ya validados en la sincronización sin volver a leerlos.
         """
-        if df.empty:
-            return 0
-        
-        project_col = None
-        tipo_inmueble_col = None
-        
-        for col in df.columns:
-            col_upper = col.upper().strip()
-            if col_upper == 'PROYECTO':
-                project_col = col
-            elif col_upper == 'TIPOINMUEBLE_1':
-                tipo_inmueble_col = col
-        
-        if project_col is None or tipo_inmueble_col is None:
-            logger.warning(f"Columnas no encontradas para VENTAS")
-            return 0
-        
-        mask = (
-            (df[project_col].astype(str).str.upper().str.strip() == project.upper()) &
-            (df[tipo_inmueble_col].astype(str).str.upper().str.strip() == 'DEPARTAMENTO')
-        )
-        return int(mask.sum())
+        sources = self._current_sources()
+        snapshot = self._snapshot
+        if self._is_current(snapshot, sources):
+            return snapshot
+        with self._rebuild_lock:
+            snapshot = self._snapshot
+            if self._is_current(snapshot, sources):
+                return snapshot
+            snapshot = self._build_snapshot(snapshot, sources, preparsed)
+            self._snapshot = snapshot
+            return snapshot
 
-    def _count_proformas(self, df, project):
-        """
-        ContarProformas.bas:
-        Cuenta donde DescripcionProyecto = project AND FlgUnicoMesProy = "SI"
-        Hoja: ReporteProforma
-        """
-        if df.empty:
-            return 0
-        
-        project_col = None
-        flg_unico_col = None
-        
-        for col in df.columns:
-            col_upper = col.upper().strip()
-            if col_upper == 'DESCRIPCIONPROYECTO':
-                project_col = col
-            elif col_upper == 'FLGUNICOMESPROJ' or col_upper == 'FLGUNICOMESPROYECTO':
-                flg_unico_col = col
-        
-        if project_col is None or flg_unico_col is None:
-            logger.warning(f"Columnas no encontradas para PROFORMAS")
-            return 0
-        
-        mask = (
-            (df[project_col].astype(str).str.upper().str.strip() == project.upper()) &
-            (df[flg_unico_col].astype(str).str.upper().str.strip() == 'SI')
-        )
-        return int(mask.sum())
+    def _data_fingerprint(self):
+        """Identidad del conjunto publicado (version y manifest.json o, si falta, los archivos)"""
+        identity = self.published.identity()
+        if identity is not None:
+            return ("manifest", identity)
+        files = []
+        for filepath in self._current_sources().values():
+            stat = os.stat(filepath)
+            files.append((filepath, stat.st_mtime_ns, stat.st_size))
+        return ("files", tuple(files))
 
-    def _count_visitas(self, df, project):
+    def get_metrics(self):
         """
-        Cuenta visitas por proyecto
-        Filtros: Proyecto = project AND VisitaUnicaxMesProyecto = "SI" AND TipoInmueble = "DEPARTAMENTO"
+        Devuelve las métricas del semáforo memorizadas.
+        Solo se recalculan si cambia el conjunto publicado, las metas o el día en Lima.
         """
-        if df.empty:
-            return 0
-        
-        project_col = None
-        visita_unica_col = None
-        tipo_inmueble_col = None
-        
-        for col in df.columns:
-            col_upper = col.upper().strip()
-            if col_upper == 'PROYECTO' or col_upper == 'DESCRIPCIONPROYECTO':
-                project_col = col
-            elif col_upper == 'VISITAUNICAXMESPROYECTO':
-                visita_unica_col = col
-            elif col_upper == 'TIPOINMUEBLE' or col_upper == 'TIPOINMUEBLE_1':
-                tipo_inmueble_col = col
-        
-        if project_col is None:
-            logger.warning(f"Columna de proyecto no encontrada para VISITAS")
-            return 0
-        
-        # Construir máscara base
-        mask = df[project_col].astype(str).str.upper().str.strip() == project.upper()
-        
-        # Agregar filtro de visita única si existe la columna
-        if visita_unica_col is not None:
-            mask = mask & (df[visita_unica_col].astype(str).str.upper().str.strip() == 'SI')
-        else:
-            logger.warning(f"Columna VisitaUnicaxMesProyecto no encontrada para VISITAS")
-        
-        # Agregar filtro de tipo inmueble si existe la columna
-        if tipo_inmueble_col is not None:
-            mask = mask & (df[tipo_inmueble_col].astype(str).str.upper().str.strip() == 'DEPARTAMENTO')
-        else:
-            logger.warning(f"Columna TipoInmueble no encontrada para VISITAS")
-        
-        return int(mask.sum())
+        key = (self._data_fingerprint(), self.meta_store.version, lima_today())
+        cached = self._metrics_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        snapshot = self.load_data()
+        metrics = self.calculate_metrics(snapshot)
+        self._metrics_cache = (key, metrics)
+        return metrics
+
+    def invalidate_metrics(self):
+        self._metrics_cache = None
 
-    def calculate_metrics(self):
+    def drilldown(self, group_by=("proyecto",), filters=None, start_date=None, end_date=None):
+        """Métricas reales filtradas y agrupadas por proyecto, canal, responsable o día."""
+        snapshot = self.load_data()
+        return query_cube(snapshot.cube, group_by, filters, start_date, end_date)
+
+    def _get_meta_al_dia(self):
+        """Calcula el porcentaje del mes transcurrido (C11 en Excel)"""
+        today = lima_today()
+        dias_mes = (datetime(today.year, today.month + 1, 1) - datetime(today.year, today.month, 1)).days if today.month < 12 else 31
+        dia_actual = today.day
+        return dia_actual / dias_mes
+
+    def calculate_metrics(self, snapshot=None):
         """Calcula métricas para cada proyecto siguiendo las fórmulas del Excel VBA"""
         metrics = []
-        
-        df_p = self.data.get('prospectos', pd.DataFrame())
-        df_v = self.data.get('ventas', pd.DataFrame())
-        df_s = self.data.get('separaciones', pd.DataFrame())
-        df_vis = self.data.get('visitas', pd.DataFrame())
+        snapshot = snapshot or self._snapshot
         
         meta_al_dia = self._get_meta_al_dia()
         logger.info(f"Meta al día: {meta_al_dia:.2%}")
         
-        # Log columnas disponibles para debug
-        if not df_p.empty:
-            logger.info(f"Columnas en prospectos: {list(df_p.columns)}")
+        # Conteos precalculados al cargar cada reporte (una pasada por reporte)
+        counts = snapshot.counts
         
         for project in TARGET_PROJECTS:
             # Inicializar meta si no existe
@@ -430,6 +272,7 @@ class SemaforoProcessor:
                 self.meta[project] = DEFAULT_META.copy()
             
             project_meta = self.meta[project]
+            project_counts = counts.get(project.upper(), {})
             row = {"Proyecto": project, "Metrics": {}}
             
             # ============ LEADS TOTALES ============
@@ -437,7 +280,7 @@ class SemaforoProcessor:
             # REAL = CONTAR.SI.CONJUNTO(Proyecto; project; LeadUnicoxMesProyecto; "SI")
             meta_leads = project_meta.get("prospectos_totales", 0)
             meta_leads_dia = math.ceil(meta_leads * meta_al_dia) if meta_leads > 0 else 0
-            real_leads = self._count_leads_totales(df_p, project)
+            real_leads = project_counts.get("leads_totales", 0)
             pct_leads = round((real_leads / meta_leads_dia * 100), 0) if meta_leads_dia > 0 else 0
             
             row["Metrics"]["Leads Totales"] = {
@@ -449,7 +292,7 @@ class SemaforoProcessor:
             
             # ============ LEADS CON DNI ============
             # Cuenta leads donde LeadUnicoxMesProyecto = "SI" Y NroDocumento tiene valor
-            real_dni = self._count_leads_con_dni(df_p, project)
+            real_dni = project_counts.get("leads_dni", 0)
             
             row["Metrics"]["Leads DNI"] = {
                 "Real": real_dni
@@ -460,7 +303,7 @@ class SemaforoProcessor:
             # REAL = Proyecto + LeadUnicoxMesProyecto="SI" + ComoSeEntero contiene (Facebook, Whatsapp, Pagina Web, Nexo)
             meta_digital = project_meta.get("prospectos_digitales", 0)
             meta_digital_dia = math.ceil(meta_digital * meta_al_dia) if meta_digital > 0 else 0
-            real_digital = self._count_leads_digitales(df_p, project)
+            real_digital = project_counts.get("leads_digitales", 0)
             pct_digital = round((real_digital / meta_digital_dia * 100), 0) if meta_digital_dia > 0 else 0
             
             row["Metrics"]["Leads Digitales"] = {
@@ -474,7 +317,7 @@ class SemaforoProcessor:
             # Cuenta leads donde Proyecto + LeadUnicoxMesProyecto="SI" + SubEstado="CONTACTADO"
             meta_contactados = project_meta.get("contactados", 0)
             meta_contactados_dia = math.ceil(meta_contactados * meta_al_dia) if meta_contactados > 0 else 0
-            real_contactados = self._count_prospectos_contactados(df_p, project)
+            real_contactados = project_counts.get("contactados", 0)
             pct_contactados = round((real_contactados / meta_contactados_dia * 100), 0) if meta_contactados_dia > 0 else 0
             
             row["Metrics"]["Prospectos"] = {
@@ -487,7 +330,7 @@ class SemaforoProcessor:
             # ============ VISITAS TOTALES ============
             meta_visitas = project_meta.get("visitas_sala", 0)
             meta_visitas_dia = math.ceil(meta_visitas * meta_al_dia) if meta_visitas > 0 else 0
-            real_visitas = self._count_visitas(df_vis, project)
+            real_visitas = project_counts.get("visitas", 0)
             pct_visitas = round((real_visitas / meta_visitas_dia * 100), 0) if meta_visitas_dia > 0 else 0
             
             row["Metrics"]["Visitas Totales"] = {
@@ -502,7 +345,7 @@ class SemaforoProcessor:
             # REAL = DescripcionProyecto + TipoInmueble_1 = "Departamento"
             meta_sep = project_meta.get("separaciones_totales", 0)
             meta_sep_dia = math.ceil(meta_sep * meta_al_dia) if meta_sep > 0 else 0
-            real_sep = self._count_separaciones(df_s, project)
+            real_sep = project_counts.get("separaciones", 0)
             pct_sep = round((real_sep / meta_sep_dia * 100), 0) if meta_sep_dia > 0 else 0
             
             row["Metrics"]["Separaciones Totales"] = {
@@ -517,7 +360,7 @@ class SemaforoProcessor:
             # REAL = Proyecto + TipoInmueble_1 = "Departamento"
             meta_ventas = project_meta.get("metas_minutas", 0)
             meta_ventas_dia = math.ceil(meta_ventas * meta_al_dia) if meta_ventas > 0 else 0
-            real_ventas = self._count_ventas(df_v, project)
+            real_ventas = project_counts.get("ventas", 0)
             pct_ventas = round((real_ventas / meta_ventas_dia * 100), 0) if meta_ventas_dia > 0 else 0
             
             row["Metrics"]["Ventas Totales"] = {
@@ -535,13 +378,14 @@ class SemaforoProcessor:
     def get_all_metas(self):
         """Retorna todas las metas para la UI de edición"""
         # Refrescar del store para soportar cambios desde otros dispositivos
-        self.meta = self._load_meta()
-        result = {}
+        metas = self._load_meta()
         for project in TARGET_PROJECTS:
-            if project not in self.meta:
-                self.meta[project] = DEFAULT_META.copy()
-            result[project] = self.meta[project]
-        return result
+            if project not in metas:
+                metas[project] = DEFAULT_META.copy()
+        if metas != self.meta:
+            self.meta_store.bump_version()
+        self.meta = metas
+        return {project: self.meta[project] for project in TARGET_PROJECTS}
 
     def update_project_meta(self, project, meta_key, value):
         """Actualiza una meta específica de un proyecto"""
@@ -549,6 +393,7 @@ class SemaforoProcessor:
             self.meta[project] = DEFAULT_META.copy()
 
         self.meta[project][meta_key] = value
+        self.invalidate_metrics()
         self.meta_store.upsert_project(project, {meta_key: value})
 
     def update_project_metas(self, project, metas: dict):
@@ -559,4 +404,5 @@ class SemaforoProcessor:
         for key, value in metas.items():
             if key in DEFAULT_META:
                 self.meta[project][key] = int(value or 0)
+        self.invalidate_metrics()
         self.meta_store.upsert_project(project, self.meta[project])
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIRNAME = ".cache"
+CACHE_VERSION = 4
+
+
+def file_sha256(path: str | Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str | Path) -> dict:
+    """Identidad del archivo fuente: tamano, mtime y hash de contenido."""
+    stat = Path(path).stat()
+    return {
+        "size": int(stat.st_size),
+        "mtime_ns": int(stat.st_mtime_ns),
+        "sha256": file_sha256(path),
+    }
+
+
+def fingerprint_matches(fingerprint: dict, path: str | Path) -> bool:
+    """Indica si ``path`` sigue siendo el archivo descrito por ``fingerprint``.
+
+    Tamano y mtime iguales bastan; con mismo tamano pero otro mtime (copia,
+    touch) decide el hash y se actualiza el mtime guardado.
+    """
+    stat = Path(path).stat()
+    if fingerprint.get("size") != stat.st_size:
+        return False
+    if fingerprint.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    if fingerprint.get("sha256") != file_sha256(path):
+        return False
+    fingerprint["mtime_ns"] = int(stat.st_mtime_ns)
+    return True
+
+
+def _arrow_compatible(df: pd.DataFrame) -> pd.DataFrame:
+    # Las columnas object con tipos mezclados (ej. DNI numerico y texto) no se
+    # pueden escribir en Parquet; se guardan como texto conservando los nulos.
+    result = df.copy(deep=False)
+    result.columns = result.columns.astype(str)
+    for column in result.columns:
+        series = result[column]
+        if series.dtype != object:
+            continue
+        if len({type(value) for value in series.dropna()}) > 1:
+            result[column] = series.where(series.isna(), series.astype(str))
+    return result
+
+
+def _writer_id() -> str:
+    # Temporales por proceso e hilo: la publicacion y un lector pueden escribir a la vez
+    return f"{os.getpid()}.{threading.get_ident()}"
+
+
+class ReportCache:
+    """Copia columnar (Parquet) de cada reporte, junto a manifest.json.
+
+    Cada entrada guarda la identidad del archivo fuente; si el archivo
+    publicado cambia, la entrada se descarta y se reconstruye.
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory) / CACHE_DIRNAME
+
+    @property
+    def enabled(self) -> bool:
+        return pyarrow is not None
+
+    def _data_path(self, key: str) -> Path:
+        return self.directory / f"{key}.parquet"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read_meta(self, key: str) -> dict | None:
+        try:
+            meta = json.loads(self._meta_path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != CACHE_VERSION:
+            return None
+        return meta
+
+    def _write_meta(self, key: str, meta: dict) -> None:
+        pending = self._meta_path(key).with_suffix(f".json.{_writer_id()}.tmp")
+        pending.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        os.replace(pending, self._meta_path(key))
+
+    def _is_fresh(self, key: str, meta: dict, source: Path) -> bool:
+        if meta.get("source") != source.name:
+            return False
+        cached_mtime = meta.get("mtime_ns")
+        if not fingerprint_matches(meta, source):
+            return False
+        if meta["mtime_ns"] != cached_mtime:
+            try:
+                self._write_meta(key, meta)
+            except OSError as exc:
+                logger.warning(f"Could not refresh cache metadata for {key}: {exc}")
+        return True
+
+    def fingerprint(self, key: str) -> dict | None:
+        """Identidad del archivo fuente con la que se construyo la entrada."""
+        meta = self._read_meta(key)
+        if meta is None:
+            return None
+        return {name: meta[name] for name in ("size", "mtime_ns", "sha256") if name in meta}
+
+    def load(self, key: str, source: str | Path) -> pd.DataFrame | None:
+        if not self.enabled:
+            return None
+        source = Path(source)
+        meta = self._read_meta(key)
+        if meta is None or not self._data_path(key).exists():
+            return None
+        try:
+            if not self._is_fresh(key, meta, source):
+                return None
+            return pd.read_parquet(self._data_path(key))
+        except Exception as exc:
+            logger.warning(f"Ignoring unreadable cache for {key}: {exc}")
+            return None
+
+    def store(
+        self, key: str, source: str | Path, df: pd.DataFrame, fingerprint: dict | None = None
+    ) -> None:
+        if not self.enabled:
+            return
+        source = Path(source)
+        fingerprint = fingerprint or file_fingerprint(source)
+        pending = self._data_path(key).with_suffix(f".parquet.{_writer_id()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._meta_path(key).unlink(missing_ok=True)
+            _arrow_compatible(df).to_parquet(pending, index=False)
+            os.replace(pending, self._data_path(key))
+            self._write_meta(
+                key,
+                {"version": CACHE_VERSION, "source": source.name, **fingerprint},
+            )
+            logger.info(f"Cached {key} as Parquet ({len(df)} rows)")
+        except Exception as exc:
+            pending.unlink(missing_ok=True)
+            self._meta_path(key).unlink(missing_ok=True)
+            logger.warning(f"Could not cache {key}: {exc}")
@@ -1,16 +1,73 @@
+import hashlib
+import io
 import json
+import logging
+import lzma
+import multiprocessing
 import os
 import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Dict, Iterable, Mapping, Sequence
+from typing import Any, Callable, Dict, Iterable, Mapping, Sequence
 from zoneinfo import ZoneInfo
 
 import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
 
+from date_parsing import parse_dates
+from report_cache import ReportCache, file_fingerprint, file_sha256
+
+
+logger = logging.getLogger(__name__)
 
 LIMA_TZ = ZoneInfo("America/Lima")
+BACKUP_OBJECTS_DIRNAME = "objects"
+BACKUP_DIR_FORMAT = "%Y%m%d_%H%M%S_%f"
+COMPRESSED_SUFFIX = ".xz"
+DOWNLOAD_ARCHIVE_NAME = "reportes_evolta.zip"
+# Cada publicacion vive en versions/<fecha>/ y ``current`` apunta a la vigente
+VERSIONS_DIRNAME = "versions"
+CURRENT_POINTER = "current"
+
+# "streaming": lee solo las columnas declaradas en REPORT_DEFINITIONS.
+# "pandas": lectura completa con pd.read_excel/pd.read_csv.
+REPORT_READER = os.getenv("REPORT_READER", "streaming").lower()
+
+# Lectura de los cuatro reportes: "serial" (por defecto), "process" o "thread".
+# openpyxl y el parser de pandas son Python puro y retienen el GIL, asi que "thread"
+# no gana tiempo y solo mantiene varios reportes en memoria a la vez. "process"
+# reutiliza un pool (el arranque con spawn reimporta pandas una sola vez por worker).
+REPORT_LOAD_EXECUTOR = os.getenv("REPORT_LOAD_EXECUTOR", "serial").lower()
+REPORT_LOAD_WORKERS = int(os.getenv("REPORT_LOAD_WORKERS", "2"))
+_PROCESS_POOL: ProcessPoolExecutor | None = None
+_PROCESS_POOL_LOCK = threading.Lock()
+
+# Validacion de la sincronizacion: "full" deja los frames canonicos para el procesador;
+# "streaming" solo recorre la columna de fecha por bloques (memoria acotada) y el
+# procesador parsea el reporte despues de publicarlo.
+REPORT_VALIDATION_MODE = os.getenv("REPORT_VALIDATION_MODE", "full").lower()
+VALIDATION_CHUNK_ROWS = int(os.getenv("VALIDATION_CHUNK_ROWS", "50000"))
+
+# Retencion de respaldos: los ultimos N, uno por dia durante D dias y uno por mes
+# (0 desactiva el mensual). Los blobs fuera de los ultimos N se comprimen con xz
+# dentro de un presupuesto de bytes y segundos por ejecucion.
+BACKUP_KEEP_LAST = int(os.getenv("BACKUP_KEEP_LAST", "10"))
+BACKUP_KEEP_DAILY_DAYS = int(os.getenv("BACKUP_KEEP_DAILY_DAYS", "30"))
+BACKUP_KEEP_MONTHLY = os.getenv("BACKUP_KEEP_MONTHLY", "true").lower() in ("1", "true", "yes")
+BACKUP_COMPRESSION_PRESET = int(os.getenv("BACKUP_COMPRESSION_PRESET", "6"))
+BACKUP_COMPACTION_MAX_BYTES = int(os.getenv("BACKUP_COMPACTION_MAX_BYTES", str(512 * 1024 * 1024)))
+BACKUP_COMPACTION_MAX_SECONDS = float(os.getenv("BACKUP_COMPACTION_MAX_SECONDS", "120"))
+
+# Publicacion y compactacion no tocan el almacen de respaldos a la vez
+BACKUP_LOCK = threading.Lock()
 
 
 def lima_today() -> date:
@@ -25,16 +82,48 @@ TARGET_PROJECTS = [
 ]
 
 
+@dataclass(frozen=True)
+class CanonicalColumn:
+    """Columna normalizada al cargar un reporte.
+
+    ``aliases`` son los encabezados aceptados (en mayusculas); si aparecen
+    varios gana el ultimo, igual que en las macros VBA. ``kind`` puede ser
+    ``dimension`` (texto normalizado como categoria), ``flag`` (booleano
+    ``valor == match``), ``presence`` (booleano "tiene valor") o ``date``
+    (dia calendario con el formato detectado en ``date_parsing``; lo no
+    interpretable queda como NaT).
+    """
+
+    aliases: Sequence[str]
+    kind: str = "dimension"
+    match: str | None = None
+
+
 @dataclass(frozen=True)
 class ReportDefinition:
     prefix: str
+    data_key: str
     required_columns: Sequence[str]
     primary_date_columns: Sequence[str]
+    canonical_columns: Mapping[str, CanonicalColumn]
 
+    @property
+    def declared_columns(self) -> frozenset[str]:
+        """Encabezados (en mayusculas) que usan la validacion y las metricas."""
+        names = {column.upper() for column in self.required_columns}
+        names.update(column.upper() for column in self.primary_date_columns)
+        for column in self.canonical_columns.values():
+            names.update(column.aliases)
+        return frozenset(names)
+
+
+# Encabezados con el asesor a cargo; Evolta los nombra distinto segun el reporte.
+RESPONSABLE_ALIASES = ("VENDEDOR", "ASESOR", "USUARIOASIGNADO", "RESPONSABLE")
 
 REPORT_DEFINITIONS: Dict[str, ReportDefinition] = {
     "reporteProspectos": ReportDefinition(
         prefix="reporteProspectos",
+        data_key="prospectos",
         required_columns=(
             "Proyecto",
             "TipoInmueble",
@@ -44,19 +133,48 @@ REPORT_DEFINITIONS: Dict[str, ReportDefinition] = {
             "FechaRegistro",
         ),
         primary_date_columns=("FechaRegistro",),
+        canonical_columns={
+            "Proyecto": CanonicalColumn(("PROYECTO",)),
+            "LeadUnico": CanonicalColumn(("LEADUNICOXMESPROYECTO",), "flag", "SI"),
+            "Departamento": CanonicalColumn(
+                ("TIPOINMUEBLE", "TIPOINMUEBLE_1"), "flag", "DEPARTAMENTO"
+            ),
+            "ConDocumento": CanonicalColumn(("NRODOCUMENTO",), "presence"),
+            "ComoSeEntero": CanonicalColumn(("COMOSEENTERO",)),
+            "Contactado": CanonicalColumn(("SUBESTADO",), "flag", "CONTACTADO"),
+            "Responsable": CanonicalColumn(RESPONSABLE_ALIASES),
+            "Fecha": CanonicalColumn(("FECHAREGISTRO",), "date"),
+        },
     ),
     "ReporteVenta": ReportDefinition(
         prefix="ReporteVenta",
+        data_key="ventas",
         required_columns=("Proyecto", "TipoInmueble_1", "FechaVenta"),
         primary_date_columns=("FechaVenta",),
+        canonical_columns={
+            "Proyecto": CanonicalColumn(("PROYECTO",)),
+            "Departamento": CanonicalColumn(("TIPOINMUEBLE_1",), "flag", "DEPARTAMENTO"),
+            "ComoSeEntero": CanonicalColumn(("COMOSEENTERO",)),
+            "Responsable": CanonicalColumn(RESPONSABLE_ALIASES),
+            "Fecha": CanonicalColumn(("FECHAVENTA",), "date"),
+        },
     ),
     "Separacion": ReportDefinition(
         prefix="Separacion",
+        data_key="separaciones",
         required_columns=("DescripcionProyecto", "TipoInmueble_1", "FechaSepDef"),
         primary_date_columns=("FechaSepDef", "FechaSepTemp", "FechaRegistro"),
+        canonical_columns={
+            "Proyecto": CanonicalColumn(("DESCRIPCIONPROYECTO",)),
+            "Departamento": CanonicalColumn(("TIPOINMUEBLE_1",), "flag", "DEPARTAMENTO"),
+            "ComoSeEntero": CanonicalColumn(("COMOSEENTERO",)),
+            "Responsable": CanonicalColumn(RESPONSABLE_ALIASES),
+            "Fecha": CanonicalColumn(("FECHASEPDEF",), "date"),
+        },
     ),
     "ReporteVisitas": ReportDefinition(
         prefix="ReporteVisitas",
+        data_key="visitas",
         required_columns=(
             "Proyecto",
             "TipoInmueble",
@@ -64,19 +182,74 @@ REPORT_DEFINITIONS: Dict[str, ReportDefinition] = {
             "FechaVisita",
         ),
         primary_date_columns=("FechaVisita",),
+        canonical_columns={
+            "Proyecto": CanonicalColumn(("PROYECTO", "DESCRIPCIONPROYECTO")),
+            "VisitaUnica": CanonicalColumn(("VISITAUNICAXMESPROYECTO",), "flag", "SI"),
+            "Departamento": CanonicalColumn(
+                ("TIPOINMUEBLE", "TIPOINMUEBLE_1"), "flag", "DEPARTAMENTO"
+            ),
+            "ComoSeEntero": CanonicalColumn(("COMOSEENTERO",)),
+            "Responsable": CanonicalColumn(RESPONSABLE_ALIASES),
+            "Fecha": CanonicalColumn(("FECHAVISITA",), "date"),
+        },
     ),
 }
 
 
+def _resolve_column(columns: Iterable[str], aliases: Sequence[str]) -> str | None:
+    found = None
+    for column in columns:
+        if str(column).upper().strip() in aliases:
+            found = column
+    return found
+
+
+def date_format_key(definition: ReportDefinition, column: str) -> tuple[str, str]:
+    """Clave con la que ``date_parsing`` recuerda el formato de una columna de fecha."""
+    return definition.prefix, str(column).strip().upper()
+
+
+def canonicalize(df: pd.DataFrame, definition: ReportDefinition) -> pd.DataFrame:
+    """Resuelve alias y deja solo las columnas canonicas, ya normalizadas.
+
+    Las dimensiones quedan como categorias en mayusculas sin espacios y los
+    filtros como booleanos, de modo que las mascaras de las metricas son
+    comparaciones de enteros. Las columnas sin alias presente se omiten.
+    """
+    canonical = {}
+    for name, spec in definition.canonical_columns.items():
+        source = _resolve_column(df.columns, spec.aliases)
+        if source is None:
+            continue
+        values = df[source]
+        if spec.kind == "date":
+            parsed = parse_dates(values, key=date_format_key(definition, source))
+            canonical[name] = parsed.dt.normalize().to_numpy()
+            continue
+        if spec.kind == "presence":
+            present = values.notna() & (values.astype(str).str.strip() != "")
+            canonical[name] = present.to_numpy(dtype=bool)
+            continue
+        normalized = values.astype(str).str.upper().str.strip()
+        if spec.kind == "flag":
+            canonical[name] = (normalized == spec.match).to_numpy(dtype=bool)
+        else:
+            canonical[name] = pd.Categorical(normalized)
+    return pd.DataFrame(canonical, index=pd.RangeIndex(len(df)))
+
+
 class ReportValidationError(RuntimeError):
     pass
 
 
 class ReportValidationResult(dict):
+    """Resumen por reporte (va al manifest) mas los frames canonicos ya parseados."""
+
     def __init__(self, start_date: date, end_date: date):
         super().__init__()
         self.start_date = start_date
         self.end_date = end_date
+        self.frames: Dict[str, pd.DataFrame] = {}
 
 
 def _find_report_file(directory: Path, prefix: str) -> Path:
@@ -89,34 +262,358 @@ def _find_report_file(directory: Path, prefix: str) -> Path:
     return max(matches, key=lambda path: path.stat().st_mtime)
 
 
-def _load_dataframe(path: Path) -> pd.DataFrame:
+def _excel_value(value):
+    # Misma conversion que el lector openpyxl de pandas (_convert_cell).
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value in ERROR_CODES:
+        return float("nan")
+    return value
+
+
+class RowDigest:
+    """Hash de las filas crudas de un xlsx, acumulado en la misma pasada que las lee.
+
+    Cubre todas las celdas de cada fila (no solo las columnas declaradas) y es
+    independiente del orden de las filas y de las celdas vacias al final; dos
+    exports con los mismos datos (aunque el xlsx difiera byte a byte, p. ej. en la
+    fecha de docProps) dan el mismo digest. ``hexdigest`` es None si no se alimento.
+    """
+
+    def __init__(self):
+        self._header: bytes | None = None
+        self._hashes: list[bytes] = []
+
+    @staticmethod
+    def _encode(row: Sequence[object]) -> bytes | None:
+        end = len(row)
+        while end and row[end - 1] is None:
+            end -= 1
+        return repr(tuple(row[:end])).encode("utf-8") if end else None
+
+    def header(self, row: Sequence[object]) -> None:
+        self._header = self._encode(row) or b""
+
+    def update(self, row: Sequence[object]) -> None:
+        encoded = self._encode(row)
+        if encoded is not None:
+            self._hashes.append(hashlib.blake2b(encoded, digest_size=16).digest())
+
+    def hexdigest(self) -> str | None:
+        if self._header is None:
+            return None
+        digest = hashlib.sha256(self._header)
+        for item in sorted(self._hashes):
+            digest.update(item)
+        return digest.hexdigest()
+
+
+def _read_xlsx_columns(path: Path, wanted: frozenset[str], digest: RowDigest | None = None) -> pd.DataFrame:
+    workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
     try:
-        if path.suffix.lower() == ".csv":
-            return pd.read_csv(path)
-        if path.suffix.lower() == ".xlsx":
-            return pd.read_excel(path, engine="openpyxl")
-        return pd.read_excel(path)
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        raw_header = next(rows, ())
+        if digest is not None:
+            digest.header(raw_header)
+        header = [_excel_value(value) for value in raw_header]
+        positions = [
+            index
+            for index, name in enumerate(header)
+            if name != "" and str(name).strip().upper() in wanted
+        ]
+        data = [[header[index] for index in positions]]
+        last_with_data = 0
+        for row in rows:
+            width = len(row)
+            data.append([_excel_value(row[index]) if index < width else "" for index in positions])
+            if digest is not None:
+                digest.update(row)
+            if any(value is not None for value in row):
+                last_with_data = len(data) - 1
+        # Igual que pandas: se descartan las filas vacias al final de la hoja.
+        del data[last_with_data + 1:]
+    finally:
+        workbook.close()
+
+    if not positions:
+        return pd.DataFrame(index=pd.RangeIndex(len(data) - 1))
+    return TextParser(data, header=0, skip_blank_lines=False).read()
+
+
+def read_report(
+    path: str | Path, definition: ReportDefinition | None = None, digest: RowDigest | None = None
+) -> pd.DataFrame:
+    """Lee un reporte exportado.
+
+    En modo ``streaming`` (por defecto) el xlsx se recorre en modo read-only y
+    solo se materializan las columnas declaradas por ``definition``; CSV y xls
+    usan ``usecols`` con el mismo criterio. Con ``digest`` las filas del xlsx
+    alimentan el ``RowDigest`` en la misma lectura.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    wanted = None
+    if definition is not None and REPORT_READER == "streaming":
+        wanted = definition.declared_columns
+    usecols = (lambda name: str(name).strip().upper() in wanted) if wanted else None
+
+    if suffix == ".csv":
+        return pd.read_csv(path, usecols=usecols)
+    if suffix == ".xlsx":
+        if wanted:
+            return _read_xlsx_columns(path, wanted, digest)
+        return pd.read_excel(path, engine="openpyxl")
+    return pd.read_excel(path, usecols=usecols)
+
+
+def _load_dataframe(
+    path: Path, definition: ReportDefinition | None = None, digest: RowDigest | None = None
+) -> pd.DataFrame:
+    try:
+        return read_report(path, definition, digest)
     except Exception as exc:
         raise ReportValidationError(f"No se pudo abrir {path.name}: {exc}") from exc
 
 
-def _primary_dates(
-    df: pd.DataFrame, definition: ReportDefinition, report_name: str
-) -> tuple[pd.Timestamp, pd.Timestamp]:
-    available = [column for column in definition.primary_date_columns if column in df.columns]
-    if not available:
-        expected = ", ".join(definition.primary_date_columns)
+def parse_report(path: str | Path, definition: ReportDefinition) -> pd.DataFrame:
+    """Lee y canoniza un reporte (funcion de modulo para poder usarse en un pool)."""
+    df = read_report(path, definition)
+    df.columns = df.columns.astype(str).str.strip()
+    return canonicalize(df, definition)
+
+
+def run_per_report(
+    function: Callable[..., Any],
+    jobs: Mapping[str, tuple],
+    fail_fast: bool = False,
+) -> Dict[str, Any]:
+    """Ejecuta ``function(*args)`` para cada reporte de ``jobs``.
+
+    Devuelve, en el orden de ``jobs``, el resultado o la excepcion de cada
+    reporte. Con ``fail_fast`` se detiene en el primer error (en ese orden) y
+    cancela los reportes que aun no empezaron.
+    """
+    workers = max(1, min(REPORT_LOAD_WORKERS, len(jobs)))
+    results: Dict[str, Any] = {}
+    if REPORT_LOAD_EXECUTOR == "serial" or workers == 1:
+        for name, args in jobs.items():
+            try:
+                results[name] = function(*args)
+            except Exception as exc:
+                results[name] = exc
+                if fail_fast:
+                    break
+        return results
+
+    if REPORT_LOAD_EXECUTOR == "process":
+        results = _collect(_process_pool(), function, jobs, fail_fast)
+        if any(isinstance(result, BrokenProcessPool) for result in results.values()):
+            # Un worker murio (p. ej. por memoria): el proximo uso arma un pool nuevo
+            _discard_process_pool()
+        return results
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-load") as executor:
+        return _collect(executor, function, jobs, fail_fast)
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    """Pool de procesos compartido entre llamadas (se crea con el primer uso)."""
+    global _PROCESS_POOL
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is None:
+            _PROCESS_POOL = ProcessPoolExecutor(
+                max_workers=max(1, REPORT_LOAD_WORKERS), mp_context=multiprocessing.get_context("spawn")
+            )
+        return _PROCESS_POOL
+
+
+def _discard_process_pool() -> None:
+    global _PROCESS_POOL
+    with _PROCESS_POOL_LOCK:
+        pool, _PROCESS_POOL = _PROCESS_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _collect(executor, function: Callable[..., Any], jobs: Mapping[str, tuple], fail_fast: bool) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    futures = {name: executor.submit(function, *args) for name, args in jobs.items()}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as exc:
+            results[name] = exc
+            if fail_fast:
+                for pending in futures.values():
+                    pending.cancel()
+                break
+    return results
+
+
+class DateRangeStats:
+    """Minimo, maximo y conteo de fechas invalidas, acumulados por bloques."""
+
+    def __init__(self, key: tuple[str, str] | None = None):
+        self.key = key
+        self.min: pd.Timestamp | None = None
+        self.max: pd.Timestamp | None = None
+        self.invalid = 0
+
+    def update(self, values) -> None:
+        series = pd.Series(values, dtype=object)
+        if series.empty:
+            return
+        parsed = parse_dates(series, key=self.key)
+        present = series.notna() & (series.astype(str).str.strip() != "")
+        self.invalid += int((present & parsed.isna()).sum())
+        valid = parsed.dropna()
+        if valid.empty:
+            return
+        low, high = valid.min(), valid.max()
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+
+def _primary_date_column(columns: Iterable[str], definition: ReportDefinition) -> str | None:
+    columns = set(columns)
+    return next((column for column in definition.primary_date_columns if column in columns), None)
+
+
+def _scan_xlsx(
+    path: Path, definition: ReportDefinition, digest: RowDigest | None = None
+) -> tuple[list[str], int, str | None, DateRangeStats]:
+    workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        raw_header = next(rows, ())
+        if digest is not None:
+            digest.header(raw_header)
+        header = [str(_excel_value(value)).strip() for value in raw_header]
+        date_column = _primary_date_column(header, definition)
+        position = header.index(date_column) if date_column else None
+        stats = DateRangeStats(date_format_key(definition, date_column) if date_column else None)
+        chunk = []
+        count = 0
+        last_with_data = 0
+        for row in rows:
+            count += 1
+            if any(value is not None for value in row):
+                last_with_data = count
+            if digest is not None:
+                digest.update(row)
+            if position is None:
+                continue
+            chunk.append(_excel_value(row[position]) if position < len(row) else "")
+            if len(chunk) >= VALIDATION_CHUNK_ROWS:
+                stats.update(chunk)
+                chunk = []
+        stats.update(chunk)
+    finally:
+        workbook.close()
+    # Igual que pandas: las filas vacias al final de la hoja no cuentan.
+    return header, last_with_data, date_column, stats
+
+
+def _scan_report(
+    path: Path, definition: ReportDefinition, digest: RowDigest | None = None
+) -> tuple[list[str], int, str | None, DateRangeStats]:
+    """Encabezados, filas y estadisticas de la fecha primaria sin armar el DataFrame.
+
+    En xlsx la misma pasada alimenta ``digest``; no se vuelve a leer el archivo.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".xlsx":
+        return _scan_xlsx(path, definition, digest)
+
+    if suffix == ".csv":
+        raw_header = list(pd.read_csv(path, nrows=0).columns)
+        header = [str(name).strip() for name in raw_header]
+        date_column = _primary_date_column(header, definition)
+        stats = DateRangeStats(date_format_key(definition, date_column) if date_column else None)
+        source = raw_header[header.index(date_column)] if date_column else raw_header[:1]
+        rows = 0
+        for chunk in pd.read_csv(
+            path, usecols=[source] if date_column else source, chunksize=VALIDATION_CHUNK_ROWS
+        ):
+            rows += len(chunk)
+            if date_column:
+                stats.update(chunk.iloc[:, 0])
+        return header, rows, date_column, stats
+
+    # xls no tiene lector incremental; se leen solo las columnas declaradas
+    df = read_report(path, definition)
+    header = [str(name).strip() for name in df.columns]
+    date_column = _primary_date_column(header, definition)
+    stats = DateRangeStats(date_format_key(definition, date_column) if date_column else None)
+    if date_column:
+        stats.update(df.iloc[:, header.index(date_column)])
+    return header, len(df.index), date_column, stats
+
+
+def _validate_report(
+    name: str, definition: ReportDefinition, path: Path, start_date: date, end_date: date
+) -> tuple[dict, pd.DataFrame | None]:
+    frame = None
+    # Solo el lector de xlsx alimenta el digest; CSV/xls se comparan por sha256
+    digest = RowDigest()
+    if REPORT_VALIDATION_MODE == "streaming":
+        try:
+            columns, rows, date_column, stats = _scan_report(path, definition, digest)
+        except Exception as exc:
+            raise ReportValidationError(f"No se pudo abrir {path.name}: {exc}") from exc
+    else:
+        df = _load_dataframe(path, definition, digest)
+        df.columns = df.columns.astype(str).str.strip()
+        columns, rows = list(df.columns), len(df.index)
+        date_column = _primary_date_column(columns, definition)
+        stats = DateRangeStats(date_format_key(definition, date_column) if date_column else None)
+        if date_column:
+            stats.update(df[date_column])
+        if rows:
+            frame = canonicalize(df, definition)
+
+    if rows == 0:
+        raise ReportValidationError(f"{name}: el reporte esta sin filas")
+
+    missing = [column for column in definition.required_columns if column not in columns]
+    if missing:
         raise ReportValidationError(
-            f"{report_name}: no se encontro una columna de fecha primaria ({expected})"
+            f"{name}: faltan columnas requeridas: {', '.join(missing)}"
         )
 
-    parsed = pd.to_datetime(df[available[0]], dayfirst=True, errors="coerce")
-    parsed = parsed.dropna()
-    if parsed.empty:
+    if date_column is None:
+        expected = ", ".join(definition.primary_date_columns)
+        raise ReportValidationError(
+            f"{name}: no se encontro una columna de fecha primaria ({expected})"
+        )
+    if stats.min is None:
+        raise ReportValidationError(
+            f"{name}: la columna {date_column} no contiene fechas validas"
+        )
+    min_date, max_date = stats.min, stats.max
+    if min_date.date() < start_date or max_date.date() > end_date:
         raise ReportValidationError(
-            f"{report_name}: la columna {available[0]} no contiene fechas validas"
+            f"{name}: fechas fuera del periodo {start_date.isoformat()} a "
+            f"{end_date.isoformat()} ({min_date.date()} a {max_date.date()})"
         )
-    return parsed.min(), parsed.max()
+
+    summary = {
+        "source_path": str(path),
+        "filename": f"{definition.prefix}{path.suffix.lower()}",
+        "rows": int(rows),
+        "bytes": int(path.stat().st_size),
+        "date_min": min_date.date().isoformat(),
+        "date_max": max_date.date().isoformat(),
+        "invalid_dates": stats.invalid,
+        "sha256": file_sha256(path),
+        "row_digest": digest.hexdigest(),
+    }
+    return summary, frame
 
 
 def validate_report_set(
@@ -126,36 +623,22 @@ def validate_report_set(
     if start_date > end_date:
         raise ReportValidationError("El inicio del periodo no puede ser posterior al fin")
 
-    validation = ReportValidationResult(start_date, end_date)
-    for name, definition in REPORT_DEFINITIONS.items():
-        path = _find_report_file(directory, definition.prefix)
-        df = _load_dataframe(path)
-        df.columns = df.columns.astype(str).str.strip()
-
-        if df.empty:
-            raise ReportValidationError(f"{name}: el reporte esta sin filas")
-
-        missing = [column for column in definition.required_columns if column not in df.columns]
-        if missing:
-            raise ReportValidationError(
-                f"{name}: faltan columnas requeridas: {', '.join(missing)}"
-            )
-
-        min_date, max_date = _primary_dates(df, definition, name)
-        if min_date.date() < start_date or max_date.date() > end_date:
-            raise ReportValidationError(
-                f"{name}: fechas fuera del periodo {start_date.isoformat()} a "
-                f"{end_date.isoformat()} ({min_date.date()} a {max_date.date()})"
-            )
+    jobs = {
+        name: (name, definition, _find_report_file(directory, definition.prefix), start_date, end_date)
+        for name, definition in REPORT_DEFINITIONS.items()
+    }
+    results = run_per_report(_validate_report, jobs, fail_fast=True)
 
-        validation[name] = {
-            "source_path": str(path),
-            "filename": f"{definition.prefix}{path.suffix.lower()}",
-            "rows": int(len(df)),
-            "bytes": int(path.stat().st_size),
-            "date_min": min_date.date().isoformat(),
-            "date_max": max_date.date().isoformat(),
-        }
+    validation = ReportValidationResult(start_date, end_date)
+    for name in jobs:
+        result = results[name]
+        if isinstance(result, ReportValidationError):
+            raise result
+        if isinstance(result, Exception):
+            raise ReportValidationError(f"{name}: {result}") from result
+        validation[name], frame = result
+        if frame is not None:
+            validation.frames[name] = frame
 
     return validation
 
@@ -166,26 +649,670 @@ def _active_report_files(active_dir: Path) -> Iterable[Path]:
             yield from active_dir.glob(f"{definition.prefix}*{extension}")
 
 
+def _latest_report_file(active_dir: Path, prefix: str) -> Path | None:
+    for extension in (".xlsx", ".xls", ".csv"):
+        files = list(active_dir.glob(f"{prefix}*{extension}"))
+        if files:
+            return max(files, key=lambda path: path.stat().st_ctime)
+    return None
+
+
+def _read_manifest(directory: Path) -> dict | None:
+    try:
+        return json.loads((directory / "manifest.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def current_version(active_dir: str | Path) -> str | None:
+    """Version publicada vigente segun el puntero ``current`` (symlink o archivo)."""
+    pointer = Path(active_dir) / CURRENT_POINTER
+    try:
+        return Path(os.readlink(pointer)).name
+    except FileNotFoundError:
+        return None
+    except OSError:
+        pass
+    # Sin soporte de symlinks (ej. Windows sin privilegios) el puntero es un archivo
+    try:
+        return pointer.read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def current_dir(active_dir: str | Path) -> Path:
+    """Directorio del conjunto vigente; el propio ``active_dir`` en el esquema plano."""
+    active_dir = Path(active_dir)
+    version = current_version(active_dir)
+    if version is None:
+        return active_dir
+    return active_dir / VERSIONS_DIRNAME / version
+
+
+def _point_current(active_dir: Path, version: str) -> None:
+    """Cambia la version vigente con un unico rename atomico del puntero."""
+    pending = active_dir / f".{CURRENT_POINTER}.{os.getpid()}.{threading.get_ident()}"
+    pending.unlink(missing_ok=True)
+    try:
+        os.symlink(Path(VERSIONS_DIRNAME) / version, pending, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pending.write_text(version, encoding="utf-8")
+    os.replace(pending, active_dir / CURRENT_POINTER)
+
+
+def _published_files(directory: Path, manifest: dict | None) -> Dict[str, Path]:
+    if manifest is None:
+        files = {}
+        for name, definition in REPORT_DEFINITIONS.items():
+            path = _latest_report_file(directory, definition.prefix)
+            if path is not None:
+                files[name] = path
+        return files
+    return {
+        name: directory / str(item["filename"])
+        for name, item in (manifest.get("reports") or {}).items()
+        if name in REPORT_DEFINITIONS and item.get("filename")
+    }
+
+
+class PublishedReports:
+    """Archivos del conjunto publicado, resueltos desde manifest.json.
+
+    Se sigue el puntero ``current`` una vez por consulta y todas las rutas salen
+    de ese directorio de version, que es inmutable: un lector nunca mezcla dos
+    publicaciones. El manifest se relee solo cuando cambia su identidad. Sin
+    manifest (instalaciones previas a la publicacion atomica) se recurre al glob.
+    """
+
+    def __init__(self, active_dir: str | Path):
+        self.active_dir = Path(active_dir)
+        self._cached: tuple[tuple, dict, Dict[str, Path]] | None = None
+
+    @property
+    def directory(self) -> Path:
+        return current_dir(self.active_dir)
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.directory / "manifest.json"
+
+    def _load(self) -> tuple[tuple | None, dict | None, Dict[str, Path]]:
+        directory = self.directory
+        try:
+            stat = (directory / "manifest.json").stat()
+        except OSError:
+            self._cached = None
+            return None, None, _published_files(directory, None)
+
+        identity = (str(directory), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self._cached
+        if cached is not None and cached[0] == identity:
+            return cached
+        manifest = _read_manifest(directory) or {}
+        self._cached = (identity, manifest, _published_files(directory, manifest))
+        return self._cached
+
+    def identity(self) -> tuple | None:
+        """Identidad del manifest vigente (version, inode, mtime, tamano)."""
+        return self._load()[0]
+
+    @property
+    def manifest(self) -> dict | None:
+        return self._load()[1]
+
+    def files(self) -> Dict[str, Path]:
+        """Nombre de reporte -> archivo publicado."""
+        return dict(self._load()[2])
+
+    def entry(self, name: str) -> dict | None:
+        """Resumen del manifest (sha256, filas, fechas...) de un reporte."""
+        manifest = self.manifest
+        if not manifest:
+            return None
+        return (manifest.get("reports") or {}).get(name)
+
+
+_published_sets: Dict[str, PublishedReports] = {}
+
+
+def published_reports(active_dir: str | Path) -> PublishedReports:
+    """Resolver compartido por directorio, para reutilizar el manifest ya leido."""
+    key = os.path.abspath(active_dir)
+    resolver = _published_sets.get(key)
+    if resolver is None:
+        resolver = _published_sets.setdefault(key, PublishedReports(key))
+    return resolver
+
+
+def _downloadable_files(directory: Path, manifest: dict | None) -> list[Path]:
+    files = [path for path in _published_files(directory, manifest).values() if path.exists()]
+    if (directory / "manifest.json").exists():
+        files.append(directory / "manifest.json")
+    return files
+
+
 def iter_downloadable_files(active_dir: str | Path) -> Iterable[Path]:
+    identity, _, files = published_reports(active_dir)._load()
+    yield from (path for path in files.values() if path.exists())
+    if identity is not None:
+        yield Path(identity[0]) / "manifest.json"
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino no posicionable de zipfile; entrega lo escrito por bloques."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> list[bytes]:
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def iter_zip_stream(paths: Iterable[Path], chunk_size: int = 1024 * 1024) -> Iterable[bytes]:
+    """Genera un ZIP por bloques sin armar el archivo completo en memoria."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path in paths:
+            info = zipfile.ZipInfo.from_file(path, path.name)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, "w") as entry, open(path, "rb") as source:
+                for block in iter(lambda: source.read(chunk_size), b""):
+                    entry.write(block)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def build_download_archive(directory: str | Path) -> Path:
+    """Arma el ZIP de descarga de un conjunto publicado (una vez por publicacion)."""
+    directory = Path(directory)
+    target = directory / DOWNLOAD_ARCHIVE_NAME
+    pending = directory / f".{DOWNLOAD_ARCHIVE_NAME}.publishing"
+    try:
+        with open(pending, "wb") as handle:
+            for chunk in iter_zip_stream(_downloadable_files(directory, _read_manifest(directory))):
+                handle.write(chunk)
+        os.replace(pending, target)
+    finally:
+        pending.unlink(missing_ok=True)
+    return target
+
+
+def prebuilt_archive(active_dir: str | Path) -> Path | None:
+    """ZIP armado al publicar, solo si corresponde al manifest vigente."""
+    directory = current_dir(active_dir)
+    archive = directory / DOWNLOAD_ARCHIVE_NAME
+    try:
+        archive_mtime = archive.stat().st_mtime_ns
+        manifest_mtime = (directory / "manifest.json").stat().st_mtime_ns
+    except OSError:
+        return None
+    return archive if archive_mtime >= manifest_mtime else None
+
+
+def _backup_object_path(objects_dir: Path, digest: str) -> Path:
+    return objects_dir / digest[:2] / digest
+
+
+def _compressed_path(blob: Path) -> Path:
+    return blob.with_name(blob.name + COMPRESSED_SUFFIX)
+
+
+def _has_backup_object(objects_dir: Path, digest: str) -> bool:
+    blob = _backup_object_path(objects_dir, digest)
+    return blob.exists() or _compressed_path(blob).exists()
+
+
+def _copy_backup_object(objects_dir: Path, digest: str, target: Path) -> None:
+    """Copia un blob (plano o comprimido con xz) a ``target`` conservando su mtime."""
+    blob = _backup_object_path(objects_dir, digest)
+    if blob.exists():
+        shutil.copy2(blob, target)
+        return
+    compressed = _compressed_path(blob)
+    with lzma.open(compressed, "rb") as source, open(target, "wb") as destination:
+        shutil.copyfileobj(source, destination, 1024 * 1024)
+    mtime_ns = compressed.stat().st_mtime_ns
+    os.utime(target, ns=(mtime_ns, mtime_ns))
+
+
+def _link_backup_object(objects_dir: Path, digest: str, target: Path) -> None:
+    """Materializa un blob en un directorio de version sin copiarlo si se puede.
+
+    Los directorios de version no se modifican nunca, asi que comparten el
+    inode del blob (hardlink); si el sistema de archivos no lo permite o el
+    blob esta comprimido, se copia.
+    """
+    blob = _backup_object_path(objects_dir, digest)
+    if blob.exists():
+        try:
+            os.link(blob, target)
+            return
+        except OSError:
+            pass
+    _copy_backup_object(objects_dir, digest, target)
+
+
+def _store_backup_object(objects_dir: Path, path: Path, digest: str | None = None) -> str:
+    """Guarda ``path`` en el almacen por contenido y devuelve su sha256.
+
+    Si ya existe un blob con ese hash no se copia nada.
+    """
+    digest = digest or file_sha256(path)
+    target = _backup_object_path(objects_dir, digest)
+    if not _has_backup_object(objects_dir, digest):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        pending = target.with_name(f".{digest}.pending")
+        shutil.copy2(path, pending)
+        os.replace(pending, target)
+    return digest
+
+
+def _read_backup_objects(backup_dir: Path) -> Dict[str, str] | None:
+    """Nombre -> sha256 del respaldo; None si es un respaldo antiguo con copias."""
+    try:
+        manifest = json.loads((backup_dir / "backup_manifest.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    objects = manifest.get("objects")
+    return dict(objects) if isinstance(objects, dict) else None
+
+
+def _version_objects(version_dir: Path) -> Dict[str, str] | None:
+    """Archivo -> sha256 de una version; None si el manifest no tiene los hashes."""
+    manifest = _read_manifest(version_dir)
+    if not manifest:
+        return None
+    objects = {}
+    for item in (manifest.get("reports") or {}).values():
+        if not item.get("filename") or not item.get("sha256"):
+            return None
+        objects[str(item["filename"])] = str(item["sha256"])
+    if manifest.get("meta_data_sha256"):
+        objects["meta_data.json"] = str(manifest["meta_data_sha256"])
+    return objects
+
+
+def _timestamped_dirs(root: Path) -> list[tuple[datetime, Path]]:
+    """Respaldos o versiones (fecha, ruta) del mas reciente al mas antiguo."""
+    found = []
+    if not root.is_dir():
+        return found
+    for path in root.iterdir():
+        if not path.is_dir():
+            continue
+        try:
+            found.append((datetime.strptime(path.name, BACKUP_DIR_FORMAT), path))
+        except ValueError:
+            continue
+    return sorted(found, reverse=True)
+
+
+def _new_version_id(versions_root: Path, now: datetime) -> str:
+    version = now.strftime(BACKUP_DIR_FORMAT)
+    while (versions_root / version).exists():
+        now += timedelta(microseconds=1)
+        version = now.strftime(BACKUP_DIR_FORMAT)
+    return version
+
+
+def _migrate_flat_layout(active_dir: Path) -> None:
+    """Convierte el conjunto publicado en el esquema plano en la primera version."""
+    if current_version(active_dir) is not None:
+        return
+    flat_files = list(_active_report_files(active_dir))
+    if not flat_files:
+        return
+    for optional_name in ("manifest.json", DOWNLOAD_ARCHIVE_NAME):
+        if (active_dir / optional_name).exists():
+            flat_files.append(active_dir / optional_name)
+    versions_root = active_dir / VERSIONS_DIRNAME
+    versions_root.mkdir(parents=True, exist_ok=True)
+    published = max(path.stat().st_mtime for path in flat_files)
+    version = _new_version_id(versions_root, datetime.fromtimestamp(published, LIMA_TZ))
+    pending = versions_root / f".{version}.publishing"
+    pending.mkdir()
+    for path in flat_files:
+        os.replace(path, pending / path.name)
+    os.rename(pending, versions_root / version)
+    _point_current(active_dir, version)
+    logger.info(f"Migrated flat published set to version {version}")
+
+
+def _hydrate_version(active_dir: Path, version_dir: Path) -> None:
+    """Vuelve a poner los archivos de una version compactada a partir de los blobs."""
+    objects = _version_objects(version_dir) or {}
+    objects_dir = active_dir / "backups" / BACKUP_OBJECTS_DIRNAME
+    for filename, digest in objects.items():
+        target = version_dir / filename
+        if not target.exists():
+            _link_backup_object(objects_dir, digest, target)
+    if not (version_dir / DOWNLOAD_ARCHIVE_NAME).exists():
+        build_download_archive(version_dir)
+
+
+def _materialize_backup(active_dir: Path, backup_dir: Path) -> Path:
+    """Arma un directorio de version a partir de un respaldo antiguo (backups/<fecha>)."""
+    objects = _read_backup_objects(backup_dir)
+    versions_root = active_dir / VERSIONS_DIRNAME
+    version_dir = versions_root / backup_dir.name
+    pending = versions_root / f".{backup_dir.name}.publishing"
+    shutil.rmtree(pending, ignore_errors=True)
+    pending.mkdir(parents=True)
+    try:
+        if objects is None:
+            for path in backup_dir.iterdir():
+                if path.name != "backup_manifest.json":
+                    shutil.copy2(path, pending / path.name)
+        else:
+            objects_dir = backup_dir.parent / BACKUP_OBJECTS_DIRNAME
+            for name, digest in objects.items():
+                _link_backup_object(objects_dir, digest, pending / name)
+        os.rename(pending, version_dir)
+    except Exception:
+        shutil.rmtree(pending, ignore_errors=True)
+        raise
+    return version_dir
+
+
+class VersionNotFoundError(LookupError):
+    pass
+
+
+def list_versions(active_dir: str | Path) -> list[dict]:
+    """Versiones publicadas, de la mas reciente a la mas antigua."""
+    active_dir = Path(active_dir)
+    active = current_version(active_dir)
+    versions = []
+    for _, path in _timestamped_dirs(active_dir / VERSIONS_DIRNAME):
+        manifest = _read_manifest(path) or {}
+        objects = _version_objects(path) or {}
+        versions.append({
+            "version": path.name,
+            "published_at": manifest.get("published_at"),
+            "period": manifest.get("period"),
+            "active": path.name == active,
+            "compacted": any(not (path / filename).exists() for filename in objects),
+        })
+    return versions
+
+
+def activate_version(active_dir: str | Path, version: str) -> dict:
+    """Vuelve a publicar una version anterior cambiando solo el puntero ``current``.
+
+    Las versiones compactadas se rehidratan desde los blobs y los respaldos
+    antiguos (``backups/<fecha>``) se convierten primero en version.
+    """
     active_dir = Path(active_dir)
-    yielded = set()
-    for path in _active_report_files(active_dir):
-        if path.parent == active_dir and path.name not in yielded:
-            yielded.add(path.name)
-            yield path
-    manifest = active_dir / "manifest.json"
-    if manifest.exists():
-        yield manifest
-
-
-def _restore_backup(active_dir: Path, backup_dir: Path) -> None:
-    for path in list(_active_report_files(active_dir)):
+    if Path(version).name != version or version.startswith("."):
+        raise VersionNotFoundError(f"No existe la version {version}")
+    with BACKUP_LOCK:
+        _migrate_flat_layout(active_dir)
+        version_dir = active_dir / VERSIONS_DIRNAME / version
+        legacy_backup = active_dir / "backups" / version
+        if not version_dir.is_dir():
+            if version == BACKUP_OBJECTS_DIRNAME or not legacy_backup.is_dir():
+                raise VersionNotFoundError(f"No existe la version {version}")
+            version_dir = _materialize_backup(active_dir, legacy_backup)
+        _hydrate_version(active_dir, version_dir)
+        _point_current(active_dir, version)
+    logger.info(f"Activated published version {version}")
+    return _read_manifest(version_dir) or {}
+
+
+def select_backups_to_keep(
+    created: Sequence[datetime],
+    keep_last: int,
+    keep_daily_days: int,
+    keep_monthly: bool,
+    today: date | None = None,
+) -> set[datetime]:
+    """Aplica la politica de retencion sobre las fechas de los respaldos.
+
+    Se conservan los ``keep_last`` mas recientes, el ultimo de cada dia de los
+    ultimos ``keep_daily_days`` dias y, si ``keep_monthly``, el ultimo de cada mes.
+    """
+    ordered = sorted(created, reverse=True)
+    keep = set(ordered[:keep_last])
+    today = today or lima_today()
+    daily_since = today - timedelta(days=keep_daily_days)
+    seen_days = set()
+    seen_months = set()
+    for stamp in ordered:
+        day = stamp.date()
+        if day > daily_since and day not in seen_days:
+            seen_days.add(day)
+            keep.add(stamp)
+        month = (stamp.year, stamp.month)
+        if keep_monthly and month not in seen_months:
+            seen_months.add(month)
+            keep.add(stamp)
+    return keep
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _tree_size(path: Path) -> int:
+    return sum(_size(item) for item in path.rglob("*") if item.is_file())
+
+
+def _convert_legacy_backup(backup_dir: Path, objects_dir: Path) -> int:
+    """Pasa un respaldo con copias completas al almacen por contenido."""
+    copies = [path for path in backup_dir.iterdir() if path.name != "backup_manifest.json"]
+    objects = {path.name: _store_backup_object(objects_dir, path) for path in copies}
+    manifest_path = backup_dir / "backup_manifest.json"
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        manifest = {"created_at": None}
+    manifest.update({"files": sorted(objects), "objects": objects})
+    pending = backup_dir / ".backup_manifest.json.pending"
+    pending.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(pending, manifest_path)
+    reclaimed = 0
+    for path in copies:
+        reclaimed += _size(path)
         path.unlink(missing_ok=True)
-    (active_dir / "manifest.json").unlink(missing_ok=True)
-    for path in backup_dir.iterdir():
-        if path.name == "backup_manifest.json":
+    return reclaimed
+
+
+def _dehydrate_version(version_dir: Path, objects_dir: Path) -> int:
+    """Deja solo el manifest de una version antigua; sus archivos viven en los blobs."""
+    objects = _version_objects(version_dir)
+    if not objects or not all(_has_backup_object(objects_dir, digest) for digest in objects.values()):
+        return 0
+    reclaimed = _size(version_dir / DOWNLOAD_ARCHIVE_NAME)
+    (version_dir / DOWNLOAD_ARCHIVE_NAME).unlink(missing_ok=True)
+    for filename in objects:
+        (version_dir / filename).unlink(missing_ok=True)
+    return reclaimed
+
+
+def _compress_backup_object(blob: Path) -> int | None:
+    """Comprime ``blob`` con xz y devuelve los bytes recuperados; None si ya no hacia falta.
+
+    La compresion se escribe en un temporal sin tomar BACKUP_LOCK; el candado
+    solo cubre el rename y el borrado del original, asi una publicacion o un
+    rollback no esperan a xz.
+    """
+    compressed = _compressed_path(blob)
+    pending = compressed.with_name(f"{compressed.name}.{os.getpid()}.{threading.get_ident()}.pending")
+    try:
+        with open(blob, "rb") as source, lzma.open(
+            pending, "wb", preset=BACKUP_COMPRESSION_PRESET
+        ) as destination:
+            shutil.copyfileobj(source, destination, 1024 * 1024)
+        mtime_ns = blob.stat().st_mtime_ns
+        os.utime(pending, ns=(mtime_ns, mtime_ns))
+        with BACKUP_LOCK:
+            # Otro proceso pudo comprimirlo o borrarlo mientras tanto
+            if not blob.exists() or compressed.exists():
+                return None
+            size = _size(blob)
+            os.replace(pending, compressed)
+            blob.unlink()
+        return size - _size(compressed)
+    except FileNotFoundError:
+        return None
+    finally:
+        pending.unlink(missing_ok=True)
+
+
+def _apply_retention(entries: list[tuple[datetime, Path]], protected: str | None, today, summary) -> list[Path]:
+    keep = select_backups_to_keep(
+        [stamp for stamp, _ in entries],
+        BACKUP_KEEP_LAST,
+        BACKUP_KEEP_DAILY_DAYS,
+        BACKUP_KEEP_MONTHLY,
+        today,
+    )
+    kept = []
+    for stamp, path in entries:
+        if stamp in keep or path.name == protected:
+            kept.append(path)
+            continue
+        summary["bytes_reclaimed"] += _tree_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        summary["removed_backups"].append(path.name)
+    return kept
+
+
+def compact_backups(active_dir: str | Path, today: date | None = None) -> dict:
+    """Aplica la retencion a versiones y respaldos, borra blobs huerfanos y comprime.
+
+    Las ultimas BACKUP_KEEP_LAST versiones (y siempre la vigente) quedan completas
+    para volver a ellas al instante; las mas antiguas conservan solo su manifest
+    y sus blobs se comprimen. La compresion se detiene al agotar
+    BACKUP_COMPACTION_MAX_BYTES o BACKUP_COMPACTION_MAX_SECONDS; lo pendiente se
+    retoma en la siguiente ejecucion. Devuelve un resumen con los bytes recuperados.
+
+    BACKUP_LOCK solo se toma para decidir que conservar y para cada cambio
+    puntual (deshidratar una version, reemplazar un blob por su version xz);
+    la compresion corre fuera del candado.
+    """
+    active_dir = Path(active_dir)
+    backups_root = active_dir / "backups"
+    versions_root = active_dir / VERSIONS_DIRNAME
+    objects_dir = backups_root / BACKUP_OBJECTS_DIRNAME
+    summary = {
+        "removed_backups": [],
+        "removed_objects": 0,
+        "compressed_objects": 0,
+        "bytes_reclaimed": 0,
+    }
+    with BACKUP_LOCK:
+        active = current_version(active_dir)
+        if versions_root.is_dir():
+            # Publicaciones interrumpidas
+            for leftover in versions_root.glob(".*.publishing"):
+                shutil.rmtree(leftover, ignore_errors=True)
+
+        referenced: Dict[str, int] = {}
+        stale_versions = []
+        versions = _apply_retention(_timestamped_dirs(versions_root), active, today, summary)
+        for position, path in enumerate(versions):
+            if path.name == active:
+                position = 0
+            elif position >= BACKUP_KEEP_LAST:
+                stale_versions.append(path)
+            for digest in (_version_objects(path) or {}).values():
+                referenced[digest] = min(referenced.get(digest, position), position)
+
+        backups = _apply_retention(_timestamped_dirs(backups_root), None, today, summary)
+        for position, path in enumerate(backups):
+            objects = _read_backup_objects(path)
+            if objects is None:
+                summary["bytes_reclaimed"] += _convert_legacy_backup(path, objects_dir)
+                objects = _read_backup_objects(path) or {}
+            for digest in objects.values():
+                referenced[digest] = min(referenced.get(digest, position), position)
+
+        candidates = []
+        blobs = sorted(objects_dir.glob("*/*")) if objects_dir.is_dir() else []
+        for blob in blobs:
+            if blob.name.endswith(".pending"):
+                continue
+            digest = blob.name.removesuffix(COMPRESSED_SUFFIX)
+            if digest not in referenced:
+                summary["bytes_reclaimed"] += _size(blob)
+                blob.unlink(missing_ok=True)
+                summary["removed_objects"] += 1
+                continue
+            # Las versiones recientes quedan sin comprimir para volver a ellas rapido
+            if not blob.name.endswith(COMPRESSED_SUFFIX) and referenced[digest] >= BACKUP_KEEP_LAST:
+                candidates.append(blob)
+
+    for path in stale_versions:
+        with BACKUP_LOCK:
+            # Pudo reactivarse mientras tanto
+            if path.name != current_version(active_dir):
+                summary["bytes_reclaimed"] += _dehydrate_version(path, objects_dir)
+
+    deadline = time.monotonic() + BACKUP_COMPACTION_MAX_SECONDS
+    budget = BACKUP_COMPACTION_MAX_BYTES
+    for blob in candidates:
+        size = _size(blob)
+        if size > budget or time.monotonic() > deadline:
             continue
-        shutil.copy2(path, active_dir / path.name)
+        budget -= size
+        reclaimed = _compress_backup_object(blob)
+        if reclaimed is not None:
+            summary["bytes_reclaimed"] += reclaimed
+            summary["compressed_objects"] += 1
+
+    logger.info(
+        f"Backup compaction: removed {len(summary['removed_backups'])} backups and "
+        f"{summary['removed_objects']} objects, compressed {summary['compressed_objects']} "
+        f"objects, reclaimed {summary['bytes_reclaimed']} bytes"
+    )
+    return summary
+
+
+def _matches_active_set(
+    directory: Path, manifest: dict | None, validation: Mapping[str, Mapping[str, object]]
+) -> bool:
+    """Indica si la validacion describe los mismos datos que el conjunto publicado.
+
+    Cada reporte debe coincidir en sha256 del archivo o en digest de filas, y el
+    periodo solicitado debe ser el mismo.
+    """
+    if not manifest or not validation:
+        return False
+    requested_start = getattr(validation, "start_date", None)
+    requested_end = getattr(validation, "end_date", None)
+    period = manifest.get("period") or {}
+    if requested_start and period.get("start") != requested_start.isoformat():
+        return False
+    if requested_end and period.get("end") != requested_end.isoformat():
+        return False
+    published = manifest.get("reports") or {}
+    if set(published) != set(validation):
+        return False
+    for name, item in validation.items():
+        current = published[name]
+        if current.get("filename") != item.get("filename"):
+            return False
+        if not (directory / str(item["filename"])).exists():
+            return False
+        same_file = item.get("sha256") and current.get("sha256") == item.get("sha256")
+        same_rows = item.get("row_digest") and current.get("row_digest") == item.get("row_digest")
+        if not (same_file or same_rows):
+            return False
+    return True
 
 
 def publish_report_set(
@@ -194,25 +1321,66 @@ def publish_report_set(
     validation: Mapping[str, Mapping[str, object]],
     goals: Mapping[str, Mapping[str, int]] | None = None,
 ) -> dict:
+    with BACKUP_LOCK:
+        directory = current_dir(active_dir)
+        active_manifest = _read_manifest(directory)
+        if _matches_active_set(directory, active_manifest, validation):
+            logger.info("Validated reports match the active set; publish skipped")
+            return {
+                "version": current_version(active_dir),
+                "version_dir": str(directory),
+                "previous_version": None,
+                "manifest": active_manifest,
+                "frames": {},
+                "unchanged": True,
+            }
+        return _publish_report_set(staging_dir, active_dir, validation, goals)
+
+
+def _cache_validated_frames(
+    active_dir: str | Path, version_dir: Path, validation: Mapping[str, Mapping[str, object]]
+) -> dict:
+    frames = getattr(validation, "frames", {})
+    cache = ReportCache(active_dir)
+    loaded = {}
+    for name, item in validation.items():
+        frame = frames.get(name)
+        if frame is None:
+            continue
+        target = version_dir / str(item["filename"])
+        data_key = REPORT_DEFINITIONS[name].data_key
+        fingerprint = file_fingerprint(target)
+        cache.store(data_key, target, frame, fingerprint)
+        loaded[data_key] = (str(target), fingerprint, frame)
+    return loaded
+
+
+def _publish_report_set(
+    staging_dir: str | Path,
+    active_dir: str | Path,
+    validation: Mapping[str, Mapping[str, object]],
+    goals: Mapping[str, Mapping[str, int]] | None,
+) -> dict:
+    """Arma la nueva version aparte y la activa cambiando el puntero ``current``.
+
+    Si algo falla antes del cambio de puntero, la version vigente no se toca.
+    """
     staging_dir = Path(staging_dir)
     active_dir = Path(active_dir)
     active_dir.mkdir(parents=True, exist_ok=True)
+    _migrate_flat_layout(active_dir)
+    previous = current_version(active_dir)
 
     now = datetime.now(LIMA_TZ)
-    backup_dir = active_dir / "backups" / now.strftime("%Y%m%d_%H%M%S_%f")
-    backup_dir.mkdir(parents=True, exist_ok=False)
-
-    current_files = list(_active_report_files(active_dir))
-    for optional_name in ("meta_data.json", "manifest.json"):
-        optional_path = active_dir / optional_name
-        if optional_path.exists():
-            current_files.append(optional_path)
-    for path in current_files:
-        shutil.copy2(path, backup_dir / path.name)
+    versions_root = active_dir / VERSIONS_DIRNAME
+    versions_root.mkdir(parents=True, exist_ok=True)
+    version = _new_version_id(versions_root, now)
+    objects_dir = active_dir / "backups" / BACKUP_OBJECTS_DIRNAME
 
     requested_start = getattr(validation, "start_date", None)
     requested_end = getattr(validation, "end_date", None)
     manifest = {
+        "version": version,
         "published_at": now.isoformat(),
         "period": {
             "start": (
@@ -233,42 +1401,48 @@ def publish_report_set(
         "goals": goals or {},
     }
 
-    pending_paths = []
+    pending_dir = versions_root / f".{version}.publishing"
+    pending_dir.mkdir()
     try:
+        # Cada archivo se guarda una sola vez en el almacen por contenido y la
+        # version lo enlaza: los reportes sin cambios no se copian de nuevo.
         for name, item in validation.items():
             source = Path(str(item["source_path"]))
-            target_name = str(item["filename"])
-            pending = active_dir / f".{target_name}.publishing"
-            shutil.copy2(source, pending)
-            pending_paths.append((pending, active_dir / target_name, name))
+            digest = _store_backup_object(objects_dir, source, item.get("sha256"))
+            manifest["reports"][name]["sha256"] = digest
+            _link_backup_object(objects_dir, digest, pending_dir / str(item["filename"]))
+        # Copia de las metas vigentes al publicar (respaldo; activar no la restaura)
+        meta_path = active_dir / "meta_data.json"
+        if meta_path.exists():
+            digest = _store_backup_object(objects_dir, meta_path)
+            manifest["meta_data_sha256"] = digest
+            _link_backup_object(objects_dir, digest, pending_dir / "meta_data.json")
 
-        manifest_pending = active_dir / ".manifest.json.publishing"
-        manifest_pending.write_text(
+        (pending_dir / "manifest.json").write_text(
             json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8"
         )
-
-        for pending, target, name in pending_paths:
-            for existing in list(_active_report_files(active_dir)):
-                if existing.name.startswith(REPORT_DEFINITIONS[name].prefix) and existing != target:
-                    existing.unlink(missing_ok=True)
-            os.replace(pending, target)
-        os.replace(manifest_pending, active_dir / "manifest.json")
+        # Sin ZIP armado la descarga se genera al vuelo; no se aborta la publicacion
+        try:
+            build_download_archive(pending_dir)
+        except Exception as exc:
+            logger.warning(f"Could not prebuild download archive: {exc}")
+        version_dir = versions_root / version
+        os.rename(pending_dir, version_dir)
     except Exception:
-        for pending, _, _ in pending_paths:
-            pending.unlink(missing_ok=True)
-        (active_dir / ".manifest.json.publishing").unlink(missing_ok=True)
-        _restore_backup(active_dir, backup_dir)
+        shutil.rmtree(pending_dir, ignore_errors=True)
         raise
 
-    (backup_dir / "backup_manifest.json").write_text(
-        json.dumps(
-            {
-                "created_at": now.isoformat(),
-                "files": sorted(path.name for path in current_files),
-            },
-            indent=2,
-            ensure_ascii=False,
-        ),
-        encoding="utf-8",
-    )
-    return {"backup_dir": str(backup_dir), "manifest": manifest}
+    # Los frames canonicos de la validacion quedan como cache del archivo publicado
+    # antes de activar la version: el primer lector tras el cambio ya no reparsea.
+    loaded = _cache_validated_frames(active_dir, version_dir, validation)
+    _point_current(active_dir, version)
+    logger.info(f"Published version {version} (previous: {previous})")
+
+    return {
+        "version": version,
+        "version_dir": str(version_dir),
+        "previous_version": previous,
+        "manifest": manifest,
+        "frames": loaded,
+        "unchanged": False,
+    }
@@ -1,20 +1,35 @@
 import time
 import os
 import glob
+import json
 import shutil
 import logging
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
+import requests
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 
+from evolta_export_client import EvoltaExportClient
+from wait_engine import (
+    WaitEngine,
+    ajax_finished,
+    alert_present,
+    arm_ajax_tracker,
+    attribute_equals,
+    document_ready,
+    download_settled,
+    element_clickable,
+    element_present,
+    url_excludes,
+)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -58,6 +73,39 @@ DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", r"C:\Users\Yrving\Downloads\CARPETA_SEM
 URL_LOGIN = "https://v4.evolta.pe/Login/Acceso/Index"
 LIMA_TZ = ZoneInfo("America/Lima")
 
+# "selenium" (por defecto): el flujo con Chrome. "auto": exporta por HTTP y usa Chrome
+# solo para los reportes que fallen. "http": solo HTTP (sin navegador).
+# La exportación por HTTP toma la acción y los campos del formulario de cada página;
+# no se verificó todavía contra una sesión real de Evolta.
+EVOLTA_EXPORT_MODE = os.getenv("EVOLTA_EXPORT_MODE", "selenium").lower()
+
+# Exportación con Chrome: tras un solo login se abre una pestaña por reporte, cada una
+# con su propia carpeta de descarga. Se abren como máximo EVOLTA_EXPORT_CONCURRENCY y
+# solo si quedan EVOLTA_EXPORT_MIN_FREE_MB libres (1 = un reporte a la vez, como antes).
+EVOLTA_EXPORT_CONCURRENCY = int(os.getenv("EVOLTA_EXPORT_CONCURRENCY", "2"))
+EVOLTA_EXPORT_MIN_FREE_MB = int(os.getenv("EVOLTA_EXPORT_MIN_FREE_MB", "150"))
+
+# Detección de descargas: "events" usa los eventos de descarga de DevTools (sin
+# sondear la carpeta); "folder" compara el contenido de la carpeta como antes.
+EVOLTA_DOWNLOAD_CAPTURE = os.getenv("EVOLTA_DOWNLOAD_CAPTURE", "events").lower()
+DOWNLOADS_DIRNAME = ".downloads"
+
+# Plazo (segundos) de cada espera por condición; EVOLTA_WAIT_TIMEOUT_SCALE los escala
+# todos cuando Evolta está lento.
+WAIT_TIMEOUT_SCALE = float(os.getenv("EVOLTA_WAIT_TIMEOUT_SCALE", "1"))
+WAIT_TIMEOUTS = {
+    "page": 30,
+    "login": 30,
+    "select": 10,
+    "ajax": 60,
+    "export_button": 20,
+    "alert": 1,
+}
+
+
+def wait_timeout(step):
+    return WAIT_TIMEOUTS[step] * WAIT_TIMEOUT_SCALE
+
 
 @dataclass(frozen=True)
 class ReportConfig:
@@ -94,6 +142,29 @@ def lima_today():
     return datetime.now(LIMA_TZ).date()
 
 
+def available_memory_mb():
+    """Memoria libre en MB (límite del contenedor o /proc/meminfo); None si no se puede saber."""
+    candidates = []
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            limit = f.read().strip()
+        if limit != "max":
+            with open("/sys/fs/cgroup/memory.current") as f:
+                current = int(f.read().strip())
+            candidates.append((int(limit) - current) / 2**20)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    candidates.append(int(line.split()[1]) / 1024)
+                    break
+    except (OSError, ValueError):
+        pass
+    return min(candidates) if candidates else None
+
+
 def get_default_period():
     today = lima_today()
     start = today.replace(day=1)
@@ -103,10 +174,82 @@ def get_default_period():
     return start.strftime("%d/%m/%Y"), end.strftime("%d/%m/%Y")
 
 
+class DownloadCapture:
+    """
+    Sigue las descargas de Chrome con los eventos de DevTools (downloadWillBegin /
+    downloadProgress) que chromedriver deja en el log "performance".
+    Chrome guarda cada descarga en ``directory`` con su GUID como nombre, así
+    ningún otro archivo se confunde con la exportación, y el evento "completed"
+    marca el final sin esperas fijas.
+    """
+    BEGIN_EVENTS = ("Browser.downloadWillBegin", "Page.downloadWillBegin")
+    PROGRESS_EVENTS = ("Browser.downloadProgress", "Page.downloadProgress")
+
+    def __init__(self, driver, directory):
+        self.driver = driver
+        self.directory = directory
+        self.downloads = {}
+        os.makedirs(directory, exist_ok=True)
+        driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+            "behavior": "allowAndName",
+            "downloadPath": os.path.abspath(directory),
+            "eventsEnabled": True,
+        })
+        # Descarta los eventos previos (login, navegación)
+        self.poll()
+
+    def poll(self):
+        """Procesa los eventos nuevos y devuelve las descargas que terminaron o se cancelaron."""
+        finished = []
+        for entry in self.driver.get_log("performance"):
+            try:
+                payload = json.loads(entry["message"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            message = payload.get("message") or {}
+            params = message.get("params") or {}
+            guid = params.get("guid")
+            if not guid:
+                continue
+            download = self.downloads.setdefault(guid, {"guid": guid, "state": "inProgress"})
+            method = message.get("method")
+            if method in self.BEGIN_EVENTS:
+                download.update(
+                    filename=params.get("suggestedFilename") or "",
+                    frame=params.get("frameId"),
+                    target=payload.get("webview"),
+                )
+            elif method in self.PROGRESS_EVENTS:
+                state = params.get("state")
+                # Browser.* y Page.* informan la misma descarga; se cuenta una vez
+                if state in ("completed", "canceled") and download["state"] == "inProgress":
+                    download["state"] = state
+                    finished.append(download)
+        return finished
+
+    def path(self, download):
+        return os.path.join(self.directory, download["guid"])
+
+    def wait(self, timeout=180):
+        """Espera la próxima descarga terminada (una sola pestaña exportando)."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            finished = self.poll()
+            if finished:
+                return finished[0]
+            time.sleep(0.2)
+        return None
+
+
 class EvoltaScraper:
     def __init__(self, download_dir=DOWNLOAD_DIR):
         self.download_dir = download_dir
         self.driver = None
+        self.capture = None
+        self.waits = None
+        # Con keep_browser, run_sync deja Chrome abierto y con sesión para la próxima
+        # sincronización (ver browser_worker.BrowserWorker)
+        self.keep_browser = False
         self._ensure_download_dir()
 
     def _ensure_download_dir(self):
@@ -161,6 +304,10 @@ class EvoltaScraper:
             "profile.default_content_setting_values.automatic_downloads": 1
         }
         options.add_experimental_option("prefs", prefs)
+        if EVOLTA_DOWNLOAD_CAPTURE == "events":
+            # Solo eventos de Page (las descargas); sin Network para no llenar el log
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+            options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": False, "enablePage": True})
         
         # En producción usar chromedriver instalado, en desarrollo usar webdriver-manager
         if is_production:
@@ -170,19 +317,98 @@ class EvoltaScraper:
             service = Service(ChromeDriverManager().install())
             
         self.driver = webdriver.Chrome(service=service, options=options)
-        self.wait = WebDriverWait(self.driver, 20)
+        self.waits = WaitEngine(self.driver)
         logger.info("Chrome driver started")
+        if EVOLTA_DOWNLOAD_CAPTURE == "events":
+            try:
+                self.capture = DownloadCapture(
+                    self.driver, os.path.join(self.download_dir, DOWNLOADS_DIRNAME)
+                )
+            except Exception as e:
+                logger.warning(f"Download events unavailable, polling the folder instead: {e}")
+                self.capture = None
 
     def close(self):
         if self.driver:
-            self.driver.quit()
-            logger.info("Driver closed")
+            try:
+                self.driver.quit()
+                logger.info("Driver closed")
+            except WebDriverException as e:
+                logger.warning(f"Driver quit failed: {e}")
+        self.driver = None
+        self.capture = None
+        self.waits = None
+
+    def use_download_dir(self, download_dir):
+        """Cambia el directorio de descarga, también en un Chrome ya abierto."""
+        self.download_dir = download_dir
+        self._ensure_download_dir()
+        if self.driver is None:
+            return
+        if self.capture is not None:
+            self.capture = DownloadCapture(self.driver, os.path.join(download_dir, DOWNLOADS_DIRNAME))
+        else:
+            self.driver.execute_cdp_cmd(
+                "Page.setDownloadBehavior",
+                {"behavior": "allow", "downloadPath": os.path.abspath(download_dir)},
+            )
+
+    def browser_alive(self):
+        if self.driver is None:
+            return False
+        try:
+            self.driver.current_window_handle
+            return True
+        except WebDriverException:
+            return False
+
+    def session_valid(self):
+        """
+        Revalida las cookies del navegador antes de reutilizarlo: ninguna vencida y
+        Evolta sirve una página de reporte sin redirigir al login.
+        """
+        try:
+            cookies = self.driver.get_cookies()
+        except WebDriverException:
+            return False
+        now = time.time()
+        if not cookies or any(cookie.get("expiry", now + 1) <= now for cookie in cookies):
+            return False
+        probe = next(iter(REPORTS.values())).url
+        with requests.Session() as session:
+            for cookie in cookies:
+                session.cookies.set(
+                    cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/")
+                )
+            try:
+                resp = session.get(probe, timeout=15, allow_redirects=False)
+            except requests.RequestException as e:
+                logger.warning(f"Session check failed: {e}")
+                return False
+        return resp.status_code == 200 and "Login" not in resp.headers.get("Location", "")
+
+    def ensure_session(self):
+        """Deja Chrome abierto y con sesión iniciada, reutilizando el actual si sigue válido."""
+        if self.browser_alive():
+            if self.session_valid():
+                logger.info("Reusing warm browser session")
+                return
+            logger.info("Browser session expired, logging in again")
+            self.login()
+            return
+        if self.driver is not None:
+            logger.warning("Browser is no longer responding, starting a new one")
+            self.close()
+        self.start_driver()
+        self.login()
 
     def login(self):
         logger.info("Logging in to Evolta...")
         try:
             self.driver.get(URL_LOGIN)
-            time.sleep(2)
+            self.waits.until(
+                "login form", element_present(By.XPATH, "//input[@type='password']"), wait_timeout("login")
+            )
             
             # Buscar campo usuario
             user_field = None
@@ -215,7 +441,7 @@ class EvoltaScraper:
                 pass_field.send_keys(Keys.ENTER)
             
             # Esperar cambio de URL
-            time.sleep(3)
+            self.waits.until("login redirect", url_excludes("Login"), wait_timeout("login"), required=False)
             self._dismiss_popup()
             
             if "Login" not in self.driver.current_url:
@@ -241,7 +467,6 @@ class EvoltaScraper:
             
             # ESC key
             self.driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
-            time.sleep(0.5)
         except:
             pass
 
@@ -306,8 +531,9 @@ class EvoltaScraper:
             }}
             return false;
         """
+        arm_ajax_tracker(self.driver)
         result = self.driver.execute_script(script)
-        time.sleep(1)
+        self.waits.until("dates applied", ajax_finished(), wait_timeout("select"), required=False)
         return result
 
     def _click_search(self):
@@ -327,8 +553,10 @@ class EvoltaScraper:
                 except: pass
             
             if btn:
+                arm_ajax_tracker(self.driver)
                 self.driver.execute_script("arguments[0].click();", btn)
-                time.sleep(4) # Esperar recarga
+                # Esperar recarga de la grilla
+                self.waits.until("grid reload", ajax_finished(), wait_timeout("ajax"), required=False)
                 
                 # Check for alerts post-click
                 self._dismiss_popup()
@@ -340,40 +568,14 @@ class EvoltaScraper:
             logger.warning(f"Error clicking search: {e}")
 
     def _wait_for_new_file(self, files_before, timeout=180):
-        """Espera que aparezca un archivo NUEVO que no existía antes. Timeout 180s."""
+        """Espera que aparezca un archivo NUEVO que no existía antes y termine de escribirse."""
         logger.info("Waiting for new file...")
-        start_time = time.time()
-        
-        while (time.time() - start_time) < timeout:
-            # Verificar si hay archivos descargándose
-            downloading = glob.glob(os.path.join(self.download_dir, "*.crdownload"))
-            if downloading:
-                logger.info(f"Download in progress: {downloading}")
-            
-            # Obtener archivos actuales
-            current_files = self._get_existing_files()
-            
-            # Encontrar archivos nuevos
-            new_files = current_files - files_before
-            
-            if new_files:
-                # Esperar un momento para asegurar que la descarga termine
-                time.sleep(2)
-                # Verificar de nuevo
-                current_files = self._get_existing_files()
-                new_files = current_files - files_before
-                
-                if new_files:
-                    new_file = list(new_files)[0]
-                    # Verificar que NO sea .crdownload, .tmp ni .partial
-                    if not new_file.endswith('.crdownload') and not new_file.endswith('.tmp') and not new_file.endswith('.partial'):
-                         logger.info(f"New file detected: {new_file}")
-                         return new_file
-            
-            time.sleep(1)
-            
-        logger.warning("Timeout waiting for new file")
-        return None
+        new_file = self.waits.until(
+            "download", download_settled(self.download_dir, files_before), timeout, required=False, poll=0.5
+        )
+        if new_file:
+            logger.info(f"New file detected: {new_file}")
+        return new_file
 
     def _select_all_projects(self, filename, report):
         """Selecciona y verifica la opcion equivalente a todos los proyectos."""
@@ -413,11 +615,18 @@ class EvoltaScraper:
                 options = [(option.text, option.get_attribute("value")) for option in select.options]
                 raise Exception(f"No se encontro la opcion Todos en {filename}. Opciones: {options}")
 
+            expected_value = select.first_selected_option.get_attribute("value") or ""
+            arm_ajax_tracker(self.driver)
             self.driver.execute_script(
                 "arguments[0].dispatchEvent(new Event('change', { bubbles: true }));",
                 select_elem,
             )
-            time.sleep(1)
+            self.waits.until(
+                "project selection",
+                attribute_equals(select_elem, "value", expected_value),
+                wait_timeout("select"),
+            )
+            self.waits.until("project change", ajax_finished(), wait_timeout("select"), required=False)
             selected_options = select.all_selected_options
             if not selected_options:
                 raise Exception(f"Evolta no confirmo la seleccion de proyectos para {filename}")
@@ -430,6 +639,169 @@ class EvoltaScraper:
             logger.error(f"Error selecting all projects for {filename}: {e}")
             raise
 
+    def _open_report(self, report, filename, start_date=None, end_date=None):
+        """
+        Navega al reporte en la pestaña actual, selecciona todos los proyectos,
+        configura fechas y pulsa Exportar.
+        Devuelve False si Evolta avisa que no habrá descarga (ej. sin registros).
+        """
+        url = report.url
+        # Navegación robusta con reintentos
+        navigated = False
+        for attempt in range(3):
+            try:
+                logger.info(f"Navigating to {url} (Attempt {attempt+1})")
+                self.driver.get(url)
+                self.waits.until("page load", document_ready(), wait_timeout("page"))
+
+                # Verificar si hubo alerta inesperada
+                self._dismiss_popup()
+
+                # Detección de Error 500 / Inesperado
+                try:
+                    body_text = self.driver.find_element(By.TAG_NAME, "body").text.lower()
+                    if "error inesperado" in body_text or "error 500" in body_text or "ha ocurrido un error" in body_text:
+                        logger.warning(f"Detected Error Page (500/Inesperado) on attempt {attempt+1}. Retrying...")
+                        self.driver.refresh()
+                        self.waits.until("page reload", document_ready(), wait_timeout("page"), required=False)
+                        continue 
+                except: pass
+
+                if url.split('?')[0] in self.driver.current_url:
+                    navigated = True
+                    break
+            except Exception as e:
+                logger.warning(f"Navigation error: {e}")
+                # Si hay alerta, intentar cerrarla
+                self._dismiss_popup()
+                self.waits.until("page recovery", document_ready(), wait_timeout("page"), required=False)
+
+        if not navigated:
+            raise Exception(f"Failed to navigate to {url} after 3 attempts")
+
+        self._dismiss_popup()
+
+        # Zoom out
+        self.driver.execute_script("document.body.style.zoom='65%'")
+
+        # 1. SELECCIONAR TODOS LOS PROYECTOS SEGUN ESTE REPORTE
+        self._select_all_projects(filename, report)
+
+        # 2. Configurar fechas
+        self._set_dates(start_date, end_date)
+
+        # 3. IMPORTANTE: Click Buscar para refrescar datos con las fechas nuevas y proyecto
+        self._click_search()
+
+        # Scroll al fondo
+        self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+
+        # Click en Exportar
+        export_clicked = False
+
+        # Intentar por ID con espera explícita
+        try:
+            # El botón de exportar es crítico: se espera a que esté habilitado
+            btn = self.waits.until(
+                "export button", element_clickable(By.ID, "btnExportar"), wait_timeout("export_button")
+            )
+            self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", btn)
+            self.driver.execute_script("arguments[0].click();", btn)
+            export_clicked = True
+            logger.info("Clicked btnExportar by ID")
+        except:
+            pass
+
+        # Intentar por texto
+        if not export_clicked:
+            for xpath in [
+                "//button[contains(text(),'Exportar')]",
+                "//button[contains(text(),'EXPORTAR')]",
+                "//input[@value='Exportar']",
+                "//a[contains(text(),'Exportar')]"
+            ]:
+                try:
+                    btn = self.driver.find_element(By.XPATH, xpath)
+                    self.driver.execute_script("arguments[0].click();", btn)
+                    export_clicked = True
+                    logger.info(f"Clicked export via: {xpath}")
+                    break
+                except:
+                    continue
+
+        if not export_clicked:
+            self._save_screenshot(f"error_export_{filename}")
+            raise Exception(f"No se pudo clickear Exportar en {url}")
+
+        # --- NUEVO: Verificar si salió alerta después de exportar (ej: "No hay registros") ---
+        try:
+            alert = self.waits.until("export alert", alert_present(), wait_timeout("alert"), required=False)
+            if alert is None:
+                return True
+            alert_text = alert.text
+            logger.warning(f"Alert detected after export click: {alert_text}")
+            alert.accept()
+            # Si dice "no existen", "sin información", etc., asumimos que no hay descarga
+            if "no" in alert_text.lower() or "sin" in alert_text.lower() or "vaci" in alert_text.lower():
+                 logger.warning(f"Aborting download wait due to alert: {alert_text}")
+                 return False
+        except:
+            pass
+        # -------------------------------------------------------------------------------------
+
+        return True
+
+    def _store_download(self, new_file, filename):
+        """Mueve la descarga a download_dir con el nombre del reporte"""
+        # Renombrar al nombre deseado
+        ext = os.path.splitext(new_file)[1]
+        target = os.path.join(self.download_dir, f"{filename}{ext}")
+
+        # Si el archivo nuevo YA tiene el nombre correcto, no hacer nada
+        if os.path.abspath(new_file) == os.path.abspath(target):
+            logger.info(f"File already has correct name: {target}")
+            return target
+
+        # Si ya existe el target, eliminarlo primero
+        if os.path.exists(target):
+            try:
+                os.remove(target)
+                logger.info(f"Removed existing: {target}")
+            except Exception as e:
+                logger.warning(f"Could not remove {target}: {e}")
+                # Usar nombre alternativo
+                target = os.path.join(self.download_dir, f"{filename}_{datetime.now().strftime('%H%M%S')}{ext}")
+
+        # El archivo llega ya terminado (download_settled: sin parciales y tamaño estable)
+        # Renombrar
+        try:
+            shutil.move(new_file, target)
+            logger.info(f"Saved as: {target}")
+            return target
+        except Exception as e:
+            logger.warning(f"Could not move file: {e}")
+            # El archivo descargado sigue existiendo con su nombre original
+            logger.info(f"Keeping original: {new_file}")
+            return new_file
+
+    def _store_capture(self, download, filename):
+        """Mueve la descarga capturada a download_dir con un rename atómico"""
+        ext = os.path.splitext(download.get("filename") or "")[1] or ".xlsx"
+        target = os.path.join(self.download_dir, f"{filename}{ext}")
+        os.replace(self.capture.path(download), target)
+        logger.info(f"Saved as: {target}")
+        return target
+
+    def _await_capture(self, filename, timeout=180):
+        download = self.capture.wait(timeout)
+        if download is None:
+            logger.warning(f"Timeout waiting for the download of {filename}")
+            return None
+        if download["state"] != "completed":
+            logger.warning(f"Download of {filename} was canceled")
+            return None
+        return self._store_capture(download, filename)
+
     def _export_report(self, report, filename, start_date=None, end_date=None):
         """Exporta un reporte de la URL dada"""
         url = report.url
@@ -438,149 +810,21 @@ class EvoltaScraper:
         # Guardar lista de archivos ANTES de descargar
         files_before = self._get_existing_files()
         
-        # Guardar lista de archivos ANTES de descargar
-        files_before = self._get_existing_files()
-        
         try:
-            # Navegación robusta con reintentos
-            navigated = False
-            for attempt in range(3):
-                try:
-                    logger.info(f"Navigating to {url} (Attempt {attempt+1})")
-                    self.driver.get(url)
-                    time.sleep(3)
-                    
-                    # Verificar si hubo alerta inesperada
-                    self._dismiss_popup()
-                    
-                    # Detección de Error 500 / Inesperado
-                    try:
-                        body_text = self.driver.find_element(By.TAG_NAME, "body").text.lower()
-                        if "error inesperado" in body_text or "error 500" in body_text or "ha ocurrido un error" in body_text:
-                            logger.warning(f"Detected Error Page (500/Inesperado) on attempt {attempt+1}. Retrying...")
-                            self.driver.refresh()
-                            time.sleep(3)
-                            continue 
-                    except: pass
-
-                    if url.split('?')[0] in self.driver.current_url:
-                        navigated = True
-                        break
-                except Exception as e:
-                    logger.warning(f"Navigation error: {e}")
-                    # Si hay alerta, intentar cerrarla
-                    self._dismiss_popup()
-                    time.sleep(2)
-            
-            if not navigated:
-                raise Exception(f"Failed to navigate to {url} after 3 attempts")
+            if not self._open_report(report, filename, start_date, end_date):
+                return None
 
-            self._dismiss_popup()
-            
-            # Zoom out
-            self.driver.execute_script("document.body.style.zoom='65%'")
-            time.sleep(1)
-            
-            # 1. SELECCIONAR TODOS LOS PROYECTOS SEGUN ESTE REPORTE
-            self._select_all_projects(filename, report)
-            
-            # 2. Configurar fechas
-            self._set_dates(start_date, end_date)
-            
-            # 3. IMPORTANTE: Click Buscar para refrescar datos con las fechas nuevas y proyecto
-            self._click_search()
-            
-            # Scroll al fondo
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
-            
-            # Click en Exportar
-            export_clicked = False
-            
-            # Intentar por ID con espera explícita
-            try:
-                # Usar wait normal para el botón de exportar, es crítico
-                btn = self.wait.until(EC.element_to_be_clickable((By.ID, "btnExportar")))
-                self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", btn)
-                time.sleep(0.5)
-                self.driver.execute_script("arguments[0].click();", btn)
-                export_clicked = True
-                logger.info("Clicked btnExportar by ID")
-            except:
-                pass
-            
-            # Intentar por texto
-            if not export_clicked:
-                for xpath in [
-                    "//button[contains(text(),'Exportar')]",
-                    "//button[contains(text(),'EXPORTAR')]",
-                    "//input[@value='Exportar']",
-                    "//a[contains(text(),'Exportar')]"
-                ]:
-                    try:
-                        btn = self.driver.find_element(By.XPATH, xpath)
-                        self.driver.execute_script("arguments[0].click();", btn)
-                        export_clicked = True
-                        logger.info(f"Clicked export via: {xpath}")
-                        break
-                    except:
-                        continue
-            
-            if not export_clicked:
-                self._save_screenshot(f"error_export_{filename}")
-                raise Exception(f"No se pudo clickear Exportar en {url}")
-            
-            # --- NUEVO: Verificar si salió alerta después de exportar (ej: "No hay registros") ---
-            try:
-                time.sleep(1) # Esperar a que la alerta aparezca
-                alert = self.driver.switch_to.alert
-                alert_text = alert.text
-                logger.warning(f"Alert detected after export click: {alert_text}")
-                alert.accept()
-                # Si dice "no existen", "sin información", etc., asumimos que no hay descarga
-                if "no" in alert_text.lower() or "sin" in alert_text.lower() or "vaci" in alert_text.lower():
-                     logger.warning(f"Aborting download wait due to alert: {alert_text}")
-                     return None
-            except:
-                pass
-            # -------------------------------------------------------------------------------------
+            if self.capture is not None:
+                target = self._await_capture(filename)
+                if target is None:
+                    self._save_screenshot(f"error_download_{filename}")
+                return target
 
             # Esperar que aparezca archivo NUEVO
             new_file = self._wait_for_new_file(files_before)
             
             if new_file:
-                # Renombrar al nombre deseado
-                ext = os.path.splitext(new_file)[1]
-                target = os.path.join(self.download_dir, f"{filename}{ext}")
-                
-                # Si el archivo nuevo YA tiene el nombre correcto, no hacer nada
-                if os.path.abspath(new_file) == os.path.abspath(target):
-                    logger.info(f"File already has correct name: {target}")
-                    return target
-                
-                # Si ya existe el target, eliminarlo primero
-                if os.path.exists(target):
-                    try:
-                        os.remove(target)
-                        logger.info(f"Removed existing: {target}")
-                    except Exception as e:
-                        logger.warning(f"Could not remove {target}: {e}")
-                        # Usar nombre alternativo
-                        target = os.path.join(self.download_dir, f"{filename}_{datetime.now().strftime('%H%M%S')}{ext}")
-                
-                # Esperar un momento para asegurar que el archivo no está en uso
-                time.sleep(1)
-                
-                # Renombrar
-                try:
-                    shutil.move(new_file, target)
-                    logger.info(f"Saved as: {target}")
-                    return target
-                except Exception as e:
-                    logger.warning(f"Could not move file: {e}")
-                    # El archivo descargado sigue existiendo con su nombre original
-                    logger.info(f"Keeping original: {new_file}")
-                    return new_file
+                return self._store_download(new_file, filename)
             else:
                 logger.error(f"Download failed for {filename}")
                 self._save_screenshot(f"error_download_{filename}")
@@ -591,6 +835,177 @@ class EvoltaScraper:
             self._save_screenshot(f"error_{filename}")
             return None
 
+    def _memory_allows_tab(self):
+        available = available_memory_mb()
+        if available is None or available >= EVOLTA_EXPORT_MIN_FREE_MB:
+            return True
+        logger.info(f"Waiting for memory before opening another tab ({available:.0f} MB free)")
+        return False
+
+    def _close_tab(self, handle, main_handle):
+        try:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        except Exception as e:
+            logger.warning(f"Could not close tab: {e}")
+        self.driver.switch_to.window(main_handle)
+
+    def _start_tab_export(self, report, filename, main_handle, start_date=None, end_date=None):
+        """
+        Abre una pestaña y pulsa Exportar en ella. Devuelve el handle, la carpeta
+        de descarga propia (modo folder) y el target de DevTools (modo events).
+        """
+        directory = os.path.join(self.download_dir, f".tab_{filename}")
+        self.driver.switch_to.new_window("tab")
+        handle = self.driver.current_window_handle
+        try:
+            if self.capture is not None:
+                # Las descargas capturadas se atribuyen a la pestaña por su target
+                target = self.driver.execute_cdp_cmd("Target.getTargetInfo", {})["targetInfo"]["targetId"]
+            else:
+                # La carpeta de descarga se fija por pestaña, así cada archivo se identifica por su carpeta
+                target = None
+                shutil.rmtree(directory, ignore_errors=True)
+                os.makedirs(directory)
+                self.driver.execute_cdp_cmd(
+                    "Page.setDownloadBehavior",
+                    {"behavior": "allow", "downloadPath": os.path.abspath(directory)},
+                )
+            logger.info(f"=== Exporting in tab: {filename} from {report.url} ===")
+            if self._open_report(report, filename, start_date, end_date):
+                return handle, directory, target
+        except Exception as e:
+            logger.error(f"Export error for {filename}: {e}")
+            self._save_screenshot(f"error_{filename}")
+        self._close_tab(handle, main_handle)
+        shutil.rmtree(directory, ignore_errors=True)
+        return None, directory, None
+
+    @staticmethod
+    def _download_matches(download, filename):
+        """Indica si el nombre sugerido por Chrome corresponde al reporte ``filename``."""
+        def simple(text):
+            return "".join(ch for ch in text.lower() if ch.isalnum())
+
+        suggested = simple(download.get("filename") or "")
+        report = REPORTS.get(filename)
+        # Nombre del reporte (ReporteVenta) o del controlador de su URL (RepVenta)
+        prefixes = {simple(filename)}
+        if report is not None:
+            prefixes.add(simple(report.url.split("/Reportes/")[-1].split("/")[0]))
+        return any(prefix and prefix in suggested for prefix in prefixes)
+
+    def _captured_by_tab(self, active, unattributed):
+        """
+        Descargas terminadas según los eventos, por handle de la pestaña que las inició.
+        Las que no traen el target de ninguna pestaña quedan en ``unattributed`` hasta
+        que se puedan emparejar por nombre sugerido o porque solo queda una pestaña.
+        """
+        finished = {}
+        for download in self.capture.poll():
+            owner = next(
+                (
+                    handle
+                    for handle, (_, _, _, target) in active.items()
+                    if target in (download.get("target"), download.get("frame"))
+                ),
+                None,
+            )
+            if owner is None:
+                logger.info(f"Download not attributed by target, matching by name: {download.get('filename')}")
+                unattributed.append(download)
+                continue
+            finished[owner] = download
+
+        for download in list(unattributed):
+            waiting = [handle for handle in active if handle not in finished]
+            owners = [handle for handle in waiting if self._download_matches(download, active[handle][0])]
+            if len(owners) != 1 and len(waiting) == 1:
+                owners = waiting
+            if len(owners) == 1:
+                finished[owners[0]] = download
+                unattributed.remove(download)
+        return finished
+
+    def _export_in_tabs(self, pending, start_date=None, end_date=None, timeout=180):
+        """
+        Exporta los reportes de ``pending`` en pestañas paralelas de la misma sesión
+        y quita del dict los que se descargaron; el resto queda para el flujo secuencial.
+        """
+        main_handle = self.driver.current_window_handle
+        queue = list(pending.items())
+        active = {}
+        settled = {}
+        unattributed = []
+        downloaded = []
+        while queue or active:
+            while queue and len(active) < EVOLTA_EXPORT_CONCURRENCY and (
+                not active or self._memory_allows_tab()
+            ):
+                filename, report = queue.pop(0)
+                handle, directory, target = self._start_tab_export(
+                    report, filename, main_handle, start_date, end_date
+                )
+                if handle:
+                    active[handle] = (filename, directory, time.time() + timeout, target)
+                self.driver.switch_to.window(main_handle)
+
+            captured = self._captured_by_tab(active, unattributed) if self.capture is not None else {}
+            for handle, (filename, directory, deadline, _) in list(active.items()):
+                download = captured.get(handle)
+                new_file = None
+                if self.capture is None:
+                    new_file = settled.setdefault(directory, download_settled(directory))(self.driver)
+                if download is None and new_file is None and time.time() < deadline:
+                    continue
+                del active[handle]
+                self._close_tab(handle, main_handle)
+                result = None
+                if download is not None and download["state"] == "completed":
+                    result = self._store_capture(download, filename)
+                elif new_file:
+                    result = self._store_download(new_file, filename)
+                if result:
+                    downloaded.append(result)
+                    del pending[filename]
+                    logger.info(f"SUCCESS: {filename}")
+                else:
+                    logger.error(f"No download for {filename} in its tab")
+                shutil.rmtree(directory, ignore_errors=True)
+
+            if active:
+                time.sleep(1 if self.capture is None else 0.2)
+        for download in unattributed:
+            logger.warning(f"Download not attributed to a tab: {download.get('filename')}")
+        return downloaded
+
+    def _export_over_http(self, pending, start_date=None, end_date=None):
+        """
+        Exporta por HTTP los reportes de ``pending`` y los quita del dict.
+        Los que fallen quedan en ``pending`` para el flujo con Chrome.
+        """
+        if not (start_date and end_date):
+            start_date, end_date = get_default_period()
+        exported = []
+        client = EvoltaExportClient(USER_CRED, PASS_CRED)
+        try:
+            client.login()
+            for filename, report in list(pending.items()):
+                logger.info(f"\n--- Processing over HTTP: {filename} ---")
+                try:
+                    path = client.export_report(filename, report, start_date, end_date, self.download_dir)
+                except Exception as e:
+                    logger.warning(f"HTTP export failed for {filename}: {e}")
+                    continue
+                exported.append(str(path))
+                del pending[filename]
+                logger.info(f"SUCCESS: {filename}")
+        except Exception as e:
+            logger.warning(f"HTTP export unavailable: {e}")
+        finally:
+            client.session.close()
+        return exported
+
     def run_sync(self, start_date=None, end_date=None):
         """Ejecuta la sincronización completa"""
         # Configurar log a archivo para que el usuario pueda verlo
@@ -604,18 +1019,27 @@ class EvoltaScraper:
         downloaded = []
         
         try:
-            self.start_driver()
-            self.login()
-            
-            for filename, report in REPORTS.items():
-                logger.info(f"\n--- Processing: {filename} ---")
-                result = self._export_report(report, filename, start_date, end_date)
-                if result:
-                    downloaded.append(result)
-                    logger.info(f"SUCCESS: {filename}")
-                else:
-                    logger.error(f"FAILED: {filename}")
-                time.sleep(3)  # Pausa entre descargas
+            if self.waits is not None:
+                self.waits.timings.clear()
+            pending = dict(REPORTS)
+            if EVOLTA_EXPORT_MODE in ("http", "auto"):
+                downloaded.extend(self._export_over_http(pending, start_date, end_date))
+
+            if pending and EVOLTA_EXPORT_MODE != "http":
+                if EVOLTA_EXPORT_MODE == "auto":
+                    logger.warning(f"Falling back to Selenium for: {', '.join(pending)}")
+                self.ensure_session()
+                if EVOLTA_EXPORT_CONCURRENCY > 1 and len(pending) > 1:
+                    downloaded.extend(self._export_in_tabs(pending, start_date, end_date))
+
+                for filename, report in pending.items():
+                    logger.info(f"\n--- Processing: {filename} ---")
+                    result = self._export_report(report, filename, start_date, end_date)
+                    if result:
+                        downloaded.append(result)
+                        logger.info(f"SUCCESS: {filename}")
+                    else:
+                        logger.error(f"FAILED: {filename}")
             
             logger.info(f"\n========== SYNC COMPLETE ==========")
             logger.info(f"Downloaded {len(downloaded)}/{len(REPORTS)} files:")
@@ -624,14 +1048,20 @@ class EvoltaScraper:
             
             if len(downloaded) != len(REPORTS):
                  logger.warning(f"WARNING: Only {len(downloaded)} of {len(REPORTS)} files downloaded.")
+            if self.waits is not None:
+                logger.info(f"Page waits: {len(self.waits.timings)} in {self.waits.total():.1f}s")
             
             return downloaded
             
         except Exception as e:
             logger.error(f"Sync failed: {e}")
+            # Un navegador en estado desconocido no se reutiliza
+            self.close()
             raise
         finally:
-            self.close()
+            if not self.keep_browser:
+                self.close()
+            shutil.rmtree(os.path.join(self.download_dir, DOWNLOADS_DIRNAME), ignore_errors=True)
             logger.removeHandler(file_handler)
             file_handler.close()
 
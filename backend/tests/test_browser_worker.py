@@ -0,0 +1,137 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import requests
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from browser_worker import BrowserWorker  # noqa: E402
+from scraper import DOWNLOAD_DIR, DOWNLOADS_DIRNAME, REPORTS, DownloadCapture, EvoltaScraper  # noqa: E402
+from tests.test_scraper import EventDriver  # noqa: E402
+from wait_engine import WaitEngine  # noqa: E402
+
+
+class BrowserDriver(EventDriver):
+    def __init__(self):
+        super().__init__()
+        self.quit_called = False
+
+    def get_cookies(self):
+        return [{"name": "ASP.NET_SessionId", "value": "abc", "domain": "v4.evolta.pe", "path": "/"}]
+
+    def quit(self):
+        self.quit_called = True
+
+
+class WarmScraper(EvoltaScraper):
+    """EvoltaScraper real salvo lo que toca Chrome: arranque, login y la página del reporte."""
+
+    starts = 0
+    logins = 0
+    fail_login = False
+
+    def start_driver(self):
+        type(self).starts += 1
+        self.driver = BrowserDriver()
+        self.waits = WaitEngine(self.driver)
+        self.capture = DownloadCapture(self.driver, os.path.join(self.download_dir, DOWNLOADS_DIRNAME))
+
+    def login(self):
+        type(self).logins += 1
+        if self.fail_login:
+            raise RuntimeError("Login fallido")
+
+    def _open_report(self, report, filename, start_date=None, end_date=None):
+        self.driver.download(f"guid-{filename}", "Reporte.xlsx", filename)
+        return True
+
+
+def probe_response(status):
+    response = requests.Response()
+    response.status_code = status
+    if status == 302:
+        response.headers["Location"] = "/Login/Acceso/Index"
+    return response
+
+
+class BrowserWorkerTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        WarmScraper.starts = WarmScraper.logins = 0
+        WarmScraper.fail_login = False
+        self.worker = BrowserWorker(max_syncs=3, max_rss_mb=300, scraper_factory=WarmScraper)
+        self.addCleanup(self.worker._executor.shutdown)
+        self.probe_status = 200
+        patchers = [
+            patch.multiple("scraper", EVOLTA_EXPORT_MODE="selenium", EVOLTA_EXPORT_CONCURRENCY=1),
+            patch("scraper.time.sleep"),
+            patch("scraper.requests.Session.get", side_effect=lambda *a, **k: probe_response(self.probe_status)),
+            patch("browser_worker.browser_rss_mb", return_value=100),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _sync(self, name):
+        directory = Path(self.tmp.name, name)
+        return directory, self.worker.run_sync(str(directory), "01/06/2026", "30/06/2026")
+
+    def test_back_to_back_syncs_reuse_the_logged_in_browser(self):
+        first_dir, first = self._sync("a")
+        driver = self.worker.scraper.driver
+        second_dir, second = self._sync("b")
+
+        self.assertEqual((1, 1), (WarmScraper.starts, WarmScraper.logins))
+        self.assertIs(driver, self.worker.scraper.driver)
+        self.assertFalse(driver.quit_called)
+        for directory, downloaded in ((first_dir, first), (second_dir, second)):
+            self.assertEqual(sorted(str(directory / f"{name}.xlsx") for name in REPORTS), sorted(downloaded))
+            self.assertFalse((directory / DOWNLOADS_DIRNAME).exists())
+        self.assertEqual(2, self.worker.syncs)
+
+        self._sync("c")
+        self._sync("d")
+        self.assertTrue(driver.quit_called)
+        self.assertEqual(2, WarmScraper.starts)
+
+    def test_expired_session_logs_in_again_and_a_failed_sync_closes_the_browser(self):
+        self._sync("a")
+        self.probe_status = 302
+        self._sync("b")
+        self.assertEqual((1, 2), (WarmScraper.starts, WarmScraper.logins))
+
+        driver = self.worker.scraper.driver
+        WarmScraper.fail_login = True
+        with self.assertRaises(RuntimeError):
+            self._sync("c")
+
+        self.assertTrue(driver.quit_called)
+        self.assertIsNone(self.worker.scraper.driver)
+        self.assertEqual(0, self.worker.syncs)
+
+    def test_warm_up_uses_a_private_scratch_directory(self):
+        self.worker.warm()
+        self.worker._executor.submit(lambda: None).result()
+        scratch = Path(self.worker.scraper.download_dir)
+        self.assertEqual(Path(self.worker.scratch_dir), scratch)
+        self.assertFalse(scratch.resolve().is_relative_to(Path(DOWNLOAD_DIR).resolve()))
+        self.assertTrue(self.worker.scraper.capture.directory.startswith(str(scratch)))
+
+        directory, downloaded = self._sync("a")
+
+        self.assertEqual((1, 1), (WarmScraper.starts, WarmScraper.logins))
+        self.assertEqual(4, len(downloaded))
+        self.assertFalse(scratch.exists())
+        self.assertIsNone(self.worker.scratch_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import date_parsing  # noqa: E402
+from date_parsing import DateParser, detect_date_format  # noqa: E402
+
+
+class DateParserTests(unittest.TestCase):
+    def test_detects_the_format_from_a_sample(self):
+        self.assertEqual("%d/%m/%Y %H:%M:%S", detect_date_format(["05/06/2026 10:00:00", "13/06/2026 08:15:00"]))
+        self.assertIsNone(detect_date_format(["sin fecha"]))
+
+    def test_stragglers_and_excel_cells_fall_back_correctly(self):
+        values = ["05/06/2026", "", None, "xx", "2026-06-07", "07/06/2026 10:05:00", datetime(2026, 6, 8, 9)]
+
+        parsed = DateParser().parse(pd.Series(values, index=range(10, 17), dtype=object), key="venta")
+
+        self.assertEqual(list(range(10, 17)), parsed.index.tolist())
+        self.assertEqual(
+            [
+                pd.Timestamp(2026, 6, 5),
+                pd.NaT,
+                pd.NaT,
+                pd.NaT,
+                pd.Timestamp(2026, 6, 7),
+                pd.Timestamp(2026, 6, 7, 10, 5),
+                pd.Timestamp(2026, 6, 8, 9),
+            ],
+            parsed.tolist(),
+        )
+
+    def test_format_is_detected_once_per_key_and_redetected_when_it_changes(self):
+        parser = DateParser()
+        with patch("date_parsing.detect_date_format", wraps=date_parsing.detect_date_format) as detect:
+            parser.parse(["05/06/2026", "06/06/2026"], key="venta")
+            parser.parse(["07/06/2026"], key="venta")
+            self.assertEqual(1, detect.call_count)
+
+            parsed = parser.parse(["2026-06-09", "2026-06-10"], key="venta")
+
+        self.assertEqual(2, detect.call_count)
+        self.assertEqual([pd.Timestamp(2026, 6, 9), pd.Timestamp(2026, 6, 10)], parsed.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
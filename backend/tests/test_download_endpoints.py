@@ -0,0 +1,72 @@
+import sys
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+from starlette.requests import Request
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import main  # noqa: E402
+from report_pipeline import publish_report_set, validate_report_set  # noqa: E402
+from tests.test_report_pipeline import write_report_set  # noqa: E402
+
+
+def make_request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+class ReportDownloadTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        staging = Path(self.tmp.name) / "staging"
+        staging.mkdir()
+        write_report_set(staging)
+        validation = validate_report_set(staging, date(2026, 6, 1), date(2026, 6, 30))
+        self.published = publish_report_set(staging, self.tmp.name, validation)
+        patcher = patch.object(main, "DOWNLOAD_DIR", self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_single_report_uses_manifest_hash_as_etag(self):
+        response = main.download_report("ventas", make_request())
+
+        self.assertIsInstance(response, FileResponse)
+        sha256 = self.published["manifest"]["reports"]["ReporteVenta"]["sha256"]
+        self.assertEqual(f'"{sha256}"', response.headers["etag"])
+        self.assertEqual(Path(self.published["version_dir"]) / "ReporteVenta.xlsx", Path(response.path))
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = main.download_report("ReporteVenta", make_request()).headers["etag"]
+
+        self.assertEqual(304, main.download_report("reporteventa", make_request(if_none_match=etag)).status_code)
+        self.assertEqual(200, main.download_report("ventas", make_request(if_none_match='"otro"')).status_code)
+
+    def test_zip_is_served_from_prebuilt_archive(self):
+        response = main.download_reports(make_request())
+        modified = response.headers["last-modified"]
+
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(304, main.download_reports(make_request(if_modified_since=modified)).status_code)
+
+    def test_unknown_report_is_not_found(self):
+        with self.assertRaises(HTTPException) as context:
+            main.download_report("inexistente", make_request())
+        self.assertEqual(404, context.exception.status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import io
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import requests
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from evolta_export_client import EvoltaExportClient, ExportError  # noqa: E402
+from scraper import REPORTS  # noqa: E402
+
+
+REPORT_PAGE = b"""
+<html><body>
+<form id="frmReporte" action="/Reportes/RepVenta/ExportarExcel" method="post">
+  <input type="hidden" name="__RequestVerificationToken" value="tok">
+  <select id="ddlProyecto" name="IdProyecto">
+    <option value="12">SUNNY</option>
+    <option value="0">-- TODOS LOS PROYECTOS --</option>
+  </select>
+  <input type="text" id="txtFechaInicio" name="FechaDesde" value="">
+  <input type="text" id="txtFechaFin" name="FechaHasta" value="">
+  <input type="checkbox" name="SoloActivos">
+  <input type="submit" id="btnExportar" name="accion" value="Exportar">
+</form>
+</body></html>
+"""
+
+
+def make_response(body: bytes, status: int = 200, **headers) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response.raw = io.BytesIO(body)
+    return response
+
+
+class EvoltaExportClientTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.client = EvoltaExportClient("usuario", "clave")
+        self.client.session = MagicMock()
+        self.client.session.get.return_value = make_response(REPORT_PAGE)
+        self.export_url = "https://v4.evolta.pe/Reportes/RepVenta/ExportarExcel"
+
+    def _export(self, response):
+        self.client.session.request.side_effect = lambda method, url, **kwargs: (
+            response if (method, url) == ("POST", self.export_url) else make_response(b"")
+        )
+        return self.client.export_report(
+            "ReporteVenta", REPORTS["ReporteVenta"], "01/06/2026", "30/06/2026", self.tmp.name
+        )
+
+    def test_streams_the_export_into_the_staging_directory(self):
+        body = b"PK\x03\x04" + b"x" * 3_000_000
+
+        path = self._export(make_response(body))
+
+        self.assertEqual(Path(self.tmp.name) / "ReporteVenta.xlsx", path)
+        self.assertEqual(body, path.read_bytes())
+        self.assertEqual(["ReporteVenta.xlsx"], [item.name for item in Path(self.tmp.name).iterdir()])
+        # Acción y campos salen del formulario de la página, no de nombres supuestos
+        self.assertEqual(
+            {
+                "__RequestVerificationToken": "tok",
+                "IdProyecto": "0",
+                "FechaDesde": "01/06/2026",
+                "FechaHasta": "30/06/2026",
+                "accion": "Exportar",
+            },
+            self.client.session.request.call_args.kwargs["data"],
+        )
+
+    def test_html_or_redirect_is_rejected_without_leaving_files(self):
+        with self.assertRaises(ExportError):
+            self._export(make_response(b"<html>Iniciar sesion</html>", **{"Content-Type": "text/html"}))
+        with self.assertRaises(ExportError):
+            self._export(make_response(b"", status=302, Location="/Login/Acceso/Index"))
+
+        self.assertEqual([], list(Path(self.tmp.name).iterdir()))
+
+    def test_page_without_a_recognizable_export_form_is_not_guessed(self):
+        for page in (b"<html><button onclick='exportar()'>Exportar</button></html>",
+                     REPORT_PAGE.replace(b'id="txtFechaFin" name="FechaHasta"', b'id="txtHora" name="Hora"')):
+            self.client.session.get.return_value = make_response(page)
+            with self.assertRaises(ExportError):
+                self._export(make_response(b"PK\x03\x04"))
+
+        self.client.session.request.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
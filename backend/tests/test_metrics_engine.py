@@ -0,0 +1,35 @@
+import sys
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from metrics_engine import DIGITAL_PATTERN, channel_table, digital_mask  # noqa: E402
+
+
+class ChannelClassificationTests(unittest.TestCase):
+    def test_classifies_each_category_once_and_maps_back_by_code(self):
+        channel = pd.Series(
+            ["META ADS", "REFERIDO", None, "WHATSAPP FERIA", "REFERIDO", "META ADS"],
+            dtype="category",
+        )
+
+        table = channel_table(channel.cat.categories)
+        mask = digital_mask(channel)
+
+        self.assertEqual(len(channel.cat.categories), len(table))
+        self.assertEqual(
+            {"META ADS": "DIGITAL", "REFERIDO": "NO DIGITAL", "WHATSAPP FERIA": "DIGITAL"},
+            dict(zip(table["canal"], table["tipo_canal"])),
+        )
+        expected = channel.astype(object).str.contains(DIGITAL_PATTERN, na=False).astype(bool)
+        self.assertEqual(expected.tolist(), mask.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,221 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import date
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from metrics_engine import count_report  # noqa: E402
+from processor import SemaforoProcessor  # noqa: E402
+from report_pipeline import parse_report  # noqa: E402
+
+
+def write_reports(directory):
+    prospectos = pd.DataFrame({
+        "Proyecto": ["SUNNY", "sunny ", "LITORAL 900", "SUNNY"],
+        "TipoInmueble": ["DEPARTAMENTO", "Departamento", "DEPARTAMENTO", "ESTACIONAMIENTO"],
+        "LeadUnicoxMesProyecto": ["SI", "si", "SI", "SI"],
+        "ComoSeEntero": ["META ADS", "REFERIDO", "WhatsApp", "FACEBOOK"],
+        "SubEstado": ["CONTACTADO", "NO CONTACTADO", "CONTACTADO", "CONTACTADO"],
+        "NroDocumento": ["12345678", None, 87654321, "11111111"],
+        "Vendedor": ["ana", "LUIS", "ANA", "ANA"],
+        "FechaRegistro": ["01/06/2026", "02/06/2026", "03/06/2026", "04/06/2026"],
+    })
+    ventas = pd.DataFrame({
+        "Proyecto": ["SUNNY", "DOMINGO ORUE"],
+        "TipoInmueble_1": ["Departamento", "Departamento"],
+        "FechaVenta": ["05/06/2026", "06/06/2026"],
+    })
+    separaciones = pd.DataFrame({
+        "DescripcionProyecto": ["SUNNY", "SUNNY"],
+        "TipoInmueble_1": ["Departamento", "Deposito"],
+        "FechaSepDef": ["05/06/2026", "06/06/2026"],
+    })
+    visitas = pd.DataFrame({
+        "Proyecto": ["LITORAL 900", "LITORAL 900", "SUNNY"],
+        "TipoInmueble": ["DEPARTAMENTO", "DEPARTAMENTO", "DEPARTAMENTO"],
+        "VisitaUnicaxMesProyecto": ["SI", "NO", "SI"],
+        "FechaVisita": ["05/06/2026", "06/06/2026", "07/06/2026"],
+    })
+    for name, df in (
+        ("reporteProspectos", prospectos),
+        ("ReporteVenta", ventas),
+        ("Separacion", separaciones),
+        ("ReporteVisitas", visitas),
+    ):
+        df.to_excel(Path(directory) / f"{name}.xlsx", index=False)
+
+
+class ProcessorCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = Path(self.tmp.name)
+        write_reports(self.directory)
+
+    def test_second_load_reads_parquet_cache_instead_of_excel(self):
+        SemaforoProcessor(str(self.directory)).load_data()
+        self.assertTrue((self.directory / ".cache" / "prospectos.parquet").exists())
+
+        processor = SemaforoProcessor(str(self.directory))
+        with patch("processor.parse_report", side_effect=AssertionError("re-parsed")):
+            processor.load_data()
+
+        self.assertEqual(4, len(processor.data["prospectos"]))
+
+    def test_cache_is_rebuilt_when_published_file_changes(self):
+        SemaforoProcessor(str(self.directory)).load_data()
+        pd.DataFrame({
+            "Proyecto": ["SUNNY"],
+            "TipoInmueble_1": ["Departamento"],
+            "FechaVenta": ["07/06/2026"],
+        }).to_excel(self.directory / "ReporteVenta.xlsx", index=False)
+        stat = (self.directory / "ReporteVenta.xlsx").stat()
+        os.utime(self.directory / "ReporteVenta.xlsx", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        processor = SemaforoProcessor(str(self.directory))
+        processor.load_data()
+
+        self.assertEqual(1, len(processor.data["ventas"]))
+
+    def test_reload_only_rereads_reports_whose_file_changed(self):
+        processor = SemaforoProcessor(str(self.directory))
+        processor.load_data()
+        processor.calculate_metrics()
+        prospectos = processor.data["prospectos"]
+
+        pd.DataFrame({
+            "Proyecto": ["SUNNY", "SUNNY"],
+            "TipoInmueble_1": ["Departamento", "Departamento"],
+            "FechaVenta": ["07/06/2026", "08/06/2026"],
+        }).to_excel(self.directory / "ReporteVenta.xlsx", index=False)
+
+        with patch("processor.parse_report", wraps=parse_report) as parse, \
+                patch("processor.count_report", wraps=count_report) as counter:
+            processor.load_data()
+            metrics = processor.calculate_metrics()
+
+        self.assertEqual(["ventas"], [call.args[1].data_key for call in parse.call_args_list])
+        self.assertEqual(["ventas"], [call.args[0] for call in counter.call_args_list])
+        self.assertIs(prospectos, processor.data["prospectos"])
+        sunny = next(row for row in metrics if row["Proyecto"] == "SUNNY")
+        self.assertEqual(2, sunny["Metrics"]["Ventas Totales"]["Real"])
+
+    def test_concurrent_loads_share_a_single_rebuild(self):
+        processor = SemaforoProcessor(str(self.directory))
+        barrier = threading.Barrier(6)
+        snapshots = []
+
+        def reader():
+            barrier.wait()
+            snapshots.append(processor.load_data())
+
+        with patch("processor.parse_report", wraps=parse_report) as parse:
+            threads = [threading.Thread(target=reader) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(4, parse.call_count)
+        self.assertEqual(1, len({id(snapshot) for snapshot in snapshots}))
+        self.assertEqual({"prospectos", "ventas", "separaciones", "visitas"}, set(snapshots[0].reports))
+
+
+class ProcessorMetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        write_reports(self.tmp.name)
+        self.processor = SemaforoProcessor(self.tmp.name)
+        self.processor.load_data()
+
+    def _real(self, metrics, project, metric):
+        row = next(row for row in metrics if row["Proyecto"] == project)
+        return row["Metrics"][metric]["Real"]
+
+    def test_counts_every_metric_for_every_project_in_one_pass(self):
+        metrics = self.processor.calculate_metrics()
+
+        self.assertEqual(2, self._real(metrics, "SUNNY", "Leads Totales"))
+        self.assertEqual(1, self._real(metrics, "SUNNY", "Leads DNI"))
+        self.assertEqual(1, self._real(metrics, "SUNNY", "Leads Digitales"))
+        self.assertEqual(1, self._real(metrics, "SUNNY", "Prospectos"))
+        self.assertEqual(1, self._real(metrics, "LITORAL 900", "Leads Digitales"))
+        self.assertEqual(1, self._real(metrics, "LITORAL 900", "Visitas Totales"))
+        self.assertEqual(1, self._real(metrics, "SUNNY", "Separaciones Totales"))
+        self.assertEqual(1, self._real(metrics, "DOMINGO ORUE", "Ventas Totales"))
+        self.assertEqual(0, self._real(metrics, "LOMAS DE CARABAYLLO", "Leads Totales"))
+
+
+class ProcessorDrilldownTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        write_reports(self.tmp.name)
+        self.processor = SemaforoProcessor(self.tmp.name)
+
+    def test_groups_by_channel_type_and_responsable(self):
+        result = self.processor.drilldown(["tipo_canal", "responsable"], {"proyecto": "sunny"})
+
+        rows = {(row["tipo_canal"], row["responsable"]): row for row in result["rows"]}
+        self.assertEqual(1, rows[("DIGITAL", "ANA")]["leads_digitales"])
+        self.assertEqual(1, rows[("NO DIGITAL", "LUIS")]["leads_totales"])
+        self.assertEqual(1, rows[("NO DIGITAL", "SIN RESPONSABLE")]["ventas"])
+        self.assertEqual(2, result["totals"]["leads_totales"])
+
+    def test_date_range_matches_daily_slices(self):
+        result = self.processor.drilldown(["fecha"], start_date=date(2026, 6, 5), end_date=date(2026, 6, 6))
+
+        self.assertEqual(["2026-06-05", "2026-06-06"], [row["fecha"] for row in result["rows"]])
+        self.assertEqual(0, result["totals"]["leads_totales"])
+        self.assertEqual(2, result["totals"]["ventas"])
+        self.assertEqual(1, result["totals"]["visitas"])
+
+    def test_cube_is_built_once_per_snapshot(self):
+        snapshot = self.processor.load_data()
+        self.assertIs(snapshot.cube, self.processor.load_data().cube)
+
+    def test_unknown_dimension_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.processor.drilldown(["subestado"])
+
+
+class ProcessorResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        write_reports(self.tmp.name)
+        self.processor = SemaforoProcessor(self.tmp.name)
+
+    def test_repeated_polls_reuse_metrics_until_goals_change(self):
+        with patch.object(self.processor, "calculate_metrics", wraps=self.processor.calculate_metrics) as calc:
+            first = self.processor.get_metrics()
+            self.assertIs(first, self.processor.get_metrics())
+            self.assertEqual(1, calc.call_count)
+
+            self.processor.update_project_meta("SUNNY", "prospectos_totales", 40)
+            self.processor.get_metrics()
+
+        self.assertEqual(2, calc.call_count)
+
+    def test_lima_day_rollover_recomputes_metrics(self):
+        with patch("processor.lima_today", return_value=date(2026, 6, 10)):
+            first = self.processor.get_metrics()
+        with patch("processor.lima_today", return_value=date(2026, 6, 11)):
+            second = self.processor.get_metrics()
+
+        self.assertIsNot(first, second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,523 @@
+import io
+import os
+import sys
+import tempfile
+import zipfile
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from report_pipeline import (  # noqa: E402
+    REPORT_DEFINITIONS,
+    ReportValidationError,
+    activate_version,
+    canonicalize,
+    build_download_archive,
+    compact_backups,
+    current_dir,
+    current_version,
+    iter_downloadable_files,
+    iter_zip_stream,
+    list_versions,
+    prebuilt_archive,
+    published_reports,
+    publish_report_set,
+    read_report,
+    select_backups_to_keep,
+    validate_report_set,
+)
+from processor import SemaforoProcessor  # noqa: E402
+import report_pipeline  # noqa: E402
+
+
+def write_report_set(directory, venta_dates=("05/06/2026", "06/06/2026"), only=None):
+    frames = {
+        "reporteProspectos": pd.DataFrame({
+            "Proyecto": ["SUNNY"],
+            "TipoInmueble": ["DEPARTAMENTO"],
+            "LeadUnicoxMesProyecto": ["SI"],
+            "ComoSeEntero": ["META ADS"],
+            "SubEstado": ["CONTACTADO"],
+            "FechaRegistro": ["01/06/2026"],
+        }),
+        "ReporteVenta": pd.DataFrame({
+            "Proyecto": ["SUNNY"] * len(venta_dates),
+            "TipoInmueble_1": ["Departamento"] * len(venta_dates),
+            "FechaVenta": list(venta_dates),
+        }),
+        "Separacion": pd.DataFrame({
+            "DescripcionProyecto": ["SUNNY"],
+            "TipoInmueble_1": ["Departamento"],
+            "FechaSepDef": ["05/06/2026"],
+        }),
+        "ReporteVisitas": pd.DataFrame({
+            "Proyecto": ["SUNNY"],
+            "TipoInmueble": ["DEPARTAMENTO"],
+            "VisitaUnicaxMesProyecto": ["SI"],
+            "FechaVisita": ["07/06/2026"],
+        }),
+    }
+    for name, df in frames.items():
+        if only is None or name in only:
+            df.to_excel(Path(directory) / f"{name}.xlsx", index=False)
+
+
+class CanonicalizeTests(unittest.TestCase):
+    def test_resolves_aliases_and_stores_normalized_categories_and_flags(self):
+        raw = pd.DataFrame({
+            "Proyecto": [" sunny", "SUNNY", None],
+            "TipoInmueble": ["DEPARTAMENTO", "x", "DEPARTAMENTO"],
+            "TipoInmueble_1": ["Departamento", "departamento ", "Deposito"],
+            "LeadUnicoxMesProyecto": ["si", "NO", "SI"],
+            "NroDocumento": ["123", " ", None],
+            "Otra": [1, 2, 3],
+        })
+
+        df = canonicalize(raw, REPORT_DEFINITIONS["reporteProspectos"])
+
+        self.assertEqual(["Proyecto", "LeadUnico", "Departamento", "ConDocumento"], list(df.columns))
+        self.assertIsInstance(df["Proyecto"].dtype, pd.CategoricalDtype)
+        self.assertEqual(["SUNNY", "SUNNY"], list(df["Proyecto"][:2]))
+        self.assertEqual([True, False, True], df["LeadUnico"].tolist())
+        # Con TipoInmueble y TipoInmueble_1 presentes gana la ultima columna
+        self.assertEqual([True, True, False], df["Departamento"].tolist())
+        self.assertEqual([True, False, False], df["ConDocumento"].tolist())
+
+
+class StreamingReaderTests(unittest.TestCase):
+    def test_reads_only_declared_columns_with_pandas_conversions(self):
+        raw = pd.DataFrame({
+            "Extra": ["x", "y", "z"],
+            " Proyecto ": ["SUNNY", "LITORAL 900", None],
+            "NroDocumento": ["00123", "NA", 7.0],
+            "FechaVenta": ["01/06/2026", "02/06/2026", "03/06/2026"],
+            "TipoInmueble_1": ["Departamento", None, "Deposito"],
+        })
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ReporteVenta.xlsx"
+            raw.to_excel(path, index=False)
+
+            streamed = read_report(path, REPORT_DEFINITIONS["ReporteVenta"])
+            expected = pd.read_excel(path, engine="openpyxl")[list(streamed.columns)]
+
+        self.assertEqual([" Proyecto ", "FechaVenta", "TipoInmueble_1"], list(streamed.columns))
+        pd.testing.assert_frame_equal(expected, streamed)
+
+
+class ParallelValidationTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch.multiple("report_pipeline", REPORT_LOAD_EXECUTOR="thread", REPORT_LOAD_WORKERS=4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_validates_the_four_reports_concurrently(self):
+        write_report_set(self.tmp.name)
+
+        validation = validate_report_set(self.tmp.name, date(2026, 6, 1), date(2026, 6, 30))
+
+        self.assertEqual(list(REPORT_DEFINITIONS), list(validation))
+        self.assertEqual(2, validation["ReporteVenta"]["rows"])
+
+    def test_error_message_names_the_failing_report(self):
+        write_report_set(self.tmp.name, venta_dates=("05/06/2026", "02/07/2026"))
+
+        with self.assertRaises(ReportValidationError) as context:
+            validate_report_set(self.tmp.name, date(2026, 6, 1), date(2026, 6, 30))
+
+        self.assertTrue(str(context.exception).startswith("ReporteVenta: fechas fuera del periodo"))
+
+
+class SinglePassSyncTests(unittest.TestCase):
+    def test_published_frames_are_adopted_without_reparsing(self):
+        with tempfile.TemporaryDirectory() as staging, tempfile.TemporaryDirectory() as active:
+            write_report_set(staging)
+            validation = validate_report_set(staging, date(2026, 6, 1), date(2026, 6, 30))
+            self.assertEqual(2, len(validation.frames["ReporteVenta"]))
+
+            published = publish_report_set(staging, active, validation)
+            self.assertNotIn("frames", published["manifest"]["reports"]["ReporteVenta"])
+
+            processor = SemaforoProcessor(active)
+            with patch("processor.parse_report", side_effect=AssertionError("re-parsed")):
+                snapshot = processor.load_data(preparsed=published["frames"])
+            self.assertIs(validation.frames["ReporteVenta"], snapshot.data["ventas"])
+
+            # Un proceso nuevo encuentra el cache escrito al publicar
+            with patch("processor.parse_report", side_effect=AssertionError("re-parsed")):
+                fresh = SemaforoProcessor(active).load_data()
+            self.assertEqual(2, len(fresh.data["ventas"]))
+
+    def test_cache_is_filled_before_the_version_is_activated(self):
+        with tempfile.TemporaryDirectory() as staging, tempfile.TemporaryDirectory() as active:
+            write_report_set(staging)
+            validation = validate_report_set(staging, date(2026, 6, 1), date(2026, 6, 30))
+            cached_at_flip = []
+            real_point = report_pipeline._point_current
+
+            def point_current(active_dir, version):
+                directory = Path(active_dir) / "versions" / version
+                cached_at_flip.append(
+                    report_pipeline.ReportCache(active_dir).load("ventas", directory / "ReporteVenta.xlsx") is not None
+                )
+                return real_point(active_dir, version)
+
+            with patch("report_pipeline._point_current", side_effect=point_current):
+                publish_report_set(staging, active, validation)
+
+        self.assertEqual([True], cached_at_flip)
+
+
+class BackupStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.staging = Path(self.tmp.name) / "staging"
+        self.active = Path(self.tmp.name) / "active"
+        self.staging.mkdir()
+        write_report_set(self.staging)
+        self.validation = validate_report_set(self.staging, date(2026, 6, 1), date(2026, 6, 30))
+
+    def _blobs(self):
+        return sorted(path for path in (self.active / "backups" / "objects").rglob("*") if path.is_file())
+
+    def _publish(self, venta_dates):
+        # Solo se reescribe la venta: openpyxl sella cada xlsx con la hora actual,
+        # asi que reescribir los demas les daria otros bytes (y otros blobs)
+        write_report_set(self.staging, venta_dates=venta_dates, only={"ReporteVenta"})
+        validation = validate_report_set(self.staging, date(2026, 6, 1), date(2026, 6, 30))
+        return publish_report_set(self.staging, self.active, validation)
+
+    def test_versions_link_shared_blobs_instead_of_copying(self):
+        first = self._publish(("05/06/2026",))
+        self._publish(("06/06/2026",))
+        third = self._publish(("07/06/2026",))
+
+        # Cuatro reportes mas las dos ventas nuevas; el resto reutiliza sus blobs
+        self.assertEqual(len(REPORT_DEFINITIONS) + 2, len(self._blobs()))
+        old, new = Path(first["version_dir"]), Path(third["version_dir"])
+        self.assertTrue(os.path.samefile(old / "reporteProspectos.xlsx", new / "reporteProspectos.xlsx"))
+        self.assertEqual(third["version"], current_version(self.active))
+
+    def test_failed_publish_leaves_the_active_version_untouched(self):
+        first = self._publish(("05/06/2026",))
+        before = {name: path.read_bytes() for name, path in published_reports(self.active).files().items()}
+        real_rename = os.rename
+
+        def failing_rename(source, target):
+            if Path(source).name.endswith(".publishing"):
+                raise OSError("disk full")
+            return real_rename(source, target)
+
+        with patch("report_pipeline.os.rename", side_effect=failing_rename):
+            with self.assertRaises(OSError):
+                self._publish(("10/06/2026",))
+
+        after = {name: path.read_bytes() for name, path in published_reports(self.active).files().items()}
+        self.assertEqual(before, after)
+        self.assertEqual(first["version"], current_version(self.active))
+        self.assertEqual([first["version"]], [path.name for path in (self.active / "versions").iterdir()])
+
+
+class VersionedPublishTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.staging = Path(self.tmp.name) / "staging"
+        self.active = Path(self.tmp.name) / "active"
+        self.staging.mkdir()
+
+    def _publish(self, venta_dates):
+        write_report_set(self.staging, venta_dates=venta_dates)
+        validation = validate_report_set(self.staging, date(2026, 6, 1), date(2026, 6, 30))
+        return publish_report_set(self.staging, self.active, validation)
+
+    def test_rollback_flips_readers_to_the_previous_version(self):
+        first = self._publish(("05/06/2026",))
+        second = self._publish(("05/06/2026", "06/06/2026"))
+        processor = SemaforoProcessor(self.active)
+        self.assertEqual(2, len(processor.load_data().data["ventas"]))
+
+        activate_version(self.active, first["version"])
+
+        self.assertEqual(Path(first["version_dir"]), current_dir(self.active))
+        processor.invalidate_metrics()
+        self.assertEqual(1, len(processor.load_data().data["ventas"]))
+        self.assertEqual(
+            {first["version"]: True, second["version"]: False},
+            {item["version"]: item["active"] for item in list_versions(self.active)},
+        )
+
+    def test_versions_keep_a_copy_of_the_goals_file(self):
+        self.active.mkdir()
+        meta_path = self.active / "meta_data.json"
+        meta_path.write_text('{"SUNNY": {"ventas": 5}}', encoding="utf-8")
+        first = self._publish(("05/06/2026",))
+        meta_path.write_text('{"SUNNY": {"ventas": 8}}', encoding="utf-8")
+        self._publish(("05/06/2026", "06/06/2026"))
+
+        snapshot = Path(first["version_dir"]) / "meta_data.json"
+        self.assertEqual('{"SUNNY": {"ventas": 5}}', snapshot.read_text(encoding="utf-8"))
+        self.assertIn("meta_data_sha256", first["manifest"])
+
+        # Activar una version no pisa las metas vigentes
+        activate_version(self.active, first["version"])
+        self.assertEqual('{"SUNNY": {"ventas": 8}}', meta_path.read_text(encoding="utf-8"))
+
+    def test_flat_layout_is_migrated_into_a_version(self):
+        self.active.mkdir()
+        write_report_set(self.active, venta_dates=("05/06/2026",))
+        legacy = published_reports(self.active).files()["ReporteVenta"].read_bytes()
+
+        published = self._publish(("05/06/2026", "06/06/2026"))
+        activate_version(self.active, published["previous_version"])
+
+        self.assertFalse(list(self.active.glob("*.xlsx")))
+        self.assertEqual(legacy, published_reports(self.active).files()["ReporteVenta"].read_bytes())
+
+    def test_pointer_file_is_used_without_symlink_support(self):
+        with patch("report_pipeline.os.symlink", side_effect=OSError("symlinks not permitted")):
+            published = self._publish(("05/06/2026",))
+
+        self.assertFalse((self.active / "current").is_symlink())
+        self.assertEqual(published["version"], (self.active / "current").read_text(encoding="utf-8"))
+        self.assertEqual(Path(published["version_dir"]), published_reports(self.active).directory)
+
+    def test_unknown_version_is_rejected(self):
+        self._publish(("05/06/2026",))
+        for version in ("20200101_000000_000000", "objects", "../active"):
+            with self.assertRaises(LookupError):
+                activate_version(self.active, version)
+
+
+class SkipPublishTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.staging = Path(self.tmp.name) / "staging"
+        self.active = Path(self.tmp.name) / "active"
+        self.staging.mkdir()
+
+    def _sync(self, start=date(2026, 6, 1)):
+        validation = validate_report_set(self.staging, start, date(2026, 6, 30))
+        return publish_report_set(self.staging, self.active, validation)
+
+    def test_identical_sync_keeps_the_active_set(self):
+        write_report_set(self.staging)
+        first = self._sync()
+        manifest = current_dir(self.active) / "manifest.json"
+        manifest_mtime = manifest.stat().st_mtime_ns
+
+        second = self._sync()
+
+        self.assertFalse(first["unchanged"])
+        self.assertTrue(second["unchanged"])
+        self.assertEqual(first["manifest"]["published_at"], second["manifest"]["published_at"])
+        self.assertEqual(manifest_mtime, manifest.stat().st_mtime_ns)
+        self.assertEqual(1, len(list((self.active / "versions").iterdir())))
+
+    def test_rows_identical_export_is_skipped_even_if_bytes_differ(self):
+        write_report_set(self.staging)
+        first = self._sync()
+        venta = self.staging / "ReporteVenta.xlsx"
+        pd.read_excel(venta).iloc[::-1].to_excel(venta, index=False)
+
+        second = self._sync()
+
+        self.assertNotEqual(
+            first["manifest"]["reports"]["ReporteVenta"]["sha256"],
+            validate_report_set(self.staging, date(2026, 6, 1), date(2026, 6, 30))["ReporteVenta"]["sha256"],
+        )
+        self.assertTrue(second["unchanged"])
+
+    def test_changes_outside_the_canonical_columns_are_published(self):
+        write_report_set(self.staging)
+        venta = self.staging / "ReporteVenta.xlsx"
+        df = pd.read_excel(venta)
+        df.assign(NroDocumento=11111111, NombreCliente="Juan").to_excel(venta, index=False)
+        self._sync()
+
+        df.assign(NroDocumento=22222222, NombreCliente="Pedro").to_excel(venta, index=False)
+        second = self._sync()
+
+        self.assertFalse(second["unchanged"])
+        published = pd.read_excel(published_reports(self.active).files()["ReporteVenta"])
+        self.assertEqual(["Pedro"], published["NombreCliente"].unique().tolist())
+
+    def test_changed_period_or_data_is_published(self):
+        write_report_set(self.staging)
+        self._sync()
+
+        self.assertFalse(self._sync(start=date(2026, 5, 1))["unchanged"])
+        write_report_set(self.staging, venta_dates=("05/06/2026",))
+        self.assertFalse(self._sync(start=date(2026, 5, 1))["unchanged"])
+
+
+class PublishedReportsTests(unittest.TestCase):
+    def test_readers_use_the_published_set_not_the_newest_file(self):
+        with tempfile.TemporaryDirectory() as staging, tempfile.TemporaryDirectory() as active:
+            write_report_set(staging)
+            published = publish_report_set(
+                staging, active, validate_report_set(staging, date(2026, 6, 1), date(2026, 6, 30))
+            )
+            # Un archivo suelto mas nuevo no reemplaza al publicado
+            pd.DataFrame({"Proyecto": ["X"]}).to_csv(Path(active) / "ReporteVenta_manual.csv", index=False)
+
+            resolver = published_reports(active)
+            with patch("report_pipeline._read_manifest", wraps=report_pipeline._read_manifest) as reads:
+                files = resolver.files()
+                names = [path.name for path in iter_downloadable_files(active)]
+
+            self.assertEqual(Path(published["version_dir"]) / "ReporteVenta.xlsx", files["ReporteVenta"])
+            self.assertNotIn("ReporteVenta_manual.csv", names)
+            self.assertIn("manifest.json", names)
+            self.assertLessEqual(reads.call_count, 1)
+            self.assertIs(resolver, published_reports(Path(active)))
+
+    def test_falls_back_to_glob_without_manifest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_report_set(directory)
+
+            files = published_reports(directory).files()
+
+        self.assertEqual(set(REPORT_DEFINITIONS), set(files))
+
+
+class DownloadArchiveTests(unittest.TestCase):
+    def test_publish_prebuilds_archive_until_the_manifest_changes(self):
+        with tempfile.TemporaryDirectory() as staging, tempfile.TemporaryDirectory() as active:
+            write_report_set(staging)
+            publish_report_set(staging, active, validate_report_set(staging, date(2026, 6, 1), date(2026, 6, 30)))
+
+            archive = prebuilt_archive(active)
+            self.assertIsNotNone(archive)
+            with zipfile.ZipFile(archive) as bundle:
+                self.assertEqual(
+                    sorted(path.name for path in iter_downloadable_files(active)), sorted(bundle.namelist())
+                )
+
+            # Un ZIP anterior al manifest de la version no se sirve
+            stale = (current_dir(active) / "manifest.json").stat().st_mtime_ns - 10**9
+            os.utime(archive, ns=(stale, stale))
+            self.assertIsNone(prebuilt_archive(active))
+            build_download_archive(current_dir(active))
+            self.assertIsNotNone(prebuilt_archive(active))
+
+    def test_streamed_zip_matches_file_contents(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_report_set(directory)
+            paths = sorted(Path(directory).glob("*.xlsx"))
+
+            with zipfile.ZipFile(io.BytesIO(b"".join(iter_zip_stream(paths, chunk_size=512)))) as bundle:
+                for path in paths:
+                    self.assertEqual(path.read_bytes(), bundle.read(path.name))
+
+
+class BackupRetentionTests(unittest.TestCase):
+    def test_keeps_last_daily_and_monthly(self):
+        created = [datetime(2026, 1, 5, 9), datetime(2026, 1, 20, 9), datetime(2026, 3, 1, 9)]
+        created += [datetime(2026, 6, day, hour) for day in (8, 9, 10) for hour in (9, 18)]
+
+        keep = select_backups_to_keep(created, 2, 2, True, today=date(2026, 6, 10))
+
+        self.assertEqual(
+            {
+                datetime(2026, 6, 10, 18),
+                datetime(2026, 6, 10, 9),
+                datetime(2026, 6, 9, 18),
+                datetime(2026, 3, 1, 9),
+                datetime(2026, 1, 20, 9),
+            },
+            keep,
+        )
+
+    def test_compaction_dehydrates_old_versions_and_rollback_still_works(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            staging, active = Path(tmp) / "staging", Path(tmp) / "active"
+            staging.mkdir()
+            venta_sets = [("05/06/2026",), ("06/06/2026",), ("07/06/2026",), ("08/06/2026",)]
+            versions = []
+            for day, venta_dates in enumerate(venta_sets, start=1):
+                write_report_set(staging, venta_dates=venta_dates)
+                validation = validate_report_set(staging, date(2026, 6, 1), date(2026, 6, 30))
+                version_dir = Path(publish_report_set(staging, active, validation)["version_dir"])
+                # Una version por dia para que la retencion diaria las conserve todas
+                if day < len(venta_sets):
+                    version_dir = version_dir.rename(version_dir.with_name(f"2026060{day}_090000_000000"))
+                versions.append(version_dir)
+
+            real_open = report_pipeline.lzma.open
+            locked_while_compressing = []
+
+            def xz_open(*args, **kwargs):
+                locked_while_compressing.append(report_pipeline.BACKUP_LOCK.locked())
+                return real_open(*args, **kwargs)
+
+            with patch.multiple("report_pipeline", BACKUP_KEEP_LAST=1, BACKUP_KEEP_DAILY_DAYS=30), patch(
+                "report_pipeline.lzma.open", side_effect=xz_open
+            ):
+                summary = compact_backups(active, today=date(2026, 6, 10))
+
+            # xz corre sin BACKUP_LOCK: publicar o volver atras no espera a la compresion
+            self.assertTrue(locked_while_compressing)
+            self.assertFalse(any(locked_while_compressing))
+            self.assertEqual([], summary["removed_backups"])
+            self.assertGreater(summary["compressed_objects"], 0)
+            self.assertTrue(list((active / "backups" / "objects").rglob("*.xz")))
+            self.assertEqual(["manifest.json"], [path.name for path in versions[2].iterdir()])
+            self.assertTrue((versions[3] / "ReporteVenta.xlsx").exists())
+
+            # La version del 3 de junio solo tiene blobs comprimidos; se reactiva igual
+            activate_version(active, versions[2].name)
+            venta = published_reports(active).files()["ReporteVenta"]
+            self.assertEqual(versions[2], venta.parent)
+            self.assertEqual(["07/06/2026"], read_report(venta)["FechaVenta"].astype(str).tolist())
+            self.assertIsNotNone(prebuilt_archive(active))
+
+
+class StreamingValidationTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _validate(self, mode):
+        with patch.multiple("report_pipeline", REPORT_VALIDATION_MODE=mode, VALIDATION_CHUNK_ROWS=2):
+            return validate_report_set(self.tmp.name, date(2026, 6, 1), date(2026, 6, 30))
+
+    def test_streaming_summary_matches_full_validation(self):
+        write_report_set(self.tmp.name, venta_dates=("05/06/2026", "xx", "06/06/2026", "", "07/06/2026"))
+        # El CSV se recorre por bloques con pandas
+        venta = Path(self.tmp.name) / "ReporteVenta.xlsx"
+        pd.read_excel(venta).to_csv(venta.with_suffix(".csv"), index=False)
+        venta.unlink()
+
+        full = self._validate("full")
+        streamed = self._validate("streaming")
+
+        self.assertEqual(dict(full), dict(streamed))
+        self.assertIsNone(streamed["ReporteVenta"]["row_digest"])
+        self.assertIsNotNone(streamed["Separacion"]["row_digest"])
+        self.assertEqual(5, streamed["ReporteVenta"]["rows"])
+        self.assertEqual(1, streamed["ReporteVenta"]["invalid_dates"])
+        self.assertEqual({}, streamed.frames)
+
+    def test_streaming_mode_rejects_dates_outside_period(self):
+        write_report_set(self.tmp.name, venta_dates=("05/06/2026", "06/06/2026", "02/07/2026"))
+
+        with self.assertRaises(ReportValidationError) as context:
+            self._validate("streaming")
+
+        self.assertIn("(2026-06-05 a 2026-07-02)", str(context.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
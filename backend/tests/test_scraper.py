@@ -0,0 +1,177 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from scraper import REPORTS, DownloadCapture, EvoltaScraper  # noqa: E402
+
+
+class FakeDriver:
+    """Pestañas y carpetas de descarga por pestaña, sin Chrome."""
+
+    def __init__(self):
+        self.handles = ["main"]
+        self.current_window_handle = "main"
+        self.download_paths = {}
+        self.peak_tabs = 0
+        self.switch_to = SimpleNamespace(new_window=self._new_window, window=self._switch)
+
+    def _new_window(self, kind):
+        handle = f"tab{len(self.download_paths) + len(self.handles)}"
+        self.handles.append(handle)
+        self.current_window_handle = handle
+        self.peak_tabs = max(self.peak_tabs, len(self.handles) - 1)
+
+    def _switch(self, handle):
+        self.current_window_handle = handle
+
+    def close(self):
+        self.handles.remove(self.current_window_handle)
+
+    def execute_cdp_cmd(self, command, params):
+        self.download_paths[self.current_window_handle] = params["downloadPath"]
+
+
+class EventDriver(FakeDriver):
+    """Además emite los eventos de descarga de DevTools en el log "performance"."""
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+        self.behavior = None
+
+    def execute_cdp_cmd(self, command, params):
+        if command == "Browser.setDownloadBehavior":
+            self.behavior = params
+            return {}
+        if command == "Target.getTargetInfo":
+            return {"targetInfo": {"targetId": f"target-{self.current_window_handle}"}}
+        return super().execute_cdp_cmd(command, params)
+
+    def get_log(self, kind):
+        events, self.events = self.events, []
+        return events
+
+    def emit(self, method, webview, **params):
+        payload = {"message": {"method": method, "params": params}, "webview": webview}
+        self.events.append({"message": json.dumps(payload)})
+
+    def download(self, guid, filename, content):
+        webview = f"target-{self.current_window_handle}"
+        self.emit("Page.downloadWillBegin", webview, guid=guid, suggestedFilename=filename, frameId=webview)
+        Path(self.behavior["downloadPath"], guid).write_text(content)
+        self.emit("Browser.downloadProgress", webview, guid=guid, state="completed")
+        self.emit("Page.downloadProgress", webview, guid=guid, state="completed")
+
+
+class TabExportTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.scraper = EvoltaScraper(download_dir=self.tmp.name)
+        self.scraper.driver = FakeDriver()
+        sleep = patch("scraper.time.sleep")
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def _open_report(self, report, filename, start_date=None, end_date=None):
+        if filename == "Separacion":
+            return False
+        driver = self.scraper.driver
+        path = os.path.join(driver.download_paths[driver.current_window_handle], "export (1).xlsx")
+        Path(path).write_text(filename)
+        return True
+
+    def _export(self):
+        pending = dict(REPORTS)
+        with patch.object(self.scraper, "_open_report", side_effect=self._open_report):
+            downloaded = self.scraper._export_in_tabs(pending, "01/06/2026", "30/06/2026")
+        return pending, downloaded
+
+    def test_each_tab_downloads_into_its_own_folder(self):
+        with patch.multiple("scraper", EVOLTA_EXPORT_CONCURRENCY=2, available_memory_mb=lambda: None):
+            pending, downloaded = self._export()
+
+        self.assertEqual(["Separacion"], list(pending))
+        self.assertEqual(3, len(downloaded))
+        for path in downloaded:
+            self.assertEqual(Path(path).stem, Path(path).read_text())
+        self.assertEqual(2, self.scraper.driver.peak_tabs)
+        self.assertEqual(["main"], self.scraper.driver.handles)
+        self.assertFalse([name for name in os.listdir(self.tmp.name) if name.startswith(".tab_")])
+
+    def test_memory_guard_keeps_a_single_tab(self):
+        with patch.multiple("scraper", EVOLTA_EXPORT_CONCURRENCY=4, available_memory_mb=lambda: 10):
+            _, downloaded = self._export()
+
+        self.assertEqual(3, len(downloaded))
+        self.assertEqual(1, self.scraper.driver.peak_tabs)
+
+
+class DownloadCaptureTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.scraper = EvoltaScraper(download_dir=self.tmp.name)
+        self.driver = self.scraper.driver = EventDriver()
+        self.scraper.capture = DownloadCapture(self.driver, os.path.join(self.tmp.name, ".downloads"))
+        sleep = patch("scraper.time.sleep")
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def _open_report(self, report, filename, start_date=None, end_date=None):
+        # Un archivo ajeno en la carpeta ya no se confunde con la exportación
+        Path(self.tmp.name, "otro.xlsx").write_text("ajeno")
+        self.driver.download(f"guid-{filename}", "Reporte (3).xlsx", filename)
+        return True
+
+    def test_sequential_export_uses_the_completion_event(self):
+        with patch.object(self.scraper, "_open_report", side_effect=self._open_report):
+            target = self.scraper._export_report(REPORTS["ReporteVenta"], "ReporteVenta")
+
+        self.assertEqual(os.path.join(self.tmp.name, "ReporteVenta.xlsx"), target)
+        self.assertEqual("ReporteVenta", Path(target).read_text())
+        self.assertEqual("allowAndName", self.driver.behavior["behavior"])
+        self.assertEqual([], os.listdir(os.path.join(self.tmp.name, ".downloads")))
+
+    def test_tab_downloads_are_attributed_by_target(self):
+        pending = dict(REPORTS)
+        with patch.object(self.scraper, "_open_report", side_effect=self._open_report), \
+                patch.multiple("scraper", EVOLTA_EXPORT_CONCURRENCY=3, available_memory_mb=lambda: None):
+            downloaded = self.scraper._export_in_tabs(pending, "01/06/2026", "30/06/2026")
+
+        self.assertEqual({}, pending)
+        for path in downloaded:
+            self.assertEqual(Path(path).stem, Path(path).read_text())
+        self.assertEqual(3, self.driver.peak_tabs)
+
+    def test_unattributed_downloads_are_matched_by_suggested_filename(self):
+        def open_report(report, filename, start_date=None, end_date=None):
+            # Chrome no informa el target: solo el nombre sugerido identifica el reporte
+            guid = f"guid-{filename}"
+            self.driver.emit("Page.downloadWillBegin", None, guid=guid, suggestedFilename=f"{filename}_062026.xlsx")
+            Path(self.driver.behavior["downloadPath"], guid).write_text(filename)
+            self.driver.emit("Browser.downloadProgress", None, guid=guid, state="completed")
+            return True
+
+        pending = dict(REPORTS)
+        with patch.object(self.scraper, "_open_report", side_effect=open_report), \
+                patch.multiple("scraper", EVOLTA_EXPORT_CONCURRENCY=4, available_memory_mb=lambda: None):
+            downloaded = self.scraper._export_in_tabs(pending, "01/06/2026", "30/06/2026", timeout=5)
+
+        self.assertEqual({}, pending)
+        for path in downloaded:
+            self.assertEqual(Path(path).stem, Path(path).read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from selenium.common.exceptions import NoSuchElementException
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from wait_engine import WaitEngine, WaitTimeout, download_settled  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class WaitEngineTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.waits = WaitEngine(driver=None, poll=0.5, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_returns_as_soon_as_the_condition_holds_and_records_the_time(self):
+        def condition(driver):
+            if self.clock.now < 1.5:
+                raise NoSuchElementException()
+            return "boton"
+
+        self.assertEqual("boton", self.waits.until("export button", condition, timeout=10))
+        self.assertEqual([("export button", 1.5, True)], self.waits.timings)
+
+    def test_deadline_raises_or_continues_depending_on_the_step(self):
+        with self.assertRaises(WaitTimeout):
+            self.waits.until("page load", lambda driver: False, timeout=2)
+        self.assertIsNone(self.waits.until("grid reload", lambda driver: False, timeout=1, required=False))
+
+        self.assertEqual([("page load", 2.0, False), ("grid reload", 1.0, False)], self.waits.timings)
+        self.assertEqual(3.0, self.waits.total())
+
+
+class DownloadSettledTests(unittest.TestCase):
+    def test_waits_for_partials_to_finish_and_the_size_to_hold(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            old = os.path.join(tmp, "anterior.xlsx")
+            Path(old).write_text("viejo")
+            condition = download_settled(tmp, {old})
+            partial = Path(tmp, "Reporte.xlsx.crdownload")
+            partial.write_text("PK")
+            self.assertIsNone(condition(None))
+
+            final = Path(tmp, "Reporte.xlsx")
+            partial.rename(final)
+            self.assertIsNone(condition(None))
+            final.write_text("PK completo")
+            self.assertIsNone(condition(None))
+
+            self.assertEqual(str(final), condition(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+"""Esperas por condiciones de la página para el scraper de Evolta.
+
+En lugar de pausas fijas, cada paso espera algo concreto (documento cargado,
+AJAX terminado, botón habilitado, alerta presente, valor aplicado) con su
+propio plazo, y registra cuánto tardó realmente.
+"""
+import glob
+import logging
+import os
+import time
+from typing import Any, Callable, List, Tuple
+
+from selenium.common.exceptions import NoAlertPresentException, WebDriverException
+
+logger = logging.getLogger(__name__)
+
+Condition = Callable[[Any], Any]
+
+
+class WaitTimeout(TimeoutError):
+    pass
+
+
+class WaitEngine:
+    """Sondea ``condition(driver)`` hasta que devuelva un valor verdadero o venza el plazo."""
+
+    def __init__(self, driver, poll: float = 0.1, clock=time.monotonic, sleep=time.sleep):
+        self.driver = driver
+        self.poll = poll
+        self.clock = clock
+        self.sleep = sleep
+        self.timings: List[Tuple[str, float, bool]] = []
+
+    def until(self, step: str, condition: Condition, timeout: float, required: bool = True,
+              poll: float | None = None):
+        """
+        Devuelve el valor de la condición. Al vencer el plazo lanza WaitTimeout,
+        o devuelve None si el paso no es obligatorio.
+        """
+        poll = self.poll if poll is None else poll
+        start = self.clock()
+        deadline = start + timeout
+        while True:
+            try:
+                value = condition(self.driver)
+            except (WebDriverException, LookupError):
+                # Elemento aún inexistente, obsoleto o página recargándose
+                value = None
+            if value:
+                elapsed = self.clock() - start
+                self.timings.append((step, elapsed, True))
+                logger.info(f"Wait '{step}' satisfied in {elapsed:.2f}s")
+                return value
+            if self.clock() >= deadline:
+                break
+            self.sleep(poll)
+
+        elapsed = self.clock() - start
+        self.timings.append((step, elapsed, False))
+        if required:
+            logger.warning(f"Wait '{step}' timed out after {elapsed:.2f}s")
+            raise WaitTimeout(f"Tiempo agotado esperando: {step} ({timeout:.0f}s)")
+        logger.info(f"Wait '{step}' not met after {elapsed:.2f}s, continuing")
+        return None
+
+    def total(self) -> float:
+        return sum(elapsed for _, elapsed, _ in self.timings)
+
+
+def document_ready() -> Condition:
+    return lambda driver: driver.execute_script("return document.readyState") == "complete"
+
+
+def url_contains(fragment: str) -> Condition:
+    return lambda driver: fragment in driver.current_url
+
+
+def url_excludes(fragment: str) -> Condition:
+    return lambda driver: fragment not in driver.current_url
+
+
+def element_present(by: str, value: str) -> Condition:
+    def condition(driver):
+        elements = driver.find_elements(by, value)
+        return elements[0] if elements else None
+    return condition
+
+
+def element_clickable(by: str, value: str) -> Condition:
+    def condition(driver):
+        for element in driver.find_elements(by, value):
+            if element.is_displayed() and element.is_enabled():
+                return element
+        return None
+    return condition
+
+
+def alert_present() -> Condition:
+    def condition(driver):
+        try:
+            return driver.switch_to.alert
+        except NoAlertPresentException:
+            return None
+    return condition
+
+
+def attribute_equals(element, name: str, expected: str) -> Condition:
+    return lambda driver: (element.get_attribute(name) or "") == expected
+
+
+PARTIAL_DOWNLOAD_SUFFIXES = (".crdownload", ".tmp", ".partial")
+
+
+def download_settled(directory: str, files_before=frozenset()) -> Condition:
+    """
+    Archivo nuevo en ``directory`` (fuera de ``files_before``) ya terminado: no
+    queda ninguna descarga parcial en la carpeta y su tamaño no cambió desde el
+    sondeo anterior. Guarda el tamaño visto entre llamadas.
+    """
+    last_size = {}
+
+    def condition(driver):
+        files = set(glob.glob(os.path.join(directory, "*")))
+        if any(path.endswith(PARTIAL_DOWNLOAD_SUFFIXES) for path in files):
+            return None
+        for path in sorted(files - set(files_before)):
+            if not os.path.isfile(path):
+                continue
+            size = os.path.getsize(path)
+            previous, last_size[path] = last_size.get(path), size
+            if size > 0 and size == previous:
+                return path
+        return None
+    return condition
+
+
+# AJAX de la página (jQuery/jqGrid en Evolta): el rastreador se arma antes de la
+# acción. Si la acción dispara peticiones, la condición se cumple cuando terminan
+# todas y no queda un indicador de carga visible; si en AJAX_SETTLE_MS no empezó
+# ninguna, la acción no usaba AJAX y se da por terminada.
+AJAX_SETTLE_MS = 300
+
+_ARM_AJAX_TRACKER = """
+window.__waitAjax = {armed: Date.now(), started: false, done: false};
+if (window.jQuery) {
+    jQuery(document).one('ajaxSend', function () { window.__waitAjax.started = true; });
+    jQuery(document).one('ajaxStop', function () { window.__waitAjax.done = true; });
+}
+"""
+_AJAX_FINISHED = """
+var state = window.__waitAjax;
+if (!state) { return true; }
+var loaders = document.querySelectorAll('.ui-jqgrid .loading, .loading, .blockUI, .blockOverlay');
+for (var i = 0; i < loaders.length; i++) {
+    if (loaders[i].offsetParent !== null) { return false; }
+}
+if (window.jQuery && jQuery.active > 0) { return false; }
+if (state.started) { return state.done; }
+return Date.now() - state.armed >= arguments[0];
+"""
+
+
+def arm_ajax_tracker(driver) -> None:
+    driver.execute_script(_ARM_AJAX_TRACKER)
+
+
+def ajax_finished(settle_ms: int = AJAX_SETTLE_MS) -> Condition:
+    return lambda driver: driver.execute_script(_AJAX_FINISHED, settle_ms) is True
@@ -1,9 +1,13 @@
 
 import os
+import sys
 import glob
 import pandas as pd
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from date_parsing import parse_dates  # noqa: E402
+
 DOWNLOAD_DIR = r"C:\Users\Yrving\Downloads\CARPETA_SEMAFORO"
 
 print(f"Checking data in: {DOWNLOAD_DIR}")
@@ -35,7 +39,7 @@ for name, filename in files.items():
             # Pick the most likely "Creation Date"
             target_col = date_cols[0] 
             # Convert to datetime
-            df[target_col] = pd.to_datetime(df[target_col], dayfirst=True, errors='coerce')
+            df[target_col] = parse_dates(df[target_col], key=(filename, target_col.upper()))
             
             min_date = df[target_col].min()
             max_date = df[target_col].max()
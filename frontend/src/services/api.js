@@ -16,6 +16,7 @@ const api = axios.create({
 
 export const getStatus = () => api.get('/status');
 export const getSemaforo = () => api.get('/semaforo');
+export const getSemaforoDrilldown = (params = {}) => api.get('/semaforo/drilldown', { params });
 export const getMetas = () => api.get('/metas');
 export const syncData = (data = {}) => api.post('/sync', data);
 export const startCreditAnalysis = (data = {}) => api.post('/credito/procesos', data);
@@ -28,6 +29,9 @@ export const getAccumulatedCredit = (startDate, endDate) => api.get('/credito/ac
 export const updateMeta = (project, metric, value) => api.post('/meta', { project, metric, value });
 export const updateMetasBulk = (project, metas) => api.post('/metas/bulk', { project, metas });
 export const resetSyncStatus = () => api.post('/reset-status');
+export const getVersions = () => api.get('/versions');
+export const activateVersion = (version) => api.post(`/versions/${version}/activate`);
 export const reportsDownloadUrl = `${API_URL}/download-reports`;
+export const reportDownloadUrl = (report) => `${API_URL}/download-reports/${report}`;
 
 export default api;